@@ -19,6 +19,8 @@
 #define DISPLAY_TIME 2000
 #define theZero 53791880.00
 #define theRatio 300170.35
+// 1: send readings as binary frames to /readings/binary (see app/protocol.py), 0: JSON
+#define USE_BINARY_PROTOCOL 0
 
 String SERIAL_NUMBER = "MH-830B35DF"; 
 uint32_t irBuffer[SAMPLE_BLOCK];
@@ -106,6 +108,61 @@ bool postRequest(int avgHR, int avgSpO2, float weight, int bpS, int bpD) {
   }
 }
 
+// Append little-endian integers to a frame buffer
+static size_t putU8(uint8_t *buf, size_t pos, uint8_t value) {
+  buf[pos] = value;
+  return pos + 1;
+}
+
+static size_t putU16(uint8_t *buf, size_t pos, uint16_t value) {
+  buf[pos] = value & 0xFF;
+  buf[pos + 1] = value >> 8;
+  return pos + 2;
+}
+
+// One version 1 frame holding a single reading without a timestamp:
+// "MH", version, flags, serial length, serial, count, then
+// avgHR u16, avgSpO2 u8, weight u16 (tenths of a pound), bpS u16, bpD u16.
+bool postBinaryRequest(int avgHR, int avgSpO2, float weight, int bpS, int bpD) {
+  const char* serverURL = "https://medhome.onrender.com/readings/binary";
+  uint8_t frame[64];
+  size_t serialLen = SERIAL_NUMBER.length();
+  if (serialLen > 40) {
+    return false;
+  }
+
+  size_t pos = 0;
+  pos = putU8(frame, pos, 'M');
+  pos = putU8(frame, pos, 'H');
+  pos = putU8(frame, pos, 1);  // version
+  pos = putU8(frame, pos, 0);  // flags: no timestamps
+  pos = putU8(frame, pos, serialLen);
+  memcpy(frame + pos, SERIAL_NUMBER.c_str(), serialLen);
+  pos += serialLen;
+  pos = putU16(frame, pos, 1);  // readings in this frame
+  pos = putU16(frame, pos, avgHR);
+  pos = putU8(frame, pos, avgSpO2);
+  pos = putU16(frame, pos, (uint16_t)(weight * 10 + 0.5));
+  pos = putU16(frame, pos, bpS);
+  pos = putU16(frame, pos, bpD);
+
+  HTTPClient http;
+  http.begin(serverURL);
+  http.addHeader("Content-Type", "application/vnd.medhome.readings");
+  int httpResponseCode = http.POST(frame, pos);
+  Serial.println(httpResponseCode);
+  http.end();
+  return httpResponseCode == 200;
+}
+
+bool sendReading(int avgHR, int avgSpO2, float weight, int bpS, int bpD) {
+#if USE_BINARY_PROTOCOL
+  return postBinaryRequest(avgHR, avgSpO2, weight, bpS, bpD);
+#else
+  return postRequest(avgHR, avgSpO2, weight, bpS, bpD);
+#endif
+}
+
 void getRequest() {
   const char* serverURL = "https://ece140b-sp25-medhome.onrender.com/hello";
 
@@ -331,7 +388,7 @@ void loop() {
     delay(DISPLAY_TIME); 
     lcd.clear(); 
  
-    bool checkPost = postRequest(avgHR, avgSpO2, weight, bpS, bpD);
+    bool checkPost = sendReading(avgHR, avgSpO2, weight, bpS, bpD);
 
     int attemptCount = 0; 
     while(!checkPost) {
@@ -350,7 +407,7 @@ void loop() {
       delay(DISPLAY_TIME); 
       lcd.clear(); 
 
-      checkPost = postRequest(avgHR, avgSpO2, weight, bpS, bpD);
+      checkPost = sendReading(avgHR, avgSpO2, weight, bpS, bpD);
 
       attemptCount++; 
       if (attemptCount > 10) {
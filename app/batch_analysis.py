@@ -0,0 +1,172 @@
+"""
+Nightly population analysis: run the dataAnalyzer rules over every user and
+write a report of flagged patients for the care team.
+
+Rows are streamed from MySQL ordered by user, grouped into chunks of users,
+and each chunk is analysed with vectorized NumPy on a pool of worker
+processes. Only a bounded number of chunks is in memory at any time, so the
+job scales to hundreds of thousands of users.
+
+    python -m app.batch_analysis --output flagged.csv
+    python -m app.batch_analysis --days 14 --workers 8 --all
+"""
+import argparse
+import csv
+import logging
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime, timedelta
+from typing import Iterator, Optional
+
+import numpy as np
+
+from app.data_analysis import FLAG_RULES, HR, METRICS, SECONDS_PER_DAY, SPO2, WEIGHT, compute_flags, compute_group_metrics
+from app.storage.mysql import get_db_connection
+
+logger = logging.getLogger(__name__)
+
+# Users analysed per worker task
+BATCH_USERS_PER_CHUNK = int(os.getenv("BATCH_USERS_PER_CHUNK", "2000"))
+# Rows pulled from the server per round trip while streaming
+BATCH_FETCH_SIZE = 10000
+# Users need this many readings in the window to be analysed, as on the dashboard
+MIN_READINGS = 7
+
+REPORT_COLUMNS = [
+    "username", "readings", "first_reading", "last_reading", "flags",
+    "hr_slope_per_day", "weight_slope_per_day", "mean_spo2", "low_spo2_readings", "high_bp_readings",
+]
+
+
+def stream_chunks(cursor, since: datetime, users_per_chunk: int) -> Iterator[tuple]:
+    """
+    Yield (usernames, values, seconds, starts) chunks of whole users.
+
+    `cursor` must be unbuffered so rows arrive from the server as they are read.
+    """
+    cursor.execute(
+        f"""
+        SELECT username, {", ".join(METRICS)}, UNIX_TIMESTAMP(created_at)
+        FROM data
+        WHERE created_at >= %s
+        ORDER BY username, created_at, id
+        """,
+        (since,),
+    )
+    usernames, rows, starts = [], [], []
+    current = None
+    while True:
+        batch = cursor.fetchmany(BATCH_FETCH_SIZE)
+        if not batch:
+            break
+        for row in batch:
+            if row[0] != current:
+                if len(usernames) == users_per_chunk:
+                    yield _pack(usernames, rows, starts)
+                    usernames, rows, starts = [], [], []
+                current = row[0]
+                usernames.append(current)
+                starts.append(len(rows))
+            rows.append(row[1:])
+    if usernames:
+        yield _pack(usernames, rows, starts)
+
+
+def _pack(usernames, rows, starts) -> tuple:
+    table = np.array(rows, dtype=np.float64)
+    return usernames, table[:, :len(METRICS)], table[:, len(METRICS)], np.array(starts, dtype=np.intp)
+
+
+def analyze_chunk(usernames, values, seconds, starts, include_all: bool = False) -> list[dict]:
+    """Analyse one chunk of users; runs in a worker process."""
+    metrics = compute_group_metrics(values, seconds / SECONDS_PER_DAY, starts)
+    flags = compute_flags(metrics)
+    flag_names = np.array(list(FLAG_RULES))
+    flag_matrix = np.column_stack([flags[name] for name in FLAG_RULES])
+    enough = metrics["n"] >= MIN_READINGS
+    selected = enough if include_all else enough & flag_matrix.any(axis=1)
+    ends = np.append(starts[1:], len(values)) - 1
+
+    results = []
+    for i in np.flatnonzero(selected):
+        results.append({
+            "username": usernames[i],
+            "readings": int(metrics["n"][i]),
+            "first_reading": datetime.fromtimestamp(seconds[starts[i]]).isoformat(sep=" "),
+            "last_reading": datetime.fromtimestamp(seconds[ends[i]]).isoformat(sep=" "),
+            "flags": ";".join(flag_names[flag_matrix[i]]),
+            "hr_slope_per_day": _rounded(metrics["slope"][i, HR]),
+            "weight_slope_per_day": _rounded(metrics["slope"][i, WEIGHT]),
+            "mean_spo2": _rounded(metrics["mean"][i, SPO2]),
+            "low_spo2_readings": int(metrics["low_spo2"][i]),
+            "high_bp_readings": int(metrics["high_bp"][i]),
+        })
+    return results
+
+
+def _rounded(value) -> Optional[float]:
+    return None if np.isnan(value) else round(float(value), 2)
+
+
+def run(output, days: int, workers: int, users_per_chunk: int, include_all: bool) -> dict:
+    """Run the whole job, writing report rows to the `output` file object as chunks finish."""
+    since = datetime.now() - timedelta(days=days)
+    writer = csv.DictWriter(output, fieldnames=REPORT_COLUMNS)
+    writer.writeheader()
+
+    stats = {"users": 0, "rows": 0, "reported": 0}
+    began = time.perf_counter()
+    connection = get_db_connection()
+    cursor = connection.cursor(buffered=False)
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pending = set()
+
+            def collect(done):
+                for future in done:
+                    results = future.result()
+                    writer.writerows(results)
+                    stats["reported"] += len(results)
+
+            for usernames, values, seconds, starts in stream_chunks(cursor, since, users_per_chunk):
+                stats["users"] += len(usernames)
+                stats["rows"] += len(values)
+                # Keep at most two chunks per worker in flight to bound memory
+                if len(pending) >= 2 * workers:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    collect(done)
+                pending.add(pool.submit(analyze_chunk, usernames, values, seconds, starts, include_all))
+            collect(wait(pending).done)
+    finally:
+        cursor.close()
+        connection.close()
+
+    stats["seconds"] = round(time.perf_counter() - began, 2)
+    return stats
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", "-o", help="CSV file to write (default: stdout)")
+    parser.add_argument("--days", type=int, default=7, help="analyse readings from the last N days")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk-users", type=int, default=BATCH_USERS_PER_CHUNK)
+    parser.add_argument("--all", action="store_true", help="report every analysed user, not only flagged ones")
+    args = parser.parse_args()
+
+    output = open(args.output, "w", newline="") if args.output else sys.stdout
+    try:
+        stats = run(output, args.days, args.workers, args.chunk_users, args.all)
+    finally:
+        if args.output:
+            output.close()
+    logger.info(
+        f"Analysed {stats['users']} users ({stats['rows']} readings) in {stats['seconds']}s; "
+        f"{stats['reported']} reported"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+import asyncio
+import logging
+import os
+from typing import AsyncIterator, Optional
+
+logger = logging.getLogger(__name__)
+
+# Leave unset to keep pub/sub inside this process. Set to a redis:// URL to
+# fan messages out across uvicorn workers (requires the `redis` package).
+BROKER_URL = os.getenv("BROKER_URL")
+
+
+class Broker:
+    """
+    Minimal publish/subscribe interface.
+
+    Messages are plain strings published on named channels. Every subscriber
+    of a channel receives every message published after it subscribed.
+    """
+
+    async def publish(self, channel: str, message: str) -> None:
+        raise NotImplementedError
+
+    def subscribe(self, channel: str) -> AsyncIterator[str]:
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        pass
+
+
+class LocalBroker(Broker):
+    """In-process broker: fans messages out to asyncio queues, one per subscriber."""
+
+    def __init__(self, max_pending: int = 256):
+        self.max_pending = max_pending
+        self._subscribers: dict[str, set[asyncio.Queue]] = {}
+
+    async def publish(self, channel: str, message: str) -> None:
+        for queue in list(self._subscribers.get(channel, ())):
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                # A slow subscriber must not hold up the publisher; drop for it only
+                logger.warning(f"Dropping message on {channel}: subscriber queue full")
+
+    async def subscribe(self, channel: str) -> AsyncIterator[str]:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.max_pending)
+        self._subscribers.setdefault(channel, set()).add(queue)
+        try:
+            while True:
+                yield await queue.get()
+        finally:
+            subscribers = self._subscribers.get(channel)
+            if subscribers is not None:
+                subscribers.discard(queue)
+                if not subscribers:
+                    del self._subscribers[channel]
+
+
+class RedisBroker(Broker):
+    """Broker backed by Redis pub/sub, shared by every worker pointed at the same server."""
+
+    def __init__(self, url: str):
+        try:
+            import redis.asyncio as redis
+        except ImportError as err:
+            raise RuntimeError("BROKER_URL is set but the `redis` package is not installed") from err
+        self._redis = redis.from_url(url, decode_responses=True)
+
+    async def publish(self, channel: str, message: str) -> None:
+        await self._redis.publish(channel, message)
+
+    async def subscribe(self, channel: str) -> AsyncIterator[str]:
+        pubsub = self._redis.pubsub()
+        await pubsub.subscribe(channel)
+        try:
+            async for item in pubsub.listen():
+                if item["type"] == "message":
+                    yield item["data"]
+        finally:
+            await pubsub.unsubscribe(channel)
+            await pubsub.aclose()
+
+    async def close(self) -> None:
+        await self._redis.aclose()
+
+
+def create_broker(url: Optional[str] = BROKER_URL) -> Broker:
+    """Return a Redis broker when a URL is configured, otherwise an in-process one."""
+    if url:
+        logger.info("Using Redis broker for cross-worker pub/sub")
+        return RedisBroker(url)
+    return LocalBroker()
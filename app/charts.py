@@ -0,0 +1,99 @@
+"""
+Chart rendering for health reports.
+
+Uses matplotlib's object-oriented API on an Agg canvas instead of pyplot:
+one pre-styled figure is built per process and reused for every chart, and
+only the line data, labels and axis limits change between renders. This
+avoids creating and tearing down a figure, axes, tickers and fonts per chart.
+"""
+import io
+import threading
+from typing import Optional, Sequence
+
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from matplotlib.ticker import FuncFormatter, MaxNLocator
+
+FIGSIZE = (4, 3)
+DPI = 100
+# Roughly this many date labels on the x axis, however many readings there are
+X_TICKS = 5
+
+
+class ChartRenderer:
+    """
+    A reusable line chart with up to two series (e.g. systolic/diastolic).
+
+    Not thread safe by itself; use render_chart(), which serialises access
+    to the per-process renderer.
+    """
+
+    def __init__(self):
+        self.figure = Figure(figsize=FIGSIZE, dpi=DPI)
+        FigureCanvasAgg(self.figure)
+        self.axes = self.figure.add_subplot()
+        self.axes.grid(True)
+        self.axes.set_xlabel("Date")
+        (self.primary,) = self.axes.plot([], [], marker="o")
+        (self.secondary,) = self.axes.plot([], [], marker="o")
+        self.legend = None
+        self._labels: Sequence[str] = ()
+
+        # Readings are plotted against their index and labelled with their dates
+        self.axes.xaxis.set_major_locator(MaxNLocator(nbins=X_TICKS, integer=True))
+        self.axes.xaxis.set_major_formatter(FuncFormatter(self._date_label))
+        self.axes.tick_params(axis="x", labelrotation=45)
+        # Fixed margins sized for rotated YYYY-MM-DD labels; tight_layout per chart is slow
+        self.figure.subplots_adjust(left=0.2, right=0.95, top=0.9, bottom=0.33)
+
+    def _date_label(self, x, pos=None) -> str:
+        i = int(round(x))
+        return str(self._labels[i]) if 0 <= i < len(self._labels) else ""
+
+    def render(
+        self,
+        dates: Sequence,
+        y_values: Sequence,
+        title: str,
+        ylabel: str,
+        extra_y: Optional[Sequence] = None,
+        extra_label: Optional[str] = None,
+    ) -> io.BytesIO:
+        """Draw one chart and return it as a PNG buffer positioned at the start."""
+        x = range(len(dates))
+        self._labels = dates
+        self.primary.set_data(x, y_values)
+        self.primary.set_label(ylabel)
+        if extra_y is not None:
+            self.secondary.set_data(x, extra_y)
+            self.secondary.set_label(extra_label)
+        self.secondary.set_visible(extra_y is not None)
+
+        self.axes.set_title(title)
+        self.axes.set_ylabel(ylabel if not extra_label else "mmHg")
+        if extra_label:
+            self.legend = self.axes.legend()
+        elif self.legend is not None:
+            self.legend.remove()
+            self.legend = None
+
+        self.axes.relim(visible_only=True)
+        self.axes.autoscale_view()
+
+        png = io.BytesIO()
+        self.figure.savefig(png, format="png")
+        png.seek(0)
+        return png
+
+
+_renderer: Optional[ChartRenderer] = None
+_renderer_lock = threading.Lock()
+
+
+def render_chart(dates, y_values, title, ylabel, extra_y=None, extra_label=None) -> io.BytesIO:
+    """Render a line chart as PNG using this process's shared ChartRenderer."""
+    global _renderer
+    with _renderer_lock:
+        if _renderer is None:
+            _renderer = ChartRenderer()
+        return _renderer.render(dates, y_values, title, ylabel, extra_y, extra_label)
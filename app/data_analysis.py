@@ -1,74 +1,235 @@
 import numpy as np
 
-
-class dataAnalyzer(): 
-    def __init__(self): 
+# Column order of the readings matrices passed to the analyzer
+METRICS = ("avgHR", "avgSpO2", "weight", "bpS", "bpD")
+HR, SPO2, WEIGHT, BPS, BPD = range(len(METRICS))
+
+# Trend limits, per day of real time (slopes use the readings' timestamps), so
+# they hold for a week of readings and for months of daily means alike
+WEIGHT_SLOPE_LIMIT = 2
+HR_SLOPE_LIMIT = 5
+
+# Threshold rules, originally "more than 4 of 7" / "at least 4 of 7" readings.
+# Fractions of the readings (or days) where the vital was measured.
+SPO2_LOW_THRESHOLD = 94
+SPO2_LOW_FRACTION = 4 / 7
+BP_SYSTOLIC_THRESHOLD = 130
+BP_DIASTOLIC_THRESHOLD = 80
+BP_ABNORMAL_FRACTION = 4 / 7
+
+SECONDS_PER_DAY = 86400
+
+# Default time frame named in the feedback text: the dashboard's latest 7 readings
+PAST_WEEK = "in the past week"
+
+
+def to_days(timestamps) -> np.ndarray:
+    """Convert datetimes (or numpy datetime64) to float days since the first one."""
+    t = np.asarray(timestamps, dtype="datetime64[s]").astype(np.float64)
+    return (t - t[0]) / SECONDS_PER_DAY
+
+
+def compute_metrics(values, timestamps=None) -> dict:
+    """
+    Compute trend and threshold statistics for every metric at once.
+
+    Args:
+        values: 2-D array-like, readings x metrics, columns in METRICS order.
+            Missing values may be None/NaN.
+        timestamps: When each reading was taken. If omitted readings are
+            assumed to be one day apart.
+
+    Returns:
+        dict: "slope" (per day), "mean", "min", "max", "std" and "count"
+        arrays with one entry per metric, plus "low_spo2" and "high_bp"
+        counts and the number of readings "n".
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if values.ndim != 2 or values.shape[1] != len(METRICS):
+        raise ValueError(f"Expected a readings x {len(METRICS)} array, got shape {values.shape}")
+    n = values.shape[0]
+    x = np.arange(n, dtype=np.float64) if timestamps is None else to_days(timestamps)
+    x = np.broadcast_to(x[:, None], values.shape)
+
+    present = ~np.isnan(values)
+    count = present.sum(axis=0)
+    safe_count = np.maximum(count, 1)
+    v = np.where(present, values, 0.0)
+    xm = np.where(present, x, 0.0)
+
+    # Least-squares slope per column, ignoring missing values:
+    # sum((x - x̄)(y - ȳ)) / sum((x - x̄)²)
+    mean = v.sum(axis=0) / safe_count
+    x_mean = xm.sum(axis=0) / safe_count
+    dx = np.where(present, x - x_mean, 0.0)
+    dy = np.where(present, values - mean, 0.0)
+    sxx = (dx * dx).sum(axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        slope = np.where(sxx > 0, (dx * dy).sum(axis=0) / sxx, np.nan)
+        std = np.sqrt((dy * dy).sum(axis=0) / safe_count)
+
+    return {
+        "n": n,
+        "count": count,
+        "slope": slope,
+        "mean": np.where(count > 0, mean, np.nan),
+        "min": np.where(count > 0, np.where(present, values, np.inf).min(axis=0, initial=np.inf), np.nan),
+        "max": np.where(count > 0, np.where(present, values, -np.inf).max(axis=0, initial=-np.inf), np.nan),
+        "std": np.where(count > 0, std, np.nan),
+        "low_spo2": int((values[:, SPO2] <= SPO2_LOW_THRESHOLD).sum()),
+        "high_bp": int(((values[:, BPS] > BP_SYSTOLIC_THRESHOLD) & (values[:, BPD] > BP_DIASTOLIC_THRESHOLD)).sum()),
+    }
+
+
+def describe(metrics: dict, period: str = PAST_WEEK) -> str:
+    """
+    Turn the output of compute_metrics into the feedback text shown to users.
+    `period` names the time frame the readings cover, e.g. "in March 2025".
+    """
+    slope = metrics["slope"]
+    flags = compute_flags(metrics)
+
+    if flags["hr_rising"]:
+        theResponse = f"Heart rate increase {period} is too steep. Please refer to a doctor. "
+    elif slope[HR] < -HR_SLOPE_LIMIT:
+        theResponse = f"Heart rate decreased overall {period}. Cardiovascular health is getting better. "
+    else:
+        theResponse = "Heart rate trends are normal. "
+
+    if flags["low_spo2"]:
+        theResponse += f"Oxygen levels are too low {period}. Please refer to a doctor. "
+    else:
+        theResponse += "Oxygen levels are normal. "
+
+    if flags["weight_gain"]:
+        theResponse += f"Weight gain {period} is too steep. Please refer to a doctor. "
+    elif flags["weight_loss"]:
+        theResponse += f"Weight loss {period} is too steep. Please refer to a doctor. "
+    else:
+        theResponse += "Weight trends are normal. "
+
+    if flags["high_bp"]:
+        theResponse += f"Blood pressure levels are abnormal {period}. Please refer to a doctor. "
+    else:
+        theResponse += "Blood pressure levels are normal. "
+
+    return theResponse
+
+
+def compute_group_metrics(values, days, starts) -> dict:
+    """
+    compute_metrics for many patients at once.
+
+    Args:
+        values: readings x metrics array holding every patient's readings
+            back to back, each patient's rows in time order.
+        days: Per-row time in days (any origin; only differences matter).
+        starts: Index of the first row of each patient, ascending.
+
+    Returns:
+        dict: "n", "count", "slope", "mean", "low_spo2" and "high_bp", each
+        with one row per patient.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    days = np.asarray(days, dtype=np.float64)
+    starts = np.asarray(starts, dtype=np.intp)
+    n = np.diff(np.append(starts, len(values)))
+    # Shift time so each patient starts at 0, keeping the sums well conditioned
+    days = days - np.repeat(days[starts], n)
+
+    present = ~np.isnan(values)
+    v = np.where(present, values, 0.0)
+    x = np.where(present, days[:, None], 0.0)
+    count = np.add.reduceat(present, starts, axis=0)
+    sx = np.add.reduceat(x, starts, axis=0)
+    sy = np.add.reduceat(v, starts, axis=0)
+    sxx = np.add.reduceat(x * x, starts, axis=0)
+    sxy = np.add.reduceat(x * v, starts, axis=0)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        denominator = count * sxx - sx * sx
+        slope = np.where(denominator > 0, (count * sxy - sx * sy) / denominator, np.nan)
+        mean = np.where(count > 0, sy / count, np.nan)
+
+    low_spo2 = np.add.reduceat((values[:, SPO2] <= SPO2_LOW_THRESHOLD).astype(np.int64), starts)
+    high_bp = np.add.reduceat(
+        ((values[:, BPS] > BP_SYSTOLIC_THRESHOLD) & (values[:, BPD] > BP_DIASTOLIC_THRESHOLD)).astype(np.int64),
+        starts,
+    )
+    return {"n": n, "count": count, "slope": slope, "mean": mean, "low_spo2": low_spo2, "high_bp": high_bp}
+
+
+# The warnings describe() gives, as flags for reports rather than prose
+FLAG_RULES = {
+    "hr_rising": lambda m: m["slope"][..., HR] > HR_SLOPE_LIMIT,
+    "weight_gain": lambda m: m["slope"][..., WEIGHT] > WEIGHT_SLOPE_LIMIT,
+    "weight_loss": lambda m: m["slope"][..., WEIGHT] < -WEIGHT_SLOPE_LIMIT,
+    "low_spo2": lambda m: m["low_spo2"] > SPO2_LOW_FRACTION * m["count"][..., SPO2],
+    "high_bp": lambda m: (m["high_bp"] > 0) & (m["high_bp"] >= BP_ABNORMAL_FRACTION * m["count"][..., BPS]),
+}
+
+
+def compute_flags(metrics: dict) -> dict:
+    """Evaluate every FLAG_RULES entry on compute_metrics / compute_group_metrics output."""
+    return {name: np.asarray(rule(metrics)) for name, rule in FLAG_RULES.items()}
+
+
+def rows_to_arrays(rows):
+    """
+    Split rows shaped like get_data_from_user's output
+    (avgHR, avgSpO2, weight, bpS, bpD, created_at) into a values matrix and timestamps.
+    """
+    values = np.array([row[:len(METRICS)] for row in rows], dtype=np.float64).reshape(-1, len(METRICS))
+    timestamps = [row[len(METRICS)] for row in rows]
+    return values, timestamps
+
+
+class dataAnalyzer():
+    def __init__(self):
         ...
 
-    def analyze_weight(self, theWeight): 
-        theResponse = ""; 
-        theDays = [1, 2, 3, 4, 5, 6, 7]; 
-        m, b = np.polyfit(theDays, theWeight, 1); 
-
-        if(m < -2): 
-            theResponse = "Weight loss in the past week is too steep. Please refer to a doctor. "; 
-
-        if(m > 2): 
-            theResponse = "Weight gain in the past week is too steep. Please refer to a doctor. "; 
-
-        else:
-            theResponse = "Weight trends are normal. "; 
-
-        return theResponse; 
-
-
-    def analyze_avgHR(self, theHR): 
-        theResponse = ""; 
-        theDays = [1, 2, 3, 4, 5, 6, 7]; 
-        m, b = np.polyfit(theDays, theHR, 1); 
-
-        if(m < -5): 
-            theResponse = "Heart rate decreased overall in the past week. Cardiovascular health is getting better. "; 
-
-        if(m > 5): 
-            theResponse = "Heart rate increase in the past week is too steep. Please refer to a doctor. "; 
-
-        else:
-            theResponse = "Heart rate trends are normal. "; 
-
-        return theResponse; 
-
-
-    def analyze_avgSpO2(self, avgSpO2):
-        theResponse = ""; 
-        theThreshold = 94; 
-        lowValues = [x for x in avgSpO2 if x <= theThreshold]; 
-
-        if(len(lowValues) > 4): 
-            theResponse = "Oxygen levels are too low in the past week. Please refer to a doctor. "; 
-
-        else:
-            theResponse = "Oxygen levels are normal. "; 
-
-        return theResponse; 
-
-
-    def analyze_blood_pressure(self, bpS, bpD):
-        theResponse = ""; 
-        theThreshold_bpS = 130; 
-        theThreshold_bpD = 80; 
-        unhealthyCount = 0; 
-
-        for i in range(7): 
-            if(bpS[i] > theThreshold_bpS and bpD[i] > theThreshold_bpD): 
-                unhealthyCount += 1; 
-
-        if(unhealthyCount >= 4): 
-            theResponse = "Blood pressure levels are abnormal in the past week. Please refer to a doctor. "; 
-
-        else:
-            theResponse = "Blood pressure levels are normal. "; 
-
-        return theResponse; 
-
-
+    def analyze(self, values, timestamps=None, period: str = PAST_WEEK) -> str:
+        """Feedback text for a readings x metrics matrix of any length, covering `period`."""
+        return describe(compute_metrics(values, timestamps), period)
+
+    def analyze_rows(self, rows) -> str:
+        """Feedback text for rows as returned by get_data_from_user, using their real timestamps."""
+        return self.analyze(*rows_to_arrays(rows))
+
+    # Single-metric helpers kept for existing callers; each reading is taken as one day apart.
+
+    def analyze_weight(self, theWeight, period: str = PAST_WEEK):
+        m = _single_metric_slope(theWeight)
+        if m > WEIGHT_SLOPE_LIMIT:
+            return f"Weight gain {period} is too steep. Please refer to a doctor. "
+        if m < -WEIGHT_SLOPE_LIMIT:
+            return f"Weight loss {period} is too steep. Please refer to a doctor. "
+        return "Weight trends are normal. "
+
+    def analyze_avgHR(self, theHR, period: str = PAST_WEEK):
+        m = _single_metric_slope(theHR)
+        if m > HR_SLOPE_LIMIT:
+            return f"Heart rate increase {period} is too steep. Please refer to a doctor. "
+        if m < -HR_SLOPE_LIMIT:
+            return f"Heart rate decreased overall {period}. Cardiovascular health is getting better. "
+        return "Heart rate trends are normal. "
+
+    def analyze_avgSpO2(self, avgSpO2, period: str = PAST_WEEK):
+        values = np.asarray(avgSpO2, dtype=np.float64)
+        if (values <= SPO2_LOW_THRESHOLD).sum() > SPO2_LOW_FRACTION * len(values):
+            return f"Oxygen levels are too low {period}. Please refer to a doctor. "
+        return "Oxygen levels are normal. "
+
+    def analyze_blood_pressure(self, bpS, bpD, period: str = PAST_WEEK):
+        bpS = np.asarray(bpS, dtype=np.float64)
+        bpD = np.asarray(bpD, dtype=np.float64)
+        unhealthyCount = ((bpS > BP_SYSTOLIC_THRESHOLD) & (bpD > BP_DIASTOLIC_THRESHOLD)).sum()
+        if unhealthyCount >= BP_ABNORMAL_FRACTION * len(bpS):
+            return f"Blood pressure levels are abnormal {period}. Please refer to a doctor. "
+        return "Blood pressure levels are normal. "
+
+
+def _single_metric_slope(values) -> float:
+    column = np.full((len(values), len(METRICS)), np.nan)
+    column[:, 0] = np.asarray(values, dtype=np.float64)
+    return compute_metrics(column)["slope"][0]
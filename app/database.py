@@ -1,13 +1,23 @@
 import os
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
 from fastapi import HTTPException
-import mysql.connector
 from dotenv import load_dotenv
 import time
 import logging
-from typing import Optional
-from mysql.connector import Error
+from typing import Awaitable, Callable, Iterable, Optional, TypeVar
 import uuid
-import random 
+from datetime import datetime
+from app.cache import TTLCache
+from app.metrics import observe_db_call
+from app.storage import (
+    DATA_FIELDS,
+    ROLLUP_RESOLUTIONS,
+    DatabaseConnectionError,
+    Storage,
+    create_storage,
+)
 
 # Load environment variables
 load_dotenv()
@@ -15,333 +25,190 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-class DatabaseConnectionError(Exception):
-    """Custom exception for database connection failures"""
-    pass
+# Startup retries while the database boots: 12 retries = 1 minute total
+DB_CONNECT_RETRIES = int(os.getenv("DB_CONNECT_RETRIES", "12"))
+DB_CONNECT_RETRY_DELAY = float(os.getenv("DB_CONNECT_RETRY_DELAY", "5"))
+# Per-call retries when a connection cannot be obtained while serving requests
+DB_CALL_RETRIES = int(os.getenv("DB_CALL_RETRIES", "3"))
+DB_CALL_RETRY_DELAY = float(os.getenv("DB_CALL_RETRY_DELAY", "0.25"))
 
-# Database connection settings
-DB_CONFIG = {
-    "host": os.getenv("MYSQL_HOST"),
-    "user": os.getenv("MYSQL_USER"),
-    "password": os.getenv("MYSQL_PASSWORD"),
-    "database": os.getenv("MYSQL_DATABASE"),
-    "port": os.getenv("MYSQL_PORT"),
-    # "ssl_ca": os.getenv('MYSQL_SSL_CA'),
-    # "ssl_verify_identity": True
-}
+# Session id -> {"user_id", "username"} for the auth check on every request
+SESSION_CACHE_SIZE = int(os.getenv("SESSION_CACHE_SIZE", "10000"))
+SESSION_CACHE_TTL = float(os.getenv("SESSION_CACHE_TTL", "300"))
+
+T = TypeVar("T")
+
+session_cache = TTLCache(maxsize=SESSION_CACHE_SIZE, ttl=SESSION_CACHE_TTL)
+
+# Device serial number -> username, used to attribute incoming readings without
+# a query. Loaded at startup by load_serial_index and kept current by
+# create_user, create_device and delete_device; misses fall back to the database.
+serial_index: dict[str, str] = {}
+
+# Awaited with the readings just stored, after the write has committed. Each is
+# a dict with username, the DATA_FIELDS and created_at (None for "now"). Used to
+# invalidate caches derived from the data table and to push live updates.
+data_change_listeners: list[Callable[[list[dict]], Awaitable[None]]] = []
+
+# The backend behind every helper below, chosen by STORAGE_BACKEND. Replace it
+# before init_db_pool to run the app on another one.
+storage: Storage = create_storage()
 
 
 def generate_serial_number() -> str:
     """Generate a unique serial number."""
     return f"MH-{uuid.uuid4().hex[:8].upper()}"
 
-def get_db_connection(
-    max_retries: int = 12,  # 12 retries = 1 minute total (12 * 5 seconds)
-    retry_delay: int = 5,  # 5 seconds between retries
-) -> mysql.connector.MySQLConnection:
-    """Create database connection with retry mechanism."""
-    connection: Optional[mysql.connector.MySQLConnection] = None
-    attempt = 1
-    last_error = None
 
-    while attempt <= max_retries:
-        try:
-            connection = mysql.connector.connect(
-                host=DB_CONFIG["host"],
-                user=DB_CONFIG["user"],
-                port=DB_CONFIG["port"],
-                password=DB_CONFIG["password"],
-                database=DB_CONFIG["database"],
-                # ssl_ca=DB_CONFIG["ssl_ca"],
-                # ssl_verify_identity=True
-            )
+_executor: Optional[ThreadPoolExecutor] = None
 
-            # Test the connection
-            connection.ping(reconnect=True, attempts=1, delay=0)
-            logger.info("Database connection established successfully")
-            return connection
 
-        except Error as err:
-            last_error = err
-            logger.warning(
-                f"Connection attempt {attempt}/{max_retries} failed: {err}. "
-                f"Retrying in {retry_delay} seconds..."
-            )
+def _get_executor() -> ThreadPoolExecutor:
+    """
+    Thread pool that runs the blocking storage calls.
 
-            if connection is not None:
-                try:
-                    connection.close()
-                except Exception:
-                    pass
-
-            if attempt == max_retries:
-                break
-
-            time.sleep(retry_delay)
-            attempt += 1
-
-    raise DatabaseConnectionError(
-        f"Failed to connect to database after {max_retries} attempts. "
-        f"Last error: {last_error}"
-    )
-    
-async def setup_database(initial_users: dict = None, initial_user_devices: dict = None, initial_devices: dict = None, initial_data: dict = None):
-    """Creates user and session tables and populates initial user data if provided."""
-    connection = None
-    cursor = None
-
-    # Define table schemas
-    table_schemas = {
-        "users": """
-            CREATE TABLE users (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                first_name VARCHAR(255) NOT NULL,
-                last_name VARCHAR(255) NOT NULL,
-                username VARCHAR(255) NOT NULL UNIQUE,
-                password VARCHAR(255) NOT NULL,
-                email VARCHAR(255) NOT NULL UNIQUE,
-                serial_num VARCHAR(255) UNIQUE DEFAULT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """,
-        "sessions": """
-            CREATE TABLE sessions (
-                id VARCHAR(36) PRIMARY KEY,
-                user_id INT NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
-            )
-        """,
-        "devices": """
-            CREATE TABLE devices (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                username VARCHAR(255) DEFAULT NULL,
-                serial_num VARCHAR(255) NOT NULL UNIQUE,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (username) REFERENCES users(username) ON DELETE CASCADE
-            )
-        """,
-        "data": """
-            CREATE TABLE data (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                username VARCHAR(255) NOT NULL,
-                serial_num VARCHAR(255) NOT NULL,
-                avgHR INT DEFAULT NULL,
-                avgSpO2 INT DEFAULT NULL,
-                weight INT DEFAULT NULL,
-                bpS INT DEFAULT NULL,
-                bpD INT DEFAULT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """
-    }
+    It has one worker per call the backend can serve at once (for MySQL, one
+    per pooled connection), so a worker never sits waiting for a connection.
+    """
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=storage.threads, thread_name_prefix="db")
+    return _executor
+
+
+
+
+async def run_db(
+    func: Callable[..., T],
+    *args,
+    retries: int = DB_CALL_RETRIES,
+    retry_delay: float = DB_CALL_RETRY_DELAY,
+) -> T:
+    """
+    Run a blocking database function on the DB thread pool.
+
+    Functions marked with app.storage.nonblocking (the in-memory backend) are
+    called directly instead: a hop to a thread would cost more than the call.
+
+    If no connection can be obtained the call is retried with exponential
+    backoff. The backoff is awaited on the event loop, so a struggling
+    database never blocks a worker thread or any other request. Errors raised
+    after a connection was obtained are not retried.
 
+    Every call is timed (retries included) and counted towards the current
+    request's database use in app.metrics.
+    """
+    loop = asyncio.get_running_loop()
+    call = functools.partial(func, *args)
+    blocking = getattr(func, "blocking", True)
+    attempt = 1
+    began = time.perf_counter()
+    failed = True
     try:
-        # Get database connection
-        connection = get_db_connection()
-        cursor = connection.cursor()
-
-        # Check if tables already exist and clear sessions only if they do
-        cursor.execute("SHOW TABLES")
-        existing_tables = [table[0] for table in cursor.fetchall()]
-        if all(table in existing_tables for table in table_schemas.keys()):
-            logger.info("Tables already exist. Clearing sessions table...")
-            cursor.execute("DELETE FROM sessions")
-            connection.commit()
-            return
-        else:
-            logger.info("Tables do not exist. Proceeding to drop and recreate tables...")
-            
-        # Recreate tables one by one
-        for table_name, create_query in table_schemas.items():
+        while True:
             try:
-                # Create table
-                logger.info(f"Creating table {table_name}...")
-                cursor.execute(create_query)
-                connection.commit()
-                logger.info(f"Table {table_name} created successfully")
-
-            except Error as e:
-                logger.error(f"Error creating table {table_name}: {e}")
-                raise
+                if blocking:
+                    result = await loop.run_in_executor(_get_executor(), call)
+                else:
+                    result = call()
+                failed = False
+                return result
+            except DatabaseConnectionError as err:
+                if attempt >= retries:
+                    raise
+                logger.warning(
+                    f"Database call {func.__name__} failed to connect "
+                    f"(attempt {attempt}/{retries}): {err}. Retrying in {retry_delay}s..."
+                )
+                await asyncio.sleep(retry_delay)
+                retry_delay *= 2
+                attempt += 1
+    finally:
+        observe_db_call(func.__name__.lstrip("_"), time.perf_counter() - began, failed)
 
-        # Insert initial users if provided
-        if initial_users:
-            try:
-                insert_query = "INSERT INTO users (first_name, last_name, email, username, password, serial_num) VALUES (%s, %s, %s, %s, %s, %s)"
-                for username, (first_name, last_name, email, username, password, serial_num) in initial_users.items():
-                    cursor.execute(insert_query, (first_name, last_name, email, username, password, serial_num))
-                connection.commit()
-                logger.info(f"Inserted {len(initial_users)} initial users")
-            except Error as e:
-                logger.error(f"Error inserting initial users: {e}")
-                raise
-        
-        if initial_user_devices:
-            try:
-                insert_query = "INSERT INTO devices (username, serial_num) VALUES (%s, %s)"
-                for username, serial in initial_user_devices:
-                    cursor.execute(insert_query, (username, serial))
-                connection.commit()
-                logger.info(f"Inserted {len(initial_user_devices)} preloaded devices with users")
-            except Error as e:
-                logger.error(f"Error inserting initial devices: {e}")
-                raise
-            
-        if initial_devices:
-            try:
-                insert_query = "INSERT INTO devices (serial_num) VALUES (%s)"
-                for serial in initial_devices:
-                    cursor.execute(insert_query, (serial,))
-                connection.commit()
-                logger.info(f"Inserted {len(initial_devices)} preloaded devices without users")
-            except Error as e:
-                logger.error(f"Error inserting initial devices: {e}")
-                raise
-        
-        initial_data = True; 
-        if initial_data: 
-            try:
-                print("Adding data !"); 
-                insert_query = """
-                INSERT INTO data (username, serial_num, avgHR, avgSpO2, weight, bpS, bpD, created_at) VALUES ('alice', 'MH-830B35DF', %s, %s, %s, %s, %s, %s);
-                """; 
-
-                for i in range(10): 
-                    rand_avgHR = random.randrange(60, 100); 
-                    rand_avgSpO2 = random.randrange(95, 100); 
-                    rand_weight = random.randrange(150, 155); 
-                    rand_bpS = random.randrange(115, 120); 
-                    rand_bpD = random.randrange(75, 80); 
-                    sequential_date = f"2025-01-{i+1} 00:00:00";
-                    
-                    cursor.execute(insert_query, (rand_avgHR, rand_avgSpO2, rand_weight, rand_bpS, rand_bpD, sequential_date)); 
-
-                logger.info("Inserted initial data for user 'alice' with random values");
-                
-                # Insert data for user 'bob'
-                insert_query = """
-                INSERT INTO data (username, serial_num, avgHR, avgSpO2, weight, bpS, bpD, created_at) VALUES ('bob', 'MH-EAF7EF67', %s, %s, %s, %s, %s, %s);
-                """;
-                for i in range(10):
-                    rand_avgHR = random.randrange(120, 150); 
-                    rand_avgSpO2 = random.randrange(80, 85); 
-                    rand_weight = random.randrange(150 + i*2, 155 + i*2);
-                    rand_bpS = random.randrange(115, 120); 
-                    rand_bpD = random.randrange(90, 95); 
-                    sequential_date = f"2025-02-{i+1} 00:00:00";
-                    
-                    cursor.execute(insert_query, (rand_avgHR, rand_avgSpO2, rand_weight, rand_bpS, rand_bpD, sequential_date));
-                logger.info("Inserted initial data for user 'bob' with random values");
-                connection.commit();
-
-            except Error as e:
-                logger.error(f"Error inserting initial data: {e}")
+
+async def init_db_pool() -> Storage:
+    """
+    Connect the storage backend. Called once from the app lifespan.
+
+    Waits for the database to come up, retrying every DB_CONNECT_RETRY_DELAY
+    seconds without blocking the event loop.
+    """
+    for attempt in range(1, DB_CONNECT_RETRIES + 1):
+        try:
+            await run_db(storage.open, retries=1)
+            break
+        except DatabaseConnectionError as err:
+            if attempt == DB_CONNECT_RETRIES:
                 raise
+            logger.warning(
+                f"Database pool startup attempt {attempt}/{DB_CONNECT_RETRIES} failed: {err}. "
+                f"Retrying in {DB_CONNECT_RETRY_DELAY} seconds..."
+            )
+            await asyncio.sleep(DB_CONNECT_RETRY_DELAY)
+    return storage
 
 
-    except Exception as e:
-        logger.error(f"Database setup failed: {e}")
-        raise
+async def close_db_pool() -> None:
+    """Close the storage backend and the DB worker threads on shutdown."""
+    global _executor
+    storage.close()
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
 
-    finally:
-        if cursor:
-            cursor.close()
-        if connection and connection.is_connected():
-            connection.close()
-            logger.info("Database connection closed")
+
+def pool_stats() -> dict:
+    """Connections held by the storage backend (open and idle), for monitoring."""
+    return storage.stats()
+
+
+async def setup_database(seed: Optional[Callable[[], dict]] = None) -> bool:
+    """
+    Creates the tables if they do not exist yet and applies migrations.
+
+    Args:
+        seed: Called only when the tables were just created, to build initial
+            rows to insert (see app.seed.initial_seed for the shape). Being lazy
+            keeps its cost, e.g. password hashing, off every other startup.
+
+    Returns:
+        bool: True if the tables were just created
+    """
+    created = await run_db(storage.setup, seed)
+    session_cache.clear()
+    return created
 
 # Database utility functions for user and session management
 async def get_user_by_username(username: str) -> Optional[dict]:
     """
     Retrieve user from database by username.
     """
-    connection = None
-    cursor = None
-    try:
-        connection = get_db_connection()
-        cursor = connection.cursor(dictionary=True)
-        cursor.execute("SELECT * FROM users WHERE username = %s", (username,))
-        return cursor.fetchone()
-    finally:
-        if cursor:
-            cursor.close()
-        if connection and connection.is_connected():
-            connection.close()
+    return await run_db(storage.get_user_by_username, username)
 
 async def get_user_by_id(user_id: int) -> Optional[dict]:
     """
     Retrieve user from database by ID.
     """
-    connection = None
-    cursor = None
-    try:
-        connection = get_db_connection()
-        cursor = connection.cursor(dictionary=True)
-        cursor.execute("SELECT * FROM users WHERE id = %s", (user_id,))
-        return cursor.fetchone()
-    finally:
-        if cursor:
-            cursor.close()
-        if connection and connection.is_connected():
-            connection.close()
+    return await run_db(storage.get_user_by_id, user_id)
 
 async def get_user_by_serial_num(serial_num: str) -> Optional[dict]:
     """
     Retrieve user from database by device serial number.
     """
-    connection = None
-    cursor = None
-    try:
-        connection = get_db_connection()
-        cursor = connection.cursor(dictionary=True)
-        cursor.execute("SELECT * FROM users WHERE serial_num = %s", (serial_num,))
-        return cursor.fetchone()
-    finally:
-        if cursor:
-            cursor.close()
-        if connection and connection.is_connected():
-            connection.close()
+    return await run_db(storage.get_user_by_serial_num, serial_num)
 
-async def get_device_by_username(username: str) -> Optional[dict]:
+async def get_device_by_username(username: str) -> list[dict]:
     """
     Retrieve device from database by username.
     """
-    connection = None
-    cursor = None
-    try:
-        connection = get_db_connection()
-        cursor = connection.cursor(dictionary=True)
-        cursor.execute("SELECT * FROM devices WHERE username = %s", (username,))
-        print("success")
-        return cursor.fetchall()
-    finally:
-        if cursor:
-            cursor.close()
-        if connection and connection.is_connected():
-            connection.close() 
+    return await run_db(storage.get_device_by_username, username)
 
-async def get_device_by_serial_num(serial_num: str) -> Optional[dict]:        
+async def get_device_by_serial_num(serial_num: str) -> Optional[dict]:
     """
     Retrieve device from database by device mac.
     """
-    connection = None
-    cursor = None
-    try:
-        connection = get_db_connection()
-        cursor = connection.cursor(dictionary=True)
-        cursor.execute("SELECT * FROM devices WHERE serial_num = %s", (serial_num,))
-        return cursor.fetchone()
-    finally:
-        if cursor:
-            cursor.close()
-        if connection and connection.is_connected():
-            connection.close()
-            
-def get_unassigned_serial(cursor) -> Optional[str]:
-    cursor.execute("SELECT serial_num FROM devices WHERE username IS NULL LIMIT 1")
-    result = cursor.fetchone()
-    return result[0] if result else None
+    return await run_db(storage.get_device_by_serial_num, serial_num)
 
 async def create_user(username: str, first_name: str, last_name: str, email: str, password: str) -> Optional[int]:
     """
@@ -350,45 +217,14 @@ async def create_user(username: str, first_name: str, last_name: str, email: str
     Returns:
         int: The ID of the newly created user
     """
-    connection = None
-    cursor = None
-    try:
-        connection = get_db_connection()
-        cursor = connection.cursor()
-
-        # Fetch an available unassigned serial number
-        cursor.execute("SELECT serial_num FROM devices WHERE username IS NULL LIMIT 1")
-        serial_result = cursor.fetchone()
-        serial_num = serial_result[0] if serial_result else None
-        
-        if not serial_num:
-            raise HTTPException(status_code=500, detail="No available device to assign.")
-
-        # Insert the user with the serial number if available
-        insert_query = """
-            INSERT INTO users (first_name, last_name, email, username, password, serial_num)
-            VALUES (%s, %s, %s, %s, %s, %s)
-        """
-        cursor.execute(insert_query, (first_name, last_name, email, username, password, serial_num))
-        connection.commit()
-        user_id = cursor.lastrowid
-        logger.info(f"User {username} created successfully with serial number {serial_num}")
-
-        # Update the devices table to assign the serial number to the user
-        if serial_num:
-            cursor.execute(
-                "UPDATE devices SET username = %s WHERE serial_num = %s", (username, serial_num)
-            )
-            connection.commit()
-
-        return user_id
+    created = await run_db(storage.create_user, username, first_name, last_name, email, password)
+    if created is None:
+        raise HTTPException(status_code=500, detail="No available device to assign.")
+    user_id, serial_num = created
+    serial_index[serial_num] = username
+    logger.info(f"User {username} created successfully with serial number {serial_num}")
+    return user_id
 
-    finally:
-        if cursor:
-            cursor.close()
-        if connection and connection.is_connected():
-            connection.close()
-            
 async def create_device(username: str, serial_num: str) -> Optional[int]:
     """
     Create a new device in the database.
@@ -400,163 +236,194 @@ async def create_device(username: str, serial_num: str) -> Optional[int]:
     Returns:
         int: The ID of the newly registered device
     """
-    connection = None
-    cursor = None
-    try:
-        connection = get_db_connection()
-        cursor = connection.cursor()
-        cursor.execute(
-            "INSERT INTO devices (username, serial_num) VALUES (%s, %s)", (username, serial_num)
-        )
-        connection.commit()
-        return cursor.lastrowid
-    finally:
-        if cursor:
-            cursor.close()
-        if connection and connection.is_connected():
-            connection.close()
-            
-async def delete_device(device_id: int) -> None:
+    device_id = await run_db(storage.create_device, username, serial_num)
+    if username:
+        serial_index[serial_num] = username
+    return device_id
+
+async def delete_device(device_id: int) -> bool:
     """
     Delete a device from the database given the device id.
     """
-    connection = None
-    cursor = None
-    try:
-        connection = get_db_connection()
-        cursor = connection.cursor()
-        cursor.execute(
-            "DELETE FROM devices WHERE id = %s", (device_id,)
-        )
-        connection.commit()
-        return True
-    finally:
-        if cursor:
-            cursor.close()
-        if connection and connection.is_connected():
-            connection.close()
+    serial_num = await run_db(storage.delete_device, device_id)
+    if serial_num is not None:
+        serial_index.pop(serial_num, None)
+    return True
 
 async def create_session(user_id: int, session_id: str) -> bool:
     """
     Create a new session in the database.
     """
-    connection = None
-    cursor = None
-    try:
-        connection = get_db_connection()
-        cursor = connection.cursor()
-        cursor.execute(
-            "INSERT INTO sessions (id, user_id) VALUES (%s, %s)", (session_id, user_id)
-        )
-        connection.commit()
-        return True
-    finally:
-        if cursor:
-            cursor.close()
-        if connection and connection.is_connected():
-            connection.close()
+    return await run_db(storage.create_session, user_id, session_id)
 
 async def get_session(session_id: str) -> Optional[dict]:
     """
     Retrieve session from database.
     """
-    connection = None
-    cursor = None
-    try:
-        connection = get_db_connection()
-        cursor = connection.cursor(dictionary=True)
-        cursor.execute(
-            """
-            SELECT *
-            FROM sessions s
-            WHERE s.id = %s
-            
-        """,
-            (session_id,),
-        )
-        return cursor.fetchone()
-    finally:
-        if cursor:
-            cursor.close()
-        if connection and connection.is_connected():
-            connection.close()
+    return await run_db(storage.get_session, session_id)
+
+async def get_session_user(session_id: Optional[str]) -> Optional[dict]:
+    """
+    Resolve a session id to {"user_id": ..., "username": ...}.
+
+    Served from the session cache when possible; a miss costs one joined query.
+    """
+    if not session_id:
+        return None
+    session_user = session_cache.get(session_id)
+    if session_user is None:
+        session_user = await run_db(storage.get_session_user, session_id)
+        if session_user is not None:
+            session_cache.set(session_id, session_user)
+    return session_user
+
+def invalidate_session(session_id: str) -> None:
+    """Drop a session from this worker's session cache."""
+    session_cache.pop(session_id)
 
 async def delete_session(session_id: str) -> bool:
     """
     Delete a session from the database.
     """
-    connection = None
-    cursor = None
-    try:
-        connection = get_db_connection()
-        cursor = connection.cursor()
-        cursor.execute("DELETE FROM sessions WHERE id = %s", (session_id,))
-        connection.commit()
-        return True
-    finally:
-        if cursor:
-            cursor.close()
-        if connection and connection.is_connected():
-            connection.close()
+    invalidate_session(session_id)
+    return await run_db(storage.delete_session, session_id)
+
+async def _notify_data_changed(readings: list[dict]) -> None:
+    for listener in data_change_listeners:
+        try:
+            await listener(readings)
+        except Exception as e:
+            logger.error(f"Data change listener failed: {e}")
 
 async def add_data_to_user(username: str, data: dict) -> bool:
     """
     Add additional data to a user in the database.
     """
-    connection = None
-    cursor = None
-    try:
-        connection = get_db_connection()
-        cursor = connection.cursor()
-        cursor.execute(
-            """
-            INSERT INTO data (username, serial_num, avgHR, avgSpO2, weight, bpS, bpD)
-            VALUES (%s, %s, %s, %s, %s, %s, %s)
-            """,
-            (
-                username.get("username"),
-                data.get("serial_num"),
-                data.get("avgHR"),
-                data.get("avgSpO2"),
-                data.get("weight"),
-                data.get("bpS"),
-                data.get("bpD"),
-            ),
-        )
-        connection.commit()
-        return True
-    finally:
-        if cursor:
-            cursor.close()
-        if connection and connection.is_connected():
-            connection.close()
+    reading = {
+        "username": username,
+        "serial_num": data.get("serial_num"),
+        **{field: data.get(field) for field in DATA_FIELDS},
+        "created_at": None,
+    }
+    await run_db(storage.add_readings, [reading])
+    await _notify_data_changed([reading])
+    return True
 
 
 async def get_data_from_user(username: str):
     """
     Get data for a user from the database 
     """
-    connection = None
-    cursor = None
-    try:
-        connection = get_db_connection(); 
-        cursor = connection.cursor(); 
-        cursor.execute("""
-            SELECT *
-            FROM (
-                SELECT avgHR, avgSpO2, weight, bpS, bpD, created_at
-                FROM data
-                WHERE username = %s
-                ORDER BY created_at DESC
-                LIMIT 7
-            ) AS recent_data
-            ORDER BY created_at ASC;
-        """, (username,))
-
-        return cursor.fetchall(); 
+    return await run_db(storage.get_recent_data, username)
 
-    finally:
-        if cursor:
-            cursor.close()
-        if connection and connection.is_connected():
-            connection.close()
+
+async def get_usernames_by_serial_nums(serial_nums: Iterable[str]) -> dict:
+    """
+    Map device serial numbers to the usernames they are registered to.
+
+    Serial numbers that do not belong to any user are left out.
+    """
+    usernames = {}
+    missing = []
+    for serial_num in serial_nums:
+        username = serial_index.get(serial_num)
+        if username is None:
+            missing.append(serial_num)
+        else:
+            usernames[serial_num] = username
+    if missing:
+        found = await run_db(storage.get_usernames_by_serial_nums, missing)
+        serial_index.update(found)
+        usernames.update(found)
+    return usernames
+
+
+async def get_username_by_serial_num(serial_num: str) -> Optional[str]:
+    """
+    Return the username a device serial number is registered to, or None.
+    """
+    username = serial_index.get(serial_num)
+    if username is None:
+        username = (await get_usernames_by_serial_nums([serial_num])).get(serial_num)
+    return username
+
+
+async def load_serial_index() -> int:
+    """
+    (Re)build the serial number index from the users and devices tables.
+
+    Returns:
+        int: The number of registered serial numbers
+    """
+    index = await run_db(storage.load_serial_index)
+    serial_index.clear()
+    serial_index.update(index)
+    logger.info(f"Loaded {len(index)} device serial numbers into the serial index")
+    return len(index)
+
+async def add_readings(readings: list[dict]) -> int:
+    """
+    Store many readings in a single transaction.
+
+    Each reading is a dict with username, serial_num, avgHR, avgSpO2, weight,
+    bpS, bpD and an optional created_at (defaults to the insert time).
+
+    Returns:
+        int: The number of rows inserted
+    """
+    if not readings:
+        return 0
+    inserted = await run_db(storage.add_readings, readings)
+    await _notify_data_changed(readings)
+    return inserted
+
+async def get_data_page(
+    username: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    after: Optional[tuple] = None,
+    fields: Iterable[str] = DATA_FIELDS,
+    limit: int = 100,
+    descending: bool = False,
+) -> list[dict]:
+    """
+    Get one page of a user's readings in time order, using keyset pagination.
+
+    Args:
+        username (str): Whose readings to fetch
+        start (datetime): Only readings at or after this time
+        end (datetime): Only readings before this time
+        after (tuple): (created_at, id) of the last row of the previous page
+        fields (Iterable[str]): Which of DATA_FIELDS to return
+        limit (int): Maximum number of rows
+        descending (bool): Newest first instead of oldest first
+
+    Returns:
+        list[dict]: Rows with id, created_at and the requested fields
+    """
+    fields = [field for field in DATA_FIELDS if field in set(fields)]
+    return await run_db(storage.get_data_page, username, start, end, after, fields, limit, descending)
+
+
+async def get_rollups(
+    username: str,
+    resolution: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+) -> list[dict]:
+    """
+    Get a user's pre-aggregated readings per hour or day.
+
+    Args:
+        username (str): Whose readings to fetch
+        resolution (str): "hour" or "day"
+        start (datetime): Only buckets at or after this time
+        end (datetime): Only buckets before this time
+
+    Returns:
+        list[dict]: One row per bucket, oldest first, with bucket, readings and
+        <field>_min, <field>_max, <field>_mean, <field>_count for each vital
+    """
+    if resolution not in ROLLUP_RESOLUTIONS:
+        raise ValueError(f"Unknown rollup resolution: {resolution}")
+    return await run_db(storage.get_rollups, username, resolution, start, end)
@@ -0,0 +1,153 @@
+import asyncio
+import logging
+import os
+from typing import Awaitable, Callable, Optional
+
+from app.storage import DatabaseConnectionError
+
+logger = logging.getLogger(__name__)
+
+# Write-behind ingestion is opt-in: device POSTs are acknowledged once queued
+INGEST_WRITE_BEHIND = os.getenv("INGEST_WRITE_BEHIND", "0") == "1"
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "10000"))
+INGEST_FLUSH_ROWS = int(os.getenv("INGEST_FLUSH_ROWS", "200"))
+INGEST_FLUSH_INTERVAL_MS = int(os.getenv("INGEST_FLUSH_INTERVAL_MS", "250"))
+# How long a request may wait for room in a full queue before it is turned away
+INGEST_ENQUEUE_TIMEOUT = float(os.getenv("INGEST_ENQUEUE_TIMEOUT", "1.0"))
+INGEST_RETRY_DELAY = float(os.getenv("INGEST_RETRY_DELAY", "1.0"))
+# Write attempts per batch once shutdown has started, so a dead database cannot hang it
+INGEST_SHUTDOWN_ATTEMPTS = 5
+
+
+class IngestQueue:
+    """
+    Buffers readings in memory and commits them in groups.
+
+    A background task writes a batch as soon as `flush_rows` readings are
+    waiting or `flush_interval_ms` has passed since the first one arrived.
+    `put` applies backpressure: when the queue is full it waits up to
+    `enqueue_timeout` seconds for room and then reports failure. `stop`
+    drains everything still queued before returning.
+    """
+
+    def __init__(
+        self,
+        write: Callable[[list[dict]], Awaitable[int]],
+        max_size: int = INGEST_QUEUE_SIZE,
+        flush_rows: int = INGEST_FLUSH_ROWS,
+        flush_interval_ms: int = INGEST_FLUSH_INTERVAL_MS,
+        enqueue_timeout: float = INGEST_ENQUEUE_TIMEOUT,
+        retry_delay: float = INGEST_RETRY_DELAY,
+    ):
+        self._write = write
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_size)
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval_ms / 1000
+        self.enqueue_timeout = enqueue_timeout
+        self.retry_delay = retry_delay
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self.rows_written = 0
+        self.rows_dropped = 0
+
+    def start(self) -> None:
+        """Start the background flusher."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="ingest-flusher")
+            logger.info(
+                f"Write-behind ingestion started (flush every {self.flush_rows} rows "
+                f"or {self.flush_interval * 1000:.0f} ms)"
+            )
+
+    async def put(self, reading: dict) -> bool:
+        """Queue one reading. Returns False if the queue stayed full (caller should retry later)."""
+        if self._stopping:
+            return False
+        try:
+            self._queue.put_nowait(reading)
+            return True
+        except asyncio.QueueFull:
+            pass
+        try:
+            await asyncio.wait_for(self._queue.put(reading), self.enqueue_timeout)
+            return True
+        except asyncio.TimeoutError:
+            logger.warning("Ingestion queue is full; rejecting reading")
+            return False
+
+    def qsize(self) -> int:
+        return self._queue.qsize()
+
+    async def stop(self) -> None:
+        """Stop accepting readings, flush everything queued and wait for the flusher to finish."""
+        self._stopping = True
+        if self._task is not None:
+            # Wake the flusher if it is idle so it notices we are stopping
+            if not self._queue.full():
+                self._queue.put_nowait(None)
+            await self._task
+            self._task = None
+        logger.info(f"Write-behind ingestion stopped ({self.rows_written} rows written)")
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            first = await self._queue.get()
+            batch = [] if first is None else [first]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.flush_rows:
+                if self._stopping:
+                    # Draining: take whatever is queued without waiting
+                    if self._queue.empty():
+                        break
+                    item = self._queue.get_nowait()
+                else:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self._queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                if item is not None:
+                    batch.append(item)
+
+            if batch:
+                await self._flush(batch)
+            if self._stopping and self._queue.empty():
+                return
+
+    async def _flush(self, batch: list[dict]) -> None:
+        """
+        Write one batch, retrying until it is committed so no reading is lost
+        while the database is unreachable.
+
+        Any other error is blamed on the rows: the batch is split in halves and
+        each written on its own, so a bad reading is dropped (and logged) alone
+        instead of blocking the queue forever.
+        """
+        delay = self.retry_delay
+        shutdown_attempts = 0
+        while True:
+            try:
+                self.rows_written += await self._write(batch)
+                return
+            except DatabaseConnectionError as e:
+                if self._stopping:
+                    shutdown_attempts += 1
+                    if shutdown_attempts >= INGEST_SHUTDOWN_ATTEMPTS:
+                        logger.error(f"Giving up on {len(batch)} queued readings during shutdown: {e}")
+                        return
+                logger.error(f"Failed to write {len(batch)} queued readings: {e}. Retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30)
+            except Exception as e:
+                if len(batch) == 1:
+                    logger.error(f"Dropping queued reading that cannot be stored: {e}. Reading: {batch[0]}")
+                    self.rows_dropped += 1
+                    return
+                logger.warning(f"Failed to write {len(batch)} queued readings: {e}. Writing them in halves")
+                middle = len(batch) // 2
+                await self._flush(batch[:middle])
+                await self._flush(batch[middle:])
+                return
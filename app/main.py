@@ -1,35 +1,50 @@
-import mysql.connector
-from fastapi import FastAPI, Request, Response, HTTPException, status
-from fastapi.responses import FileResponse, HTMLResponse, JSONResponse, RedirectResponse
+import time
+# Taken before the heavy imports below so startup can report the full cold-start time
+_import_started = time.perf_counter()
+
+from fastapi import FastAPI, Request, Response, HTTPException, Query
+from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
-from pydantic import BaseModel
+from pydantic import ValidationError
 from dotenv import load_dotenv
+import asyncio
+import base64
+import binascii
+import hashlib
+import json
+import logging
 import uuid
-from contextlib import asynccontextmanager
+from collections import Counter
+from contextlib import asynccontextmanager, suppress
+from email.utils import formatdate, parsedate_to_datetime
 from typing import Optional
-from datetime import datetime
+from datetime import datetime, timedelta
 import uvicorn
 import os
-import bcrypt
 from app.data_analysis import dataAnalyzer
+from app.broker import create_broker
+from app.cache import TTLCache
+from app.models import MAX_BATCH_READINGS, DeviceReading, Reading, ReadingResult, local_naive
+from app.protocol import FrameError, decode_frames
+from app.ingest import INGEST_WRITE_BEHIND, IngestQueue
+from app import metrics
+from app.metrics import CONTENT_TYPE, READINGS, REGISTRY, MetricsMiddleware
 
-def hash_password(raw_password: str) -> str:
-    return bcrypt.hashpw(raw_password.encode(), bcrypt.gensalt()).decode()
-
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    try:
-        return bcrypt.checkpw(plain_password.encode(), hashed_password.encode())
-    except ValueError:
-        print(f"[!] Invalid password hash detected: {hashed_password}")
-        return False
+from app.passwords import PasswordQueueFull, password_hasher
+from app.seed import initial_seed
 
 from app.database import (
+    init_db_pool,
+    close_db_pool,
     setup_database,
     get_user_by_username,
     get_user_by_id,
     get_user_by_serial_num,
+    get_username_by_serial_num,
+    load_serial_index,
     create_session,
-    get_session,
+    get_session_user,
+    invalidate_session,
     delete_session,
     create_user,
     add_data_to_user,
@@ -37,11 +52,20 @@ from app.database import (
     get_device_by_serial_num,
     get_device_by_username,
     delete_device, 
-    get_data_from_user
+    get_data_from_user,
+    get_usernames_by_serial_nums,
+    add_readings,
+    get_data_page,
+    get_rollups,
+    pool_stats,
+    data_change_listeners,
+    DATA_FIELDS
 )
 
-from app.pdf import generate_health_report
+from app.reports import ReportFailed, ReportQueueFull, ReportService, report_key
+from app.pages import templates
 
+logger = logging.getLogger(__name__)
 
 async def verify_user(username: str, request: Request) -> bool:
     """
@@ -50,33 +74,111 @@ async def verify_user(username: str, request: Request) -> bool:
     # Get sessionId from cookies
     session_id = request.cookies.get("sessionId")
 
-    # Check if sessionId exists and is valid
+    # Check if sessionId exists and is valid (served from the session cache when warm)
     #   - if not, redirect to /login
-    current_session = await get_session(session_id)
+    current_session = await get_session_user(session_id)
     if current_session is None:
         return False
-    user_with_id = await get_user_by_id(current_session["user_id"])
     
     # Check if session username matches URL username
     #   - if not, return false else return true
-    return user_with_id["username"] == username
+    return current_session["username"] == username
+
+
+# Logouts are published here so every worker drops the session from its cache
+SESSION_INVALIDATION_CHANNEL = "sessions:invalidate"
+
+broker = create_broker()
 
+# Usernames whose readings changed are published here so every worker drops
+# its cached analysis for them
+DATA_CHANGED_CHANNEL = "data:changed"
 
-INIT_USERS = {
-    "alice": ("Alice", "Smith", "alice@example.com", "alice", hash_password("pass123"), "MH-830B35DF"),
-    "bob": ("Bob", "Johnson", "bob@example.com", "bob", hash_password("pass456"), "MH-EAF7EF67")
-}
+# New readings are pushed to open dashboards on "vitals:<username>"
+LIVE_CHANNEL_PREFIX = "vitals:"
+# Readings pushed per user per write; a device uploading a backlog only sends the latest
+LIVE_MAX_READINGS = 7
+# Seconds between keep-alive comments on idle live streams, so proxies keep them open
+LIVE_HEARTBEAT = 15
 
-def generate_serial_number() -> str:
-    """Generate a unique serial number."""
-    return f"MH-{uuid.uuid4().hex[:8].upper()}"
+# Set in lifespan when INGEST_WRITE_BEHIND is enabled
+ingest_queue: Optional[IngestQueue] = None
 
-INIT_USER_DEVICES = {
-    ("alice", "MH-830B35DF"),
-    ("bob", "MH-EAF7EF67")
-}
+report_service = ReportService()
 
-INIT_DEVICES = [generate_serial_number() for i in range(20)]
+# Username -> (latest 7 readings, analysis text, write generation), valid until that user's next reading
+ANALYSIS_CACHE_SIZE = int(os.getenv("ANALYSIS_CACHE_SIZE", "1024"))
+ANALYSIS_CACHE_TTL = float(os.getenv("ANALYSIS_CACHE_TTL", "300"))
+analysis_cache = TTLCache(maxsize=ANALYSIS_CACHE_SIZE, ttl=ANALYSIS_CACHE_TTL)
+# Bumped on every invalidation so a lookup racing an insert does not cache stale rows
+analysis_generation: dict[str, int] = {}
+# The generations above restart at 0 with the process; this tells them apart in ETags
+ANALYSIS_EPOCH = uuid.uuid4().hex[:8]
+# Username -> epoch seconds of the last write seen for them, backfills included
+data_written_at: dict[str, float] = {}
+
+NOT_ENOUGH_DATA = "Not enough data points to perform a full analysis. Please track at least 7 days.\n"
+
+def invalidate_analysis(username: str) -> None:
+    analysis_generation[username] = analysis_generation.get(username, 0) + 1
+    data_written_at[username] = time.time()
+    analysis_cache.pop(username)
+
+def live_reading(reading: dict) -> dict:
+    """A stored reading in the shape of the dashboard data endpoint's series."""
+    created_at = reading.get("created_at") or datetime.now()
+    if isinstance(created_at, str):
+        created_at = datetime.fromisoformat(created_at)
+    return {
+        "created_at": created_at.isoformat(),
+        "bpm": reading.get("avgHR"),
+        "spo2": reading.get("avgSpO2"),
+        "weight": reading.get("weight"),
+        "systolic": reading.get("bpS"),
+        "diastolic": reading.get("bpD"),
+    }
+
+async def on_data_changed(readings: list[dict]) -> None:
+    by_user: dict[str, list[dict]] = {}
+    for reading in readings:
+        by_user.setdefault(reading["username"], []).append(reading)
+    for username, user_readings in by_user.items():
+        invalidate_analysis(username)
+        await broker.publish(DATA_CHANGED_CHANNEL, username)
+        latest = [live_reading(reading) for reading in user_readings[-LIVE_MAX_READINGS:]]
+        await broker.publish(LIVE_CHANNEL_PREFIX + username, json.dumps({"readings": latest}))
+
+data_change_listeners.append(on_data_changed)
+
+async def get_recent_analysis(username: str) -> tuple[list, str, int]:
+    """
+    The latest 7 readings of a user, their analysis text and the user's
+    write generation they were read at (see analysis_generation).
+
+    Memoized per user until a new reading arrives for them, so repeated
+    dashboard loads and exports cost no queries and no NumPy work.
+    """
+    cached = analysis_cache.get(username)
+    if cached is not None:
+        return cached
+    generation = analysis_generation.get(username, 0)
+    theData = await get_data_from_user(username)
+    if len(theData) < 7:
+        analysis = NOT_ENOUGH_DATA
+    else:
+        analysis = dataAnalyzer().analyze_rows(theData)
+    result = (theData, analysis, generation)
+    if analysis_generation.get(username, 0) == generation:
+        analysis_cache.set(username, result)
+    return result
+
+async def listen_for_session_invalidations():
+    async for session_id in broker.subscribe(SESSION_INVALIDATION_CHANNEL):
+        invalidate_session(session_id)
+
+async def listen_for_data_changes():
+    async for username in broker.subscribe(DATA_CHANGED_CHANNEL):
+        invalidate_analysis(username)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -85,35 +187,128 @@ async def lifespan(app: FastAPI):
     Handles database setup and cleanup in a more structured way.
     """
     # Startup: Setup resources
+    global ingest_queue
+    listeners = []
+    startup_began = time.perf_counter()
     try:
-        await setup_database(INIT_USERS, INIT_USER_DEVICES, INIT_DEVICES)  # Make sure setup_database is async
-        print("Database setup completed")
+        await init_db_pool()
+        # Spare devices (and, if enabled, demo accounts) are only built for a fresh database
+        await setup_database(initial_seed)
+        logger.info("Database setup completed")
+        await load_serial_index()
+        listeners.append(asyncio.create_task(listen_for_session_invalidations()))
+        listeners.append(asyncio.create_task(listen_for_data_changes()))
+        if INGEST_WRITE_BEHIND:
+            ingest_queue = IngestQueue(add_readings)
+            ingest_queue.start()
+        report_service.start()
+        startup_done = time.perf_counter()
+        logger.info(
+            f"Startup completed in {(startup_done - _import_started) * 1000:.0f} ms "
+            f"(imports {(startup_began - _import_started) * 1000:.0f} ms, "
+            f"lifespan {(startup_done - startup_began) * 1000:.0f} ms)"
+        )
         yield
     finally:
-        print("Shutdown completed")
+        await report_service.stop()
+        password_hasher.shutdown()
+        if ingest_queue is not None:
+            # Drain queued readings while the database pool is still open
+            await ingest_queue.stop()
+            ingest_queue = None
+        for listener in listeners:
+            listener.cancel()
+            with suppress(asyncio.CancelledError):
+                await listener
+        await broker.close()
+        await close_db_pool()
+        logger.info("Shutdown completed")
 
 app = FastAPI(lifespan=lifespan)
+app.add_middleware(MetricsMiddleware)
 
 load_dotenv()
 
 app.mount("/static", StaticFiles(directory="app/static"), name="static")
 
-DB_CONFIG = {
-    "host": os.getenv("MYSQL_HOST"),
-    "user": os.getenv("MYSQL_USER"),
-    "password": os.getenv("MYSQL_PASSWORD"),
-    "database": os.getenv("MYSQL_DATABASE"),
-    "port": os.getenv("MYSQL_PORT"),
-    # "ssl_ca": os.getenv('MYSQL_SSL_CA'),
-    # "ssl_verify_identity": True
-}
-
-def get_db_connection():
-    return mysql.connector.connect(**DB_CONFIG)
+# Component state, read when /metrics is scraped
+metrics.Gauge("medhome_password_pending", "Password hashes/checks queued or running.",
+              function=lambda: password_hasher.pending)
+metrics.Gauge("medhome_password_queue_depth", "Password hashes/checks waiting for a thread.",
+              function=lambda: password_hasher.queue_depth)
+metrics.Counter("medhome_password_rejected_total", "Logins/signups turned away because the password queue was full.",
+                function=lambda: password_hasher.rejected)
+metrics.Gauge("medhome_report_jobs_queued", "Report jobs waiting for a worker.",
+              function=lambda: report_service.stats()["queued"])
+metrics.Gauge("medhome_report_jobs_running", "Report jobs being rendered.",
+              function=lambda: report_service.stats()["running"])
+metrics.Counter("medhome_report_cache_hits_total", "Exports served from the rendered PDF cache.",
+                function=lambda: report_service.cache.hits)
+metrics.Counter("medhome_report_cache_misses_total", "Exports that had to be rendered.",
+                function=lambda: report_service.cache.misses)
+metrics.Gauge("medhome_report_cache_bytes", "Size of the rendered PDF cache.",
+              function=lambda: report_service.cache.size)
+metrics.Counter("medhome_analysis_cache_hits_total", "Dashboard analyses served from the analysis cache.",
+                function=lambda: analysis_cache.hits)
+metrics.Counter("medhome_analysis_cache_misses_total", "Dashboard analyses that had to be computed.",
+                function=lambda: analysis_cache.misses)
+metrics.Gauge("medhome_ingest_queue_depth", "Readings waiting in the write-behind queue.",
+              function=lambda: ingest_queue.qsize() if ingest_queue is not None else 0)
+metrics.Counter("medhome_ingest_rows_written_total", "Readings flushed by the write-behind queue.",
+                function=lambda: ingest_queue.rows_written if ingest_queue is not None else 0)
+metrics.Counter("medhome_ingest_rows_dropped_total", "Queued readings dropped because they could not be stored.",
+                function=lambda: ingest_queue.rows_dropped if ingest_queue is not None else 0)
+metrics.Gauge("medhome_db_pool_connections", "Open database connections (idle + borrowed).",
+              function=lambda: pool_stats()["size"])
+metrics.Gauge("medhome_db_pool_idle_connections", "Idle pooled database connections.",
+              function=lambda: pool_stats()["idle"])
 
 def get_error_html(username: str) -> str:
-    error_html = open("app/templates/error.html").read()
-    return error_html.replace("{username}", username)
+    return templates.get("error.html").text.replace("{username}", username)
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """True if the client's If-None-Match already names this ETag."""
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags
+
+def not_modified(request: Request, etag: str, last_modified: Optional[float] = None) -> bool:
+    """
+    Whether a conditional GET can be answered with 304. If-None-Match takes
+    precedence; If-Modified-Since is only consulted without it.
+    """
+    if request.headers.get("if-none-match"):
+        return etag_matches(request, etag)
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            return int(last_modified) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+def page_response(request: Request, name: str, private: bool = False) -> Response:
+    """
+    Serve a cached template with validators, so browsers revalidate instead
+    of downloading it again. `private` keeps shared caches from storing
+    pages that are only shown to a signed-in user.
+    """
+    template = templates.get(name)
+    headers = {
+        "ETag": template.etag,
+        "Last-Modified": template.last_modified,
+        "Cache-Control": "private, no-cache" if private else "no-cache",
+    }
+    if not_modified(request, template.etag, template.mtime):
+        return Response(status_code=304, headers=headers)
+    return HTMLResponse(content=template.text, headers=headers)
+
+@app.get("/metrics")
+async def get_metrics():
+    """This worker's metrics in the Prometheus text format."""
+    return Response(content=REGISTRY.render(), media_type=CONTENT_TYPE)
 
 @app.get("/hello")
 async def hello_world():
@@ -129,22 +324,49 @@ async def dataPost(request: Request):
 
 @app.get("/", response_class=HTMLResponse)
 async def read_root(request: Request):
-    return HTMLResponse(content=open("app/templates/index.html").read(), status_code=200)
+    return page_response(request, "index.html")
 
 @app.post("/avgHRavgSpO2weightbpSbpD")
 async def avgHRavgSpO2weightbpSbpD(request: Request):
-    print(request)
     try:
         data = await request.json()
     except Exception as e:
         return JSONResponse(status_code=400, content={"error": f"Invalid JSON: {str(e)}"})
-    # Validate required fields
+    # Validate field presence and types before anything is queued or stored;
+    # a failed sensor read (-1) is kept as a missing vital, not rejected
+    try:
+        reading = DeviceReading.model_validate(data)
+    except ValidationError as e:
+        READINGS.inc("single", "invalid")
+        first_error = e.errors()[0]
+        field = ".".join(str(part) for part in first_error["loc"]) or "reading"
+        return JSONResponse(status_code=422, content={"error": f"{field}: {first_error['msg']}"})
     required_fields = ["serial_num", "avgHR", "avgSpO2", "weight", "bpS", "bpD"]
-    if not all(field in data for field in required_fields):
-        return {"error": "Missing one or more required fields."}
-    # You can add database storage or processing here if needed
-
-    await add_data_to_user(await get_user_by_serial_num(data["serial_num"]), data)
+    data = reading.model_dump(include=set(required_fields))
+
+    username = await get_username_by_serial_num(data["serial_num"])
+    if username is None:
+        READINGS.inc("single", "unknown_device")
+        return JSONResponse(status_code=404, content={"error": "Serial number is not registered"})
+    if ingest_queue is not None:
+        # Write-behind: acknowledge once queued, the flusher commits in groups.
+        # Stamp the reading now, not when a possibly delayed flush stores it.
+        queued = await ingest_queue.put({
+            "username": username,
+            **{field: data[field] for field in required_fields},
+            "created_at": datetime.now(),
+        })
+        if not queued:
+            READINGS.inc("single", "rejected")
+            return JSONResponse(
+                status_code=503,
+                content={"error": "Ingestion queue is full, retry later."},
+                headers={"Retry-After": "1"}
+            )
+        READINGS.inc("single", "queued")
+    else:
+        await add_data_to_user(username, data)
+        READINGS.inc("single", "stored")
     
     return {
             "message": "Data received successfully",
@@ -156,28 +378,202 @@ async def avgHRavgSpO2weightbpSbpD(request: Request):
             "bpD": data["bpD"]
         }
     
+@app.post("/readings/batch")
+async def add_readings_batch(request: Request):
+    """
+    Store many readings, from one or many devices, in a single transaction.
+
+    Expects {"readings": [...]} where each entry has the same fields as
+    /avgHRavgSpO2weightbpSbpD plus an optional created_at timestamp.
+    Returns a status per entry so devices know which readings to keep.
+    """
+    try:
+        body = await request.json()
+    except Exception as e:
+        return JSONResponse(status_code=400, content={"error": f"Invalid JSON: {str(e)}"})
+    raw_readings = body.get("readings") if isinstance(body, dict) else None
+    if not isinstance(raw_readings, list):
+        return JSONResponse(status_code=400, content={"error": "Expected a 'readings' list."})
+    if len(raw_readings) > MAX_BATCH_READINGS:
+        return JSONResponse(
+            status_code=413,
+            content={"error": f"At most {MAX_BATCH_READINGS} readings per batch."}
+        )
+
+    results = [None] * len(raw_readings)
+    valid = []
+    for index, raw in enumerate(raw_readings):
+        try:
+            valid.append((index, Reading.model_validate(raw)))
+        except ValidationError as e:
+            first_error = e.errors()[0]
+            field = ".".join(str(part) for part in first_error["loc"]) or "reading"
+            results[index] = ReadingResult(index=index, status="invalid", error=f"{field}: {first_error['msg']}")
+
+    return await store_readings([(index, reading.model_dump()) for index, reading in valid], results, "batch")
+
+async def store_readings(valid: list, results: list, endpoint: str) -> dict:
+    """
+    Store validated (index, reading dict) pairs of a batch in one transaction
+    and build the batch response. `results` already holds the invalid entries.
+    `endpoint` labels the readings in the ingestion metrics.
+    """
+    usernames = await get_usernames_by_serial_nums({reading["serial_num"] for _, reading in valid})
+    rows = []
+    for index, reading in valid:
+        username = usernames.get(reading["serial_num"])
+        if username is None:
+            results[index] = ReadingResult(index=index, status="unknown_device", error="Serial number is not registered")
+            continue
+        rows.append({"username": username, **reading})
+        results[index] = ReadingResult(index=index, status="stored")
+
+    stored = await add_readings(rows)
+    for result_status, count in Counter(result.status for result in results).items():
+        READINGS.inc(endpoint, result_status, amount=count)
+
+    return {
+        "stored": stored,
+        "rejected": len(results) - stored,
+        "results": [result.model_dump(exclude_none=True) for result in results]
+    }
+
+@app.post("/readings/binary")
+async def add_readings_binary(request: Request):
+    """
+    Store readings sent as binary frames (see app/protocol.py).
+
+    Devices send one or more frames, each holding many readings of one
+    device, in a single request. The response matches /readings/batch,
+    with one result per record in body order.
+    """
+    body = await request.body()
+    try:
+        decoded = decode_frames(body, MAX_BATCH_READINGS)
+    except FrameError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+
+    results = [None] * len(decoded)
+    valid = []
+    for index, reading in enumerate(decoded):
+        if isinstance(reading, str):
+            results[index] = ReadingResult(index=index, status="invalid", error=reading)
+        else:
+            valid.append((index, reading))
+    return await store_readings(valid, results, "binary")
+
+# Longest range charted from raw readings / hourly rollups; longer ranges use daily rollups
+RAW_CHART_MAX_SPAN = timedelta(days=2)
+HOURLY_CHART_MAX_SPAN = timedelta(days=31)
+DEFAULT_CHART_SPAN = timedelta(days=7)
+
+def pick_chart_resolution(start: datetime, end: datetime) -> str:
+    """Choose raw, hour or day so a chart has a bounded number of points for any range."""
+    span = end - start
+    if span <= RAW_CHART_MAX_SPAN:
+        return "raw"
+    if span <= HOURLY_CHART_MAX_SPAN:
+        return "hour"
+    return "day"
+
+def dashboard_validators(
+    username: str,
+    recent: list,
+    generation: int,
+    start: Optional[datetime],
+    end: Optional[datetime],
+    resolution: str,
+) -> tuple:
+    """
+    ETag and Last-Modified (epoch seconds) for a dashboard data response.
+
+    Both change with every write for the user: the ETag covers the latest
+    readings, the user's write generation, the requested range and the chart
+    resolution, so a reading backfilled behind the latest ones still changes
+    it. Generations are per process, so other workers may answer 200 where
+    this one would send 304, but never the reverse. Last-Modified is the
+    newest of the latest reading and the last write this process has seen.
+
+    A range with `from` but no `to` ends now and grows into coarser
+    resolutions over time, so its validators also change every hour.
+    """
+    effective_end = end
+    if end is None and start is not None:
+        effective_end = datetime.now().replace(minute=0, second=0, microsecond=0)
+    fingerprint = json.dumps(
+        [username, recent, ANALYSIS_EPOCH, generation, start, end, effective_end, resolution], default=str
+    )
+    etag = f'"{hashlib.sha1(fingerprint.encode()).hexdigest()[:20]}"'
+    stamps = [recent[-1][5].timestamp()] if recent else []
+    if username in data_written_at:
+        stamps.append(data_written_at[username])
+    if end is None and start is not None:
+        stamps.append(effective_end.timestamp())
+    last_modified = max(stamps) if stamps else None
+    return etag, last_modified
+
 @app.get("/dashboard/user/{username}/data")
-async def get_dashboard_data(username: str, request: Request):
+async def get_dashboard_data(
+    username: str,
+    request: Request,
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+):
+    """
+    Chart series and analysis for the dashboard.
+
+    Without `from`/`to` the charts show the latest 7 readings. With a range
+    they come from raw readings, hourly or daily rollups depending on its
+    length, so long ranges cost the same as short ones. The analysis always
+    covers the latest 7 readings.
+
+    Responses carry an ETag and Last-Modified derived from the user's
+    readings and the requested range; revalidating an unchanged dashboard
+    is answered with 304 from the analysis cache, without any query.
+    """
     if await verify_user(username, request):
-        theData = await get_data_from_user(username)
+        start, end = local_naive(start), local_naive(end)
+        resolution = "raw"
+        chart_range = None
+        if start is not None or end is not None:
+            chart_end = end or datetime.now()
+            chart_start = start or chart_end - DEFAULT_CHART_SPAN
+            resolution = pick_chart_resolution(chart_start, chart_end)
+            chart_range = (chart_start, chart_end)
+        theData, analysis, generation = await get_recent_analysis(username)
+        etag, last_modified = dashboard_validators(username, theData, generation, start, end, resolution)
+        cache_headers = {"Cache-Control": "private, no-cache", "ETag": etag}
+        if last_modified is not None:
+            cache_headers["Last-Modified"] = formatdate(last_modified, usegmt=True)
+        if not_modified(request, etag, last_modified):
+            return Response(status_code=304, headers=cache_headers)
 
         # Extract raw values
         avgHR = [row[0] for row in theData]
         avgSpO2 = [row[1] for row in theData]
         weight = [row[2] for row in theData]
-        print(theData);
         systolic = [row[3] for row in theData]
         diastolic = [row[4] for row in theData]
         dates = [row[5].strftime("%b %d") for row in theData]
 
-        if len(theData) < 7:
-            analysis = "Not enough data points to perform a full analysis. Please track at least 7 days.\n"
-        else:
-            theAnalyst = dataAnalyzer()
-            analysis = theAnalyst.analyze_avgHR(avgHR)
-            analysis += theAnalyst.analyze_avgSpO2(avgSpO2)
-            analysis += theAnalyst.analyze_weight(weight)
-            analysis += theAnalyst.analyze_blood_pressure(systolic, diastolic)
+        if chart_range is not None:
+            start, end = chart_range
+            if resolution == "raw":
+                # Newest first, so a range denser than one page keeps its latest readings
+                rows = await get_data_page(username, start, end, limit=HISTORY_MAX_PAGE_SIZE, descending=True)
+                rows.reverse()
+                series = {field: [row[field] for row in rows] for field in DATA_FIELDS}
+                dates = [row["created_at"].strftime("%b %d %H:%M") for row in rows]
+            else:
+                rows = await get_rollups(username, resolution, start, end)
+                series = {
+                    field: [None if row[f"{field}_mean"] is None else round(row[f"{field}_mean"], 1) for row in rows]
+                    for field in DATA_FIELDS
+                }
+                label = "%b %d %H:00" if resolution == "hour" else "%b %d"
+                dates = [row["bucket"].strftime(label) for row in rows]
+            avgHR, avgSpO2, weight = series["avgHR"], series["avgSpO2"], series["weight"]
+            systolic, diastolic = series["bpS"], series["bpD"]
 
         return JSONResponse(content={
             "bpm": avgHR,
@@ -186,17 +582,55 @@ async def get_dashboard_data(username: str, request: Request):
             "systolic": systolic,
             "diastolic": diastolic,
             "dates": dates,
+            "resolution": resolution,
             "theResponse": analysis
-        })
+        }, headers=cache_headers)
     else:
         return HTMLResponse(content=get_error_html(username), status_code=403)
 
 
+@app.get("/dashboard/user/{username}/live")
+async def live_vitals(username: str, request: Request):
+    """
+    Server-Sent Events stream of a user's new readings.
+
+    Each "reading" event carries {"readings": [...]} with the same series
+    names as the data endpoint, published through the broker as readings are
+    stored, so open dashboards update without polling.
+    """
+    if not await verify_user(username, request):
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    async def events():
+        messages = broker.subscribe(LIVE_CHANNEL_PREFIX + username)
+        next_message = asyncio.ensure_future(messages.__anext__())
+        try:
+            yield "retry: 5000\n\n"
+            while True:
+                done, _ = await asyncio.wait({next_message}, timeout=LIVE_HEARTBEAT)
+                if await request.is_disconnected():
+                    break
+                if not done:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"event: reading\ndata: {next_message.result()}\n\n"
+                next_message = asyncio.ensure_future(messages.__anext__())
+        finally:
+            next_message.cancel()
+            with suppress(asyncio.CancelledError, StopAsyncIteration):
+                await next_message
+            await messages.aclose()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.get("/dashboard/user/{username}", response_class=HTMLResponse)
 async def read_dashboard(username: str, request: Request):
     if(await verify_user(username, request)):
-        with open("app/templates/dashboard.html") as html:
-            return HTMLResponse(content=html.read())
+        return page_response(request, "dashboard.html", private=True)
     else:
         return HTMLResponse(content=get_error_html(username), status_code=403)
 
@@ -208,8 +642,7 @@ async def profile(username: str, request: Request):
 async def user_page(username: str, request: Request):
     """Show user profile if authenticated, error if not"""
     if(await verify_user(username, request)):
-        with open("app/templates/profile.html") as html:
-            return HTMLResponse(content=html.read())
+        return page_response(request, "profile.html", private=True)
     else:
         return HTMLResponse(content=get_error_html(username), status_code=403)
 
@@ -221,81 +654,156 @@ async def profile(username: str, request: Request):
 async def export_page(username: str, request: Request):
     """Show export page"""
     if(await verify_user(username, request)):
-        with open("app/templates/export.html") as html:
-            return HTMLResponse(content=html.read())
+        return page_response(request, "export.html", private=True)
     else:
         return HTMLResponse(content=get_error_html(username), status_code=403)
 
-@app.post("/export/user/{username}")
-async def export(username: str, request: Request, body: Optional[dict] = None):
-    # ... do auth checks
-    if not await verify_user(username, request):
-        return HTMLResponse(content=get_error_html(username), status_code=403)
-    # ... generate PDF via generate_health_report
+# Longest range a single export may cover
+EXPORT_MAX_RANGE = timedelta(days=366 * 10)
+
+def parse_export_range(body: dict) -> Optional[tuple]:
+    """
+    The (start, end) of a long-range export from the request body, if one was
+    asked for. `end` is the last day covered (inclusive), at midnight; a
+    blank `to` means today, so the same request keeps the same report key.
+    """
+    if not body.get("from") and not body.get("to"):
+        return None
+    try:
+        end = local_naive(datetime.fromisoformat(body["to"])) if body.get("to") else datetime.now()
+        start = local_naive(datetime.fromisoformat(body["from"])) if body.get("from") else None
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="from/to must be ISO 8601 dates")
+    end = end.replace(hour=0, minute=0, second=0, microsecond=0)
+    start = start or end - timedelta(days=365)
+    if start >= end + timedelta(days=1):
+        raise HTTPException(status_code=400, detail="from must not be after to")
+    if end - start > EXPORT_MAX_RANGE:
+        raise HTTPException(status_code=400, detail=f"Exports may cover at most {EXPORT_MAX_RANGE.days} days")
+    return start, end
+
+async def build_report_args(username: str, body: Optional[dict]) -> dict:
+    """
+    Gather everything the report renderer needs for a user's export.
+
+    With `from`/`to` in the body this is a multi-page report of that range,
+    built from daily rollups; otherwise the one-page report of the latest readings.
+    """
+    body = body or {}
+    export_range = parse_export_range(body)
     user = await get_user_by_username(username)
     if user is None:
         raise HTTPException(status_code=404, detail="User not found")
     device = await get_device_by_username(username)
-    if device is None:
+    if not device:
         raise HTTPException(status_code=404, detail="Device not found")
-    data = await get_data_from_user(username)
+    common = {
+        "title": body.get("title", "Health Report"),
+        "patient_name": f"{user['first_name']} {user['last_name']}",
+        "device_serial": device[0]["serial_num"],
+    }
+
+    if export_range is not None:
+        start, end = export_range
+        # `end` is the last day printed on the report; rollups take an exclusive bound
+        days = await get_rollups(username, "day", start, end + timedelta(days=1))
+        if not days:
+            raise HTTPException(status_code=404, detail="No data found for user in this range")
+        return {"layout": "range", **common, "start": start, "end": end, "days": days}
+
+    data, theResponse, _ = await get_recent_analysis(username)
     if not data:
         raise HTTPException(status_code=404, detail="No data found for user")
-    
-    theData = await get_data_from_user(username)
+    return {
+        "layout": "summary",
+        **common,
+        "dates": [d[5].strftime("%Y-%m-%d") for d in data],
+        "bpm": [d[0] for d in data],
+        "spo2": [d[1] for d in data],
+        "weight": [d[2] for d in data],
+        "systolic": [d[3] for d in data],
+        "diastolic": [d[4] for d in data],
+        "data_analysis": theResponse,
+    }
+
+def report_queue_full(e: ReportQueueFull) -> HTTPException:
+    return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+
+def submit_report(username: str, report_args: dict, key: Optional[str] = None):
+    try:
+        return report_service.submit(username, report_args, key)
+    except ReportQueueFull as e:
+        raise report_queue_full(e)
 
-    avgHR = []; avgSpO2 = []; weight = []; bpS = []; bpD = []; 
-    for i in range(7):
-        aDataList = theData[i]
-        avgHR.append(aDataList[0])
-        avgSpO2.append(aDataList[1])
-        weight.append(aDataList[2])
-        bpS.append(aDataList[3])
-        bpD.append(aDataList[4])
-    theResponse = ""
+def pdf_response(pdf: bytes, key: str = "") -> Response:
+    headers = {"Content-Disposition": 'inline; filename="health_report.pdf"'}
+    if key:
+        # Reports are per user: browsers may keep them but must revalidate
+        headers.update({"ETag": f'"{key}"', "Cache-Control": "private, no-cache"})
+    return Response(content=pdf, media_type="application/pdf", headers=headers)
 
-    if len(theData) < 7:
-        theResponse = "Not enough data points to perform a full analysis. Please track at least 7 days.\n"
-    else:
-        theAnalyst = dataAnalyzer()
-        theResponse = theAnalyst.analyze_avgHR(avgHR)
-        theResponse += theAnalyst.analyze_avgSpO2(avgSpO2)
-        theResponse += theAnalyst.analyze_weight(weight)
-        theResponse += theAnalyst.analyze_blood_pressure(bpS, bpD)
-
-    dates = [d[5].strftime("%Y-%m-%d") for d in data]
-    bpm = [d[0] for d in data]
-    spo2 = [d[1] for d in data]
-    weight = [d[2] for d in data]
-    systolic = [d[3] for d in data]
-    diastolic = [d[4] for d in data]
-    patient_name = f"{user['first_name']} {user['last_name']}"
-    device_serial = device[0]["serial_num"]
-    # Generate the health report PDF
+@app.post("/export/user/{username}")
+async def export(username: str, request: Request, body: Optional[dict] = None):
+    """Generate the health report and return it once it is ready."""
+    # ... do auth checks
+    if not await verify_user(username, request):
+        return HTMLResponse(content=get_error_html(username), status_code=403)
+    report_args = await build_report_args(username, body)
+    # Same data, title and template as a report the client already has: nothing to send
+    key = report_key(username, report_args)
+    if etag_matches(request, f'"{key}"'):
+        return Response(status_code=304, headers={"ETag": f'"{key}"', "Cache-Control": "private, no-cache"})
+    # ... generate PDF via generate_health_report on the report worker pool (or reuse a cached one)
     try:
-        generate_health_report(
-            body.get("title", "Health Report"),
-            dates, bpm, spo2, weight, systolic, diastolic,
-            patient_name, device_serial, theResponse
-        )
-    except Exception as e:
-        print(f"[!] Error generating report for user {username}: {e}")
-        raise HTTPException(status_code=500, detail="Error generating report")
-
-    pdf_path = "./temp/health_report.pdf"
+        pdf = await report_service.render(username, report_args, key)
+    except ReportQueueFull as e:
+        raise report_queue_full(e)
+    except ReportFailed as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return pdf_response(pdf, key)
+
+@app.post("/export/user/{username}/jobs", status_code=202)
+async def submit_export_job(username: str, request: Request, body: Optional[dict] = None):
+    """Queue a health report; poll the status URL, then download the PDF."""
+    if not await verify_user(username, request):
+        raise HTTPException(status_code=403, detail="Not authorized")
+    job = submit_report(username, await build_report_args(username, body))
+    return {
+        **job.to_dict(),
+        "status_url": f"/export/user/{username}/jobs/{job.id}",
+        "download_url": f"/export/user/{username}/jobs/{job.id}/pdf"
+    }
 
-    return FileResponse(
-        path=pdf_path,
-        media_type="application/pdf",
-        filename="health_report.pdf",
-        headers={"Content-Disposition": 'inline; filename="health_report.pdf"'}
-    )
+async def get_user_job(username: str, job_id: str, request: Request):
+    if not await verify_user(username, request):
+        raise HTTPException(status_code=403, detail="Not authorized")
+    job = report_service.get(job_id)
+    if job is None or job.username != username:
+        raise HTTPException(status_code=404, detail="Report job not found")
+    return job
+
+@app.get("/export/user/{username}/jobs/{job_id}")
+async def export_job_status(username: str, job_id: str, request: Request):
+    return (await get_user_job(username, job_id, request)).to_dict()
+
+@app.get("/export/user/{username}/jobs/{job_id}/pdf")
+async def download_export_job(username: str, job_id: str, request: Request):
+    job = await get_user_job(username, job_id, request)
+    if job.status == "failed":
+        raise HTTPException(status_code=500, detail=job.error)
+    if job.status != "done":
+        raise HTTPException(status_code=409, detail=f"Report is {job.status}", headers={"Retry-After": "1"})
+    if etag_matches(request, f'"{job.key}"'):
+        return Response(status_code=304, headers={"ETag": f'"{job.key}"', "Cache-Control": "private, no-cache"})
+    pdf = report_service.pdf(job)
+    if pdf is None:
+        raise HTTPException(status_code=404, detail="Report is no longer available, export it again")
+    return pdf_response(pdf, job.key)
 
 @app.get("/signup", response_class=HTMLResponse)
 async def signup_page(request: Request):
     """Show signup page"""
-    with open("app/templates/signup.html") as html:
-        return HTMLResponse(content=html.read())
+    return page_response(request, "signup.html")
 
 @app.post("/signup", response_class=HTMLResponse)
 async def signup(request: Request):
@@ -306,21 +814,25 @@ async def signup(request: Request):
         first_name = form_data.get("fname")
         last_name = form_data.get("lname")
         email = form_data.get("email")
-        password = hash_password(form_data.get("password"))
 
         # Check if username already exists
         existing_user = await get_user_by_username(username)
         if existing_user is not None:
             raise HTTPException(status_code=400, detail="Username already exists")
 
+        # Hash off the event loop, only once the username is known to be free
+        password = await password_hasher.hash(form_data.get("password"))
+
         # Create new user
         await create_user(username, first_name, last_name, email, password)
 
         # Redirect to /login
         return RedirectResponse(url="/login", status_code=302)
     
+    except PasswordQueueFull as e:
+        return HTMLResponse(content=str(e), status_code=503, headers={"Retry-After": "1"})
     except Exception as e:
-        print(f"[!] Signup failed: {e}")
+        logger.error(f"Signup failed: {e}")
         return HTMLResponse(content="Signup failed: " + str(e), status_code=500)
 
 @app.get("/login", response_class=HTMLResponse)
@@ -331,15 +843,13 @@ async def login_page(request: Request):
     
     # Check if sessionId exists and is valid
     #   - if not, redirect to /login
-    current_session = await get_session(session_id)
+    current_session = await get_session_user(session_id)
     if current_session is not None:
-        user_with_id = await get_user_by_id(current_session["user_id"])
-        username = user_with_id["username"]
+        username = current_session["username"]
         # Redirect to /profile/user/{username}
         return RedirectResponse(url=f"/profile/user/{username}", status_code=302)
     
-    with open("app/templates/login.html") as html:
-        return HTMLResponse(content=html.read())
+    return page_response(request, "login.html")
 
 @app.post("/login", response_class=HTMLResponse)
 async def login(request: Request):
@@ -351,7 +861,11 @@ async def login(request: Request):
     # Check if username exists and password matches
     user = await get_user_by_username(username)
     if user is not None:
-        if verify_password(password, user["password"]):
+        try:
+            password_ok = await password_hasher.verify(password, user["password"])
+        except PasswordQueueFull as e:
+            raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+        if password_ok:
             pass
         else:
             raise HTTPException(status_code=401, detail="Invalid password")
@@ -378,12 +892,13 @@ async def logout(request: Request):
 
     # Check if sessionId exists and is valid
     #   - if not, redirect to /login
-    current_session = await get_session(session_id)
+    current_session = await get_session_user(session_id)
     if current_session is None:
         return RedirectResponse(url="/login", status_code=302)
 
-    # Delete session
+    # Delete session and drop it from every worker's session cache
     await delete_session(session_id)
+    await broker.publish(SESSION_INVALIDATION_CHANNEL, session_id)
 
     # Redirect to /login
     response = RedirectResponse(url="/login", status_code=302)
@@ -408,5 +923,79 @@ async def get_user_data(username: str, request: Request):
     else:
         raise HTTPException(status_code=403, detail="Not authorized")
 
+HISTORY_PAGE_SIZE = 100
+HISTORY_MAX_PAGE_SIZE = 1000
+# Rows fetched per query while streaming a whole range
+HISTORY_STREAM_CHUNK = 1000
+
+def encode_history_cursor(row: dict) -> str:
+    """Opaque cursor pointing just past `row` in (created_at, id) order."""
+    raw = f"{row['created_at'].isoformat()}|{row['id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_history_cursor(cursor: str) -> tuple:
+    try:
+        created_at, row_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (ValueError, UnicodeDecodeError, binascii.Error):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def history_row(row: dict) -> dict:
+    return {**row, "created_at": row["created_at"].isoformat()}
+
+@app.get("/api/user/{username}/history")
+async def get_history(
+    username: str,
+    request: Request,
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    limit: int = Query(HISTORY_PAGE_SIZE, ge=1, le=HISTORY_MAX_PAGE_SIZE),
+    order: str = Query("asc", pattern="^(asc|desc)$"),
+    stream: bool = False,
+):
+    """
+    Readings for a user between `from` and `to`, oldest first (or newest first with order=desc).
+
+    `fields` is a comma-separated subset of avgHR, avgSpO2, weight, bpS, bpD.
+    Pages are fetched with the `next_cursor` of the previous response. With
+    stream=true the whole range is sent as newline-delimited JSON, fetched
+    from the database a chunk at a time so memory use stays flat.
+    """
+    if not await verify_user(username, request):
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    start, end = local_naive(start), local_naive(end)
+    selected = DATA_FIELDS
+    if fields:
+        selected = tuple(field.strip() for field in fields.split(",") if field.strip())
+        unknown = set(selected) - set(DATA_FIELDS)
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    after = decode_history_cursor(cursor) if cursor else None
+    descending = order == "desc"
+
+    if stream:
+        async def rows():
+            position = after
+            while True:
+                page = await get_data_page(
+                    username, start, end, position, selected, HISTORY_STREAM_CHUNK, descending
+                )
+                for row in page:
+                    yield json.dumps(history_row(row)) + "\n"
+                if len(page) < HISTORY_STREAM_CHUNK:
+                    return
+                position = (page[-1]["created_at"], page[-1]["id"])
+
+        return StreamingResponse(rows(), media_type="application/x-ndjson")
+
+    page = await get_data_page(username, start, end, after, selected, limit, descending)
+    return JSONResponse(content={
+        "data": [history_row(row) for row in page],
+        "next_cursor": encode_history_cursor(page[-1]) if len(page) == limit else None
+    })
+
 if __name__ == "__main__":
     uvicorn.run(app="app.main:app", host="0.0.0.0", port=6543, reload=False)
\ No newline at end of file
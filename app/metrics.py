@@ -0,0 +1,333 @@
+"""
+Request-level performance metrics, exposed in the Prometheus text format on
+/metrics.
+
+Metrics live in process memory: with several uvicorn workers, each worker
+reports its own counters and Prometheus should scrape every worker (or sum
+them). Every request gets a RequestStats in a context variable, so database
+helpers can attribute their calls to the request that made them.
+"""
+import json
+import logging
+import os
+import random
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+# One line per sampled request, as JSON
+request_logger = logging.getLogger("app.requests")
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Fraction of requests logged; slow and failed requests are always logged
+REQUEST_LOG_SAMPLE_RATE = float(os.getenv("REQUEST_LOG_SAMPLE_RATE", "0.01"))
+# Requests slower than this are always logged
+REQUEST_LOG_SLOW_MS = float(os.getenv("REQUEST_LOG_SLOW_MS", "500"))
+
+# Seconds; from sub-millisecond cached responses up to report exports
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50)
+RENDER_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+
+
+class Registry:
+    """The metrics of this process, rendered together for a scrape."""
+
+    def __init__(self):
+        self._metrics: list["Metric"] = []
+        self._lock = threading.Lock()
+
+    def register(self, metric: "Metric") -> None:
+        with self._lock:
+            if any(m.name == metric.name for m in self._metrics):
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics.append(metric)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """
+    A named family of values, one per combination of label values. With
+    `function` the (unlabelled) value is read from it at scrape time instead,
+    so other components need not know about metrics.
+    """
+
+    type = "untyped"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: tuple = (),
+        function: Optional[Callable[[], float]] = None,
+        registry: Optional[Registry] = REGISTRY,
+    ):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.function = function
+        self._values: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+        if registry is not None:
+            registry.register(self)
+
+    def _key(self, labelvalues: tuple) -> tuple:
+        if len(labelvalues) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {labelvalues}")
+        return labelvalues
+
+    def inc(self, *labelvalues, amount: float = 1) -> None:
+        key = self._key(labelvalues)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, *labelvalues) -> float:
+        return self._values.get(self._key(labelvalues), 0)
+
+    def samples(self) -> list[str]:
+        if self.function is not None:
+            try:
+                return [f"{self.name} {_format_value(self.function())}"]
+            except Exception as e:
+                logger.warning(f"Could not read metric {self.name}: {e}")
+                return []
+        with self._lock:
+            values = sorted(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in values
+        ]
+
+
+class Counter(Metric):
+    """A value that only goes up; Prometheus derives rates from it."""
+
+    type = "counter"
+
+
+class Gauge(Metric):
+    """A value that goes up and down."""
+
+    type = "gauge"
+
+    def set(self, value: float, *labelvalues) -> None:
+        key = self._key(labelvalues)
+        with self._lock:
+            self._values[key] = value
+
+    def dec(self, *labelvalues, amount: float = 1) -> None:
+        self.inc(*labelvalues, amount=-amount)
+
+
+class Histogram(Metric):
+    """Observations counted into fixed buckets, plus their sum and count."""
+
+    type = "histogram"
+
+    def __init__(self, *args, buckets: tuple = LATENCY_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [per-bucket counts (last one is +Inf), sum, count]
+        self._values: dict[tuple, list] = {}
+
+    def inc(self, *labelvalues, amount: float = 1) -> None:
+        raise TypeError("Histograms are updated with observe()")
+
+    def observe(self, value: float, *labelvalues) -> None:
+        key = self._key(labelvalues)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def value(self, *labelvalues) -> int:
+        """The number of observations."""
+        entry = self._values.get(self._key(labelvalues))
+        return entry[2] if entry else 0
+
+    def samples(self) -> list[str]:
+        with self._lock:
+            values = sorted((key, (list(counts), total, count)) for key, (counts, total, count) in self._values.items())
+        lines = []
+        for key, (counts, total, count) in values:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(float(bound))}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+# HTTP
+HTTP_REQUESTS = Counter(
+    "medhome_http_requests_total", "HTTP requests by route template, method and status.",
+    ("route", "method", "status"),
+)
+HTTP_LATENCY = Histogram(
+    "medhome_http_request_duration_seconds",
+    "Time from receiving a request to sending the last byte of its response, by route template. "
+    "Live dashboard streams record how long they stayed open.",
+    ("route", "method"),
+)
+HTTP_IN_FLIGHT = Gauge("medhome_http_requests_in_flight", "Requests currently being handled.")
+
+# Database
+DB_CALL_SECONDS = Histogram(
+    "medhome_db_call_duration_seconds",
+    "Database helper calls by function, including the wait for a DB thread and connection.",
+    ("function",),
+)
+DB_CALL_ERRORS = Counter("medhome_db_call_errors_total", "Database helper calls that raised, by function.", ("function",))
+DB_CALLS_PER_REQUEST = Histogram(
+    "medhome_db_calls_per_request", "Database helper calls made while handling one request, by route template.",
+    ("route",), buckets=COUNT_BUCKETS,
+)
+DB_SECONDS_PER_REQUEST = Histogram(
+    "medhome_db_seconds_per_request", "Time spent in database helpers per request, by route template.",
+    ("route",),
+)
+
+# Ingestion; rates are rate(medhome_readings_total[1m])
+READINGS = Counter(
+    "medhome_readings_total", "Device readings received, by endpoint and outcome.", ("endpoint", "status"),
+)
+
+# Reports
+REPORT_RENDER_SECONDS = Histogram(
+    "medhome_report_render_seconds", "PDF report rendering time in the worker pool, by layout and outcome.",
+    ("layout", "status"), buckets=RENDER_BUCKETS,
+)
+
+
+@dataclass
+class RequestStats:
+    db_calls: int = 0
+    db_seconds: float = 0.0
+
+
+_request_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+def observe_db_call(function: str, seconds: float, failed: bool = False) -> None:
+    """Record one database helper call, and attribute it to the current request if any."""
+    DB_CALL_SECONDS.observe(seconds, function)
+    if failed:
+        DB_CALL_ERRORS.inc(function)
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.db_calls += 1
+        stats.db_seconds += seconds
+
+
+def route_label(scope: dict) -> str:
+    """
+    The route template ("/dashboard/user/{username}") rather than the path,
+    so labels stay few. Mounted apps are labelled by their mount path.
+    """
+    route = scope.get("route")
+    if route is not None:
+        return route.path
+    return scope.get("root_path") or "unmatched"
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording latency, status and database use per route, and
+    logging a sample of requests (plus every slow or failed one) as JSON.
+    """
+
+    def __init__(
+        self,
+        app,
+        sample_rate: float = REQUEST_LOG_SAMPLE_RATE,
+        slow_ms: float = REQUEST_LOG_SLOW_MS,
+    ):
+        self.app = app
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+        status = 500
+        began = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            elapsed = time.perf_counter() - began
+            _request_stats.reset(token)
+            self._record(scope, status, elapsed, stats)
+
+    def _record(self, scope: dict, status: int, elapsed: float, stats: RequestStats) -> None:
+        route = route_label(scope)
+        method = scope["method"]
+        HTTP_REQUESTS.inc(route, method, str(status))
+        HTTP_LATENCY.observe(elapsed, route, method)
+        DB_CALLS_PER_REQUEST.observe(stats.db_calls, route)
+        DB_SECONDS_PER_REQUEST.observe(stats.db_seconds, route)
+
+        elapsed_ms = elapsed * 1000
+        if status >= 500 or elapsed_ms >= self.slow_ms or random.random() < self.sample_rate:
+            request_logger.info(json.dumps({
+                "method": method,
+                "path": scope["path"],
+                "route": route,
+                "status": status,
+                "ms": round(elapsed_ms, 1),
+                "db_calls": stats.db_calls,
+                "db_ms": round(stats.db_seconds * 1000, 1),
+            }))
@@ -0,0 +1,61 @@
+from datetime import datetime
+from typing import Optional
+
+from pydantic import BaseModel, Field, field_validator
+
+# Upper bound on readings accepted in a single batch upload
+MAX_BATCH_READINGS = 1000
+# What the firmware sends for a vital its sensor could not read
+SENSOR_FAILED = -1
+
+
+def local_naive(value: Optional[datetime]) -> Optional[datetime]:
+    """
+    A timestamp as naive local time, the form stored and compared everywhere.
+    Values with a UTC offset (or "Z") are converted; naive ones are kept as is.
+    """
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone().replace(tzinfo=None)
+    return value
+
+
+class Reading(BaseModel):
+    """One set of vitals as reported by a MedHome device."""
+    serial_num: str = Field(min_length=1, max_length=255)
+    avgHR: int = Field(ge=0, le=300)
+    avgSpO2: int = Field(ge=0, le=100)
+    weight: float = Field(ge=0, le=1500)
+    bpS: int = Field(ge=0, le=400)
+    bpD: int = Field(ge=0, le=300)
+    # When the reading was taken; devices that buffered offline should send it,
+    # otherwise the server's insert time is used.
+    created_at: Optional[datetime] = None
+
+    @field_validator("created_at")
+    @classmethod
+    def _created_at_local(cls, value: Optional[datetime]) -> Optional[datetime]:
+        return local_naive(value)
+
+
+class DeviceReading(Reading):
+    """
+    A reading posted by the shipped firmware to /avgHRavgSpO2weightbpSbpD.
+
+    When the pulse oximeter gets no valid sample the firmware still posts the
+    reading, with avgHR and avgSpO2 set to SENSOR_FAILED; those are stored as
+    missing (None) so the rest of the reading is kept.
+    """
+    avgHR: Optional[int] = Field(ge=0, le=300)
+    avgSpO2: Optional[int] = Field(ge=0, le=100)
+
+    @field_validator("avgHR", "avgSpO2", mode="before")
+    @classmethod
+    def _sensor_failed(cls, value):
+        return None if value == SENSOR_FAILED else value
+
+
+class ReadingResult(BaseModel):
+    """Outcome for one entry of a batch upload, in request order."""
+    index: int
+    status: str  # "stored", "invalid" or "unknown_device"
+    error: Optional[str] = None
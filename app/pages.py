@@ -0,0 +1,61 @@
+import hashlib
+import logging
+import os
+import threading
+from dataclasses import dataclass
+from email.utils import formatdate
+
+logger = logging.getLogger(__name__)
+
+TEMPLATE_DIR = "app/templates"
+# Check template files for changes on every request and reload them (development)
+TEMPLATE_RELOAD = os.getenv("TEMPLATE_RELOAD", "false").lower() in ("1", "true", "yes")
+
+
+@dataclass(frozen=True)
+class Template:
+    text: str
+    etag: str
+    mtime: float
+
+    @property
+    def last_modified(self) -> str:
+        return formatdate(self.mtime, usegmt=True)
+
+
+class TemplateCache:
+    """
+    HTML templates read from disk once and served from memory.
+
+    With `reload` on, each lookup stats the file and re-reads it when its
+    modification time changed, so edits show up without a restart.
+    """
+
+    def __init__(self, directory: str = TEMPLATE_DIR, reload: bool = TEMPLATE_RELOAD):
+        self.directory = directory
+        self.reload = reload
+        self._templates: dict[str, Template] = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str) -> Template:
+        template = self._templates.get(name)
+        if template is not None and not self.reload:
+            return template
+        path = os.path.join(self.directory, name)
+        mtime = os.stat(path).st_mtime
+        if template is not None and template.mtime == mtime:
+            return template
+        with self._lock:
+            with open(path, encoding="utf-8") as f:
+                text = f.read()
+            template = Template(text=text, etag=f'"{hashlib.sha1(text.encode()).hexdigest()[:20]}"', mtime=mtime)
+            self._templates[name] = template
+        if self.reload:
+            logger.info(f"Loaded template {name}")
+        return template
+
+    def clear(self) -> None:
+        self._templates.clear()
+
+
+templates = TemplateCache()
@@ -0,0 +1,92 @@
+import asyncio
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import bcrypt
+
+logger = logging.getLogger(__name__)
+
+# Threads hashing passwords; bcrypt releases the GIL, so these run in parallel
+PASSWORD_WORKERS = int(os.getenv("PASSWORD_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Password checks queued or running before logins/signups are turned away with 503
+PASSWORD_MAX_PENDING = int(os.getenv("PASSWORD_MAX_PENDING", "64"))
+
+
+def hash_password(raw_password: str) -> str:
+    return bcrypt.hashpw(raw_password.encode(), bcrypt.gensalt()).decode()
+
+
+def verify_password(plain_password: str, hashed_password: str) -> bool:
+    try:
+        return bcrypt.checkpw(plain_password.encode(), hashed_password.encode())
+    except ValueError:
+        logger.warning("Invalid password hash detected")
+        return False
+
+
+class PasswordQueueFull(Exception):
+    """Raised when too many password hashes/checks are already waiting."""
+    pass
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt on a small dedicated thread pool instead of the event loop.
+
+    bcrypt is deliberately slow (tens to hundreds of ms), so a burst of
+    logins would otherwise stall ingestion and dashboards. At most
+    `max_pending` operations may be queued or running; beyond that callers
+    get PasswordQueueFull straight away rather than waiting behind the burst.
+    """
+
+    def __init__(self, workers: int = PASSWORD_WORKERS, max_pending: int = PASSWORD_MAX_PENDING):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.pending = 0
+        self.rejected = 0
+        self.completed = 0
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def queue_depth(self) -> int:
+        """Operations waiting for a free worker thread."""
+        return max(0, self.pending - self.workers)
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "pending": self.pending,
+            "queue_depth": self.queue_depth,
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
+
+    async def hash(self, raw_password: str) -> str:
+        return await self._run(hash_password, raw_password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(verify_password, plain_password, hashed_password)
+
+    async def _run(self, func, *args):
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            logger.warning(f"Password queue full ({self.pending} pending), rejecting request")
+            raise PasswordQueueFull("Too many login attempts in progress, try again shortly.")
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+        finally:
+            self.pending -= 1
+            self.completed += 1
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+password_hasher = PasswordHasher()
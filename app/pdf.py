@@ -1,74 +1,62 @@
-import matplotlib.pyplot as plt
+from app.charts import render_chart
+from app.data_analysis import METRICS, dataAnalyzer
 from fpdf import FPDF
+from fpdf.enums import XPos, YPos
+import io
 import os
 from datetime import date
-import glob
-
-def generate_health_report(title, dates, bpm, spo2, weight, systolic, diastolic, patient_name, device_serial, data_analysis):
-    output_dir = "./temp"
-    os.makedirs(output_dir, exist_ok=True)  # ✅ Create folder if it doesn't exist
-    
-    for f in glob.glob(os.path.join(output_dir, "*.png")):
-        os.remove(f)
-
-
-    def create_plot(y_values, title, ylabel, filename, extra_y=None, extra_label=None):
-        plt.figure(figsize=(4, 3))
-        plt.plot(dates, y_values, marker='o', label=ylabel)
-        plt.xticks(rotation=45)  # or rotation=30
-        plt.locator_params(axis='x', nbins=5)  # Show ~5 ticks only
-        if extra_y is not None:
-            plt.plot(dates, extra_y, marker='o', label=extra_label)
-        plt.title(title)
-        plt.xlabel("Date")
-        plt.ylabel(ylabel if not extra_label else "mmHg")
-        plt.grid(True)
-        if extra_label:
-            plt.legend()
-        plt.tight_layout()
-        plt.savefig(os.path.join(output_dir, filename))
-        plt.close()
-
-    # Create plots
-    create_plot(bpm, "Heart Rate", "BPM", "bpm.png")
-    create_plot(spo2, "Oxygen Saturation", "SpO₂ (%)", "spo2.png")
-    create_plot(weight, "Weight", "lbs", "weight.png")
-    create_plot(systolic, "Blood Pressure", "Systolic", "bp.png", extra_y=diastolic, extra_label="Diastolic")
-
-    # Create PDF
-    pdf = FPDF()
-    pdf.add_page()
-
-    logo_path = "./app/static/images/medhome_logo.png"
-    if os.path.exists(logo_path):
-        pdf.image(logo_path, x=80, y=10, w=50)
-
-    pdf.set_font("Arial", 'B', 16)
+from itertools import groupby
+import numpy as np
+
+LOGO_PATH = "./app/static/images/medhome_logo.png"
+
+# Read once per process; every report embeds the logo from memory
+_logo_png = None
+
+def _logo():
+    global _logo_png
+    if _logo_png is None:
+        if os.path.exists(LOGO_PATH):
+            with open(LOGO_PATH, "rb") as f:
+                _logo_png = f.read()
+        else:
+            _logo_png = b""
+    return _logo_png
+
+def _add_header(pdf, title, patient_name, device_serial, period=None):
+    logo = _logo()
+    if logo:
+        pdf.image(io.BytesIO(logo), x=80, y=10, w=50)
+
+    pdf.set_font("Helvetica", 'B', 16)
     pdf.set_y(30)
-    pdf.cell(200, 10, title, ln=True, align="C")
+    pdf.cell(200, 10, title, new_x=XPos.LMARGIN, new_y=YPos.NEXT, align="C")
 
-    pdf.set_font("Arial", '', 12)
-    pdf.cell(200, 8, f"Date: {date.today().isoformat()}", ln=True, align="C")
-    pdf.cell(200, 8, f"Patient Name: {patient_name}", ln=True, align="C")
-    pdf.cell(200, 8, f"Device Serial #: {device_serial}", ln=True, align="C")
+    pdf.set_font("Helvetica", '', 12)
+    pdf.cell(200, 8, f"Date: {date.today().isoformat()}", new_x=XPos.LMARGIN, new_y=YPos.NEXT, align="C")
+    if period:
+        pdf.cell(200, 8, f"Period: {period}", new_x=XPos.LMARGIN, new_y=YPos.NEXT, align="C")
+    pdf.cell(200, 8, f"Patient Name: {patient_name}", new_x=XPos.LMARGIN, new_y=YPos.NEXT, align="C")
+    pdf.cell(200, 8, f"Device Serial #: {device_serial}", new_x=XPos.LMARGIN, new_y=YPos.NEXT, align="C")
 
     pdf.set_draw_color(0, 0, 0)
     pdf.set_line_width(0.3)
     pdf.line(10, pdf.get_y() + 2, 200, pdf.get_y() + 2)
     pdf.ln(10)
 
-    pdf.set_font("Arial", 'B', 14)
-    pdf.cell(200, 10, "Vitals Overview", ln=True, align="L")
+
+def _add_charts(pdf, heading, images):
+    pdf.set_font("Helvetica", 'B', 14)
+    pdf.cell(200, 10, heading, new_x=XPos.LMARGIN, new_y=YPos.NEXT, align="L")
     pdf.ln(4)
 
     positions = [
         (10, pdf.get_y()), (110, pdf.get_y()),
         (10, pdf.get_y() + 75), (110, pdf.get_y() + 75)
     ]
-    images = ["bpm.png", "spo2.png", "weight.png", "bp.png"]
 
     for (x, y), img in zip(positions, images):
-        pdf.image(os.path.join(output_dir, img), x=x, y=y, w=90, h=60)
+        pdf.image(img, x=x, y=y, w=90, h=60)
 
     # Position cursor below the last row of charts
     pdf.set_y(positions[-1][1] + 65)
@@ -78,26 +66,129 @@ def generate_health_report(title, dates, bpm, spo2, weight, systolic, diastolic,
     pdf.line(10, pdf.get_y(), 200, pdf.get_y())
     pdf.ln(5)
 
-    # Add data analysis
+
+def _add_analysis(pdf, heading, data_analysis):
     if data_analysis:
-        pdf.set_font("Arial", 'B', 14)
-        pdf.cell(200, 10, "Data Analysis", ln=True, align="L")
-        pdf.set_font("Arial", '', 12)
+        pdf.set_font("Helvetica", 'B', 14)
+        pdf.cell(200, 10, heading, new_x=XPos.LMARGIN, new_y=YPos.NEXT, align="L")
+        pdf.set_font("Helvetica", '', 12)
         for line in data_analysis.strip().split('\n'):
-            pdf.multi_cell(0, 8, line)
+            pdf.multi_cell(0, 8, line, new_x=XPos.LMARGIN, new_y=YPos.NEXT)
 
 
-    pdf_path = os.path.join(output_dir, "health_report.pdf")
-    pdf.output(pdf_path)
+def _vitals_charts(dates, bpm, spo2, weight, systolic, diastolic):
+    return [
+        render_chart(dates, bpm, "Heart Rate", "BPM"),
+        render_chart(dates, spo2, "Oxygen Saturation", "SpO₂ (%)"),
+        render_chart(dates, weight, "Weight", "lbs"),
+        render_chart(dates, systolic, "Blood Pressure", "Systolic", extra_y=diastolic, extra_label="Diastolic"),
+    ]
+
+
+def generate_health_report(title, dates, bpm, spo2, weight, systolic, diastolic, patient_name, device_serial, data_analysis) -> bytes:
+    """Render the health report and return the PDF as bytes; nothing is written to disk."""
+    images = _vitals_charts(dates, bpm, spo2, weight, systolic, diastolic)
+
+    pdf = FPDF()
+    pdf.add_page()
+    _add_header(pdf, title, patient_name, device_serial)
+    _add_charts(pdf, "Vitals Overview", images)
+    _add_analysis(pdf, "Data Analysis", data_analysis)
 
-    print(f"✅ PDF generated: {pdf_path}")
+    return bytes(pdf.output())
 
-    return {"success"}
+
+# Daily table of the long-range report: heading, width (mm)
+DAY_TABLE_COLUMNS = [
+    ("Date", 26), ("Readings", 20), ("Heart rate", 38), ("SpO2 (%)", 38), ("Weight (lbs)", 30), ("BP (mmHg)", 38),
+]
+
+
+def _number(value, digits=0):
+    return "-" if value is None else f"{float(value):.{digits}f}"
+
+
+def _day_cells(day):
+    return [
+        day["bucket"].strftime("%Y-%m-%d"),
+        str(day["readings"]),
+        f"{_number(day['avgHR_mean'])} ({_number(day['avgHR_min'])}-{_number(day['avgHR_max'])})",
+        f"{_number(day['avgSpO2_mean'])} ({_number(day['avgSpO2_min'])}-{_number(day['avgSpO2_max'])})",
+        _number(day["weight_mean"], 1),
+        f"{_number(day['bpS_mean'])}/{_number(day['bpD_mean'])}",
+    ]
+
+
+def _add_day_table(pdf, days):
+    def table_header():
+        pdf.set_font("Helvetica", 'B', 10)
+        pdf.set_fill_color(230, 230, 230)
+        for heading, width in DAY_TABLE_COLUMNS:
+            pdf.cell(width, 7, heading, border=1, fill=True, align="C")
+        pdf.ln(7)
+        pdf.set_font("Helvetica", '', 10)
+
+    table_header()
+    for day in days:
+        if pdf.will_page_break(6):
+            pdf.add_page()
+            table_header()
+        for (_, width), text in zip(DAY_TABLE_COLUMNS, _day_cells(day)):
+            pdf.cell(width, 6, text, border=1, align="C")
+        pdf.ln(6)
+
+
+def _daily_series(days, label_format, period):
+    """Chart inputs and an analysis of the daily means of some rollup rows, covering `period`."""
+    dates = [day["bucket"].strftime(label_format) for day in days]
+    series = [[day[f"{field}_mean"] for day in days] for field in METRICS]
+    values = np.array(series, dtype=np.float64).T
+    analysis = dataAnalyzer().analyze(values, [day["bucket"] for day in days], period)
+    return dates, series, analysis
+
+
+def generate_range_report(title, start, end, days, patient_name, device_serial) -> bytes:
+    """
+    Render a multi-page report for any date range from daily rollup rows
+    (as returned by get_rollups(..., "day")), oldest first.
+
+    A summary page covers the whole range. Then each month gets a page of
+    charts with its own analysis and a table of its days. Months are laid out
+    one at a time and their chart buffers released once embedded, so memory
+    follows the size of the PDF rather than the number of readings.
+    """
+    pdf = FPDF()
+    pdf.set_auto_page_break(True, margin=15)
+    period = f"{start:%Y-%m-%d} to {end:%Y-%m-%d}"
+
+    pdf.add_page()
+    _add_header(pdf, title, patient_name, device_serial, period)
+    dates, series, analysis = _daily_series(days, "%Y-%m-%d", "over this period")
+    _add_charts(pdf, "Vitals Overview (daily averages)", _vitals_charts(dates, *series))
+    pdf.set_font("Helvetica", '', 12)
+    pdf.cell(200, 8, f"{sum(day['readings'] for day in days)} readings on {len(days)} days", new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+    _add_analysis(pdf, "Data Analysis", analysis)
+
+    for month, month_days in groupby(days, key=lambda day: (day["bucket"].year, day["bucket"].month)):
+        month_days = list(month_days)
+        dates, series, analysis = _daily_series(month_days, "%b %d", f"in {date(*month, 1):%B %Y}")
+        pdf.add_page()
+        pdf.set_font("Helvetica", 'B', 16)
+        pdf.cell(200, 10, f"{date(*month, 1):%B %Y}", new_x=XPos.LMARGIN, new_y=YPos.NEXT, align="C")
+        _add_charts(pdf, "Vitals (daily averages)", _vitals_charts(dates, *series))
+        _add_analysis(pdf, "Analysis", analysis)
+        pdf.add_page()
+        pdf.set_font("Helvetica", 'B', 14)
+        pdf.cell(200, 10, f"Daily readings, {date(*month, 1):%B %Y}", new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+        _add_day_table(pdf, month_days)
+
+    return bytes(pdf.output())
 
 """
     Example usage:
    
-    generate_health_report(
+    pdf_bytes = generate_health_report(
+        title="Health Report",
         dates=["2025-01", "2025-02", "2025-03", "2025-04", "2025-05"],
         bpm=[72, 75, 78, 74, 77],
         spo2=[97, 98, 99, 97, 96],
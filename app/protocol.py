@@ -0,0 +1,157 @@
+"""
+Compact binary encoding of device readings ("MedHome frames").
+
+A request body is one or more frames back to back. All integers are
+little-endian, matching the ESP32.
+
+    Frame header (version 1)
+        magic       2 bytes   b"MH"
+        version     uint8     1
+        flags       uint8     bit 0: every record starts with a timestamp
+        serial_len  uint8     length of the serial number
+        serial_num  serial_len bytes, ASCII
+        count       uint16    number of records that follow
+
+    Record
+        created_at  uint32    Unix seconds; only with flag bit 0, 0 = "now"
+        avgHR       uint16    beats per minute
+        avgSpO2     uint8     percent
+        weight      uint16    tenths of a pound
+        bpS         uint16    mmHg
+        bpD         uint16    mmHg
+
+A reading is 9 bytes (13 with a timestamp) instead of ~100 bytes of JSON, and
+a buffered batch costs one request. New versions must keep the first four
+header bytes so older servers can reject them cleanly.
+"""
+import struct
+from datetime import datetime
+from typing import Iterable, Optional
+
+from app.models import Reading
+
+MEDIA_TYPE = "application/vnd.medhome.readings"
+MAGIC = b"MH"
+VERSION = 1
+FLAG_TIMESTAMPS = 0x01
+
+_HEADER = struct.Struct("<2sBBB")
+_COUNT = struct.Struct("<H")
+_RECORD = struct.Struct("<HBHHH")
+_TIMED_RECORD = struct.Struct("<IHBHHH")
+# Weight travels as an integer number of tenths of a pound
+WEIGHT_SCALE = 10
+_FIELDS = ("avgHR", "avgSpO2", "weight", "bpS", "bpD")
+
+# Same bounds as the JSON endpoints, taken from the Reading model
+LIMITS = {
+    name: (
+        next(m.ge for m in Reading.model_fields[name].metadata if hasattr(m, "ge")),
+        next(m.le for m in Reading.model_fields[name].metadata if hasattr(m, "le")),
+    )
+    for name in _FIELDS
+}
+# The same bounds on the encoded integers, in record order
+_RAW_LIMITS = tuple(
+    (low * WEIGHT_SCALE, high * WEIGHT_SCALE) if name == "weight" else (low, high)
+    for name, (low, high) in LIMITS.items()
+)
+
+
+class FrameError(ValueError):
+    """The body is not a well-formed sequence of frames."""
+    pass
+
+
+def decode_frames(body: bytes, max_readings: int) -> list:
+    """
+    Decode every frame in a request body.
+
+    Returns:
+        list: One entry per record in body order: a dict with the Reading
+        fields, or an error message (str) for a record whose values are out
+        of range. Records are range-checked here instead of going through
+        the pydantic model, which would cost more than the decoding itself.
+
+    Raises:
+        FrameError: If the body is truncated, has an unknown magic/version or
+            holds more than `max_readings` records.
+    """
+    view = memoryview(body)
+    offset = 0
+    results = []
+    while offset < len(view):
+        if len(view) - offset < _HEADER.size:
+            raise FrameError(f"Truncated frame header at byte {offset}")
+        magic, version, flags, serial_len = _HEADER.unpack_from(view, offset)
+        if magic != MAGIC:
+            raise FrameError(f"Bad frame magic at byte {offset}")
+        if version != VERSION:
+            raise FrameError(f"Unsupported frame version {version}")
+        offset += _HEADER.size
+
+        serial_end = offset + serial_len
+        if serial_len == 0 or serial_end + _COUNT.size > len(view):
+            raise FrameError(f"Truncated or empty serial number at byte {offset}")
+        try:
+            serial_num = bytes(view[offset:serial_end]).decode("ascii")
+        except UnicodeDecodeError:
+            raise FrameError(f"Serial number at byte {offset} is not ASCII")
+        (count,) = _COUNT.unpack_from(view, serial_end)
+        offset = serial_end + _COUNT.size
+
+        if len(results) + count > max_readings:
+            raise FrameError(f"At most {max_readings} readings per request")
+        timed = bool(flags & FLAG_TIMESTAMPS)
+        record = _TIMED_RECORD if timed else _RECORD
+        records_end = offset + count * record.size
+        if records_end > len(view):
+            raise FrameError(f"Frame for {serial_num} is truncated")
+
+        for values in record.iter_unpack(view[offset:records_end]):
+            created_at = None
+            if timed:
+                seconds, *values = values
+                if seconds:
+                    # Naive local time, like timestamps from the JSON endpoints
+                    created_at = datetime.fromtimestamp(seconds)
+            results.append(_to_reading(serial_num, values, created_at))
+        offset = records_end
+    return results
+
+
+def _to_reading(serial_num: str, values, created_at: Optional[datetime]):
+    for name, value, (low, high) in zip(_FIELDS, values, _RAW_LIMITS):
+        if not low <= value <= high:
+            low, high = LIMITS[name]
+            return f"{name}: must be between {low} and {high}"
+    avgHR, avgSpO2, weight, bpS, bpD = values
+    return {
+        "serial_num": serial_num, "avgHR": avgHR, "avgSpO2": avgSpO2, "weight": weight / WEIGHT_SCALE,
+        "bpS": bpS, "bpD": bpD, "created_at": created_at,
+    }
+
+
+def encode_frame(serial_num: str, readings: Iterable[dict], timestamps: bool = False) -> bytes:
+    """
+    Encode one device's readings (dicts with the Reading fields) as a frame.
+
+    Used by simulators, the benchmark and as the reference for firmware encoders.
+    """
+    readings = list(readings)
+    serial = serial_num.encode("ascii")
+    parts = [
+        _HEADER.pack(MAGIC, VERSION, FLAG_TIMESTAMPS if timestamps else 0, len(serial)),
+        serial,
+        _COUNT.pack(len(readings)),
+    ]
+    for r in readings:
+        values = (r["avgHR"], r["avgSpO2"], round(r["weight"] * WEIGHT_SCALE), r["bpS"], r["bpD"])
+        if timestamps:
+            created_at = r.get("created_at")
+            # Naive datetimes are local time, as stored
+            seconds = int(created_at.timestamp()) if created_at else 0
+            parts.append(_TIMED_RECORD.pack(seconds, *values))
+        else:
+            parts.append(_RECORD.pack(*values))
+    return b"".join(parts)
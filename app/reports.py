@@ -0,0 +1,344 @@
+import asyncio
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Optional
+
+from app.metrics import REPORT_RENDER_SECONDS
+
+
+logger = logging.getLogger(__name__)
+
+# Worker processes rendering reports; also the number of reports rendered at once
+REPORT_WORKERS = int(os.getenv("REPORT_WORKERS", "2"))
+# Queued + running jobs allowed before new exports are turned away
+REPORT_MAX_PENDING = int(os.getenv("REPORT_MAX_PENDING", "8"))
+REPORT_MAX_PER_USER = int(os.getenv("REPORT_MAX_PER_USER", "2"))
+REPORT_TIMEOUT = float(os.getenv("REPORT_TIMEOUT", "60"))
+# Long-range reports render several charts per month, so they get longer
+REPORT_RANGE_TIMEOUT = float(os.getenv("REPORT_RANGE_TIMEOUT", "600"))
+# Finished jobs are kept this long for polling; their PDFs live only in the report cache
+REPORT_JOB_TTL = float(os.getenv("REPORT_JOB_TTL", "600"))
+# Finished jobs kept at most, oldest dropped first
+REPORT_MAX_JOBS = int(os.getenv("REPORT_MAX_JOBS", "1000"))
+# Total size of rendered PDFs kept for repeat exports of unchanged data
+REPORT_CACHE_BYTES = int(os.getenv("REPORT_CACHE_BYTES", str(64 * 1024 * 1024)))
+# Bump whenever a report layout in app/pdf.py changes, so cached PDFs are not served for the old one
+REPORT_TEMPLATE_VERSION = 2
+
+
+class ReportQueueFull(Exception):
+    """Raised when too many report jobs are already queued or running."""
+    pass
+
+
+class ReportFailed(Exception):
+    """Raised when a report could not be rendered."""
+    pass
+
+
+@dataclass
+class ReportJob:
+    id: str
+    username: str
+    key: str = ""
+    status: str = "queued"  # queued, running, done or failed
+    created_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+    error: Optional[str] = None
+    # Resolves to the PDF, or None if the job failed
+    task: Optional[asyncio.Task] = field(default=None, repr=False)
+
+    @property
+    def active(self) -> bool:
+        return self.status in ("queued", "running")
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "error": self.error,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+
+
+def report_key(username: str, report_args: dict) -> str:
+    """
+    Content address of a report: a hash of everything that ends up in the PDF.
+
+    Covers the title, the data window and values, the analysis text, the
+    patient and device, the template version and the date printed on the report.
+    """
+    content = json.dumps(
+        [REPORT_TEMPLATE_VERSION, date.today().isoformat(), username, report_args],
+        sort_keys=True, default=str,
+    )
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+class ReportCache:
+    """Least recently used PDFs by report key, bounded by their total size in bytes."""
+
+    def __init__(self, max_bytes: int = REPORT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict[str, bytes] = OrderedDict()
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._data
+
+    def get(self, key: str) -> Optional[bytes]:
+        pdf = self._data.get(key)
+        if pdf is None:
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return pdf
+
+    def set(self, key: str, pdf: bytes) -> None:
+        if len(pdf) > self.max_bytes:
+            return
+        self.pop(key)
+        self._data[key] = pdf
+        self.size += len(pdf)
+        while self.size > self.max_bytes:
+            _, evicted = self._data.popitem(last=False)
+            self.size -= len(evicted)
+
+    def pop(self, key: str) -> Optional[bytes]:
+        pdf = self._data.pop(key, None)
+        if pdf is not None:
+            self.size -= len(pdf)
+        return pdf
+
+    def clear(self) -> None:
+        self._data.clear()
+        self.size = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+# Report layouts by the "layout" entry of the report arguments: renderer names in app.pdf
+REPORT_LAYOUTS = {
+    "summary": "generate_health_report",
+    "range": "generate_range_report",
+}
+
+
+def render_report(report_args: dict) -> bytes:
+    """Render one report in a worker process and return the PDF bytes."""
+    # Imported here so only report workers pay for matplotlib and fpdf
+    from app import pdf
+
+    args = dict(report_args)
+    return getattr(pdf, REPORT_LAYOUTS[args.pop("layout", "summary")])(**args)
+
+
+class ReportService:
+    """
+    Runs health report generation on a pool of worker processes.
+
+    matplotlib and FPDF are CPU bound, so rendering them in separate processes
+    keeps the event loop free for ingestion and dashboards. At most `workers`
+    reports render at once, at most `max_pending` may be queued or running,
+    and a report that takes longer than `timeout` (`range_timeout` for
+    long-range reports) seconds is reported as failed. A worker process cannot
+    be interrupted, so a timed-out render keeps its slot until it actually
+    finishes; the bound on concurrent renders holds even under timeouts.
+    Finished PDFs are kept in a size-bounded cache keyed by report_key(), so
+    exporting unchanged data again does not render it again.
+
+    render() hands the PDF straight to its caller. submit() returns a job to
+    poll instead; jobs hold only the report key, and their PDF is served from
+    the cache, so one evicted before it is downloaded has to be exported
+    again. At most `max_jobs` finished jobs are kept, each for `job_ttl`
+    seconds.
+
+    Jobs live in this process's memory: with several uvicorn workers, polling
+    must reach the worker that accepted the job (e.g. sticky sessions).
+    """
+
+    def __init__(
+        self,
+        workers: int = REPORT_WORKERS,
+        max_pending: int = REPORT_MAX_PENDING,
+        max_per_user: int = REPORT_MAX_PER_USER,
+        timeout: float = REPORT_TIMEOUT,
+        range_timeout: float = REPORT_RANGE_TIMEOUT,
+        job_ttl: float = REPORT_JOB_TTL,
+        max_jobs: int = REPORT_MAX_JOBS,
+        cache_bytes: int = REPORT_CACHE_BYTES,
+    ):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.max_per_user = max_per_user
+        self.timeout = timeout
+        self.range_timeout = range_timeout
+        self.job_ttl = job_ttl
+        self.max_jobs = max_jobs
+        self.cache = ReportCache(cache_bytes)
+        # Jobs handed out by submit(), oldest first
+        self._jobs: OrderedDict[str, ReportJob] = OrderedDict()
+        # Queued and running jobs by report key, whether submitted or rendered directly
+        self._active: dict[str, ReportJob] = {}
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    def start(self) -> None:
+        # spawn: forking a process that already runs DB threads is unsafe
+        self._pool = ProcessPoolExecutor(
+            max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+        )
+        self._slots = asyncio.Semaphore(self.workers)
+
+    async def stop(self) -> None:
+        for job in list(self._active.values()):
+            if job.task is not None and not job.task.done():
+                job.task.cancel()
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def submit(self, username: str, report_args: dict, key: Optional[str] = None) -> ReportJob:
+        """
+        Queue a report to download later. Raises ReportQueueFull if the limits are reached.
+
+        A report already in the cache comes back as a finished job, and one
+        already being rendered for the same content is shared rather than rendered twice.
+        """
+        key = key or report_key(username, report_args)
+        if key in self.cache:
+            job = ReportJob(id=uuid.uuid4().hex, username=username, key=key, status="done")
+            job.finished_at = job.created_at
+        else:
+            job = self._start(username, report_args, key)
+        self._prune()
+        self._jobs[job.id] = job
+        self._jobs.move_to_end(job.id)
+        finished = [job_id for job_id, job in self._jobs.items() if not job.active]
+        for job_id in finished[:max(0, len(self._jobs) - self.max_jobs)]:
+            del self._jobs[job_id]
+        return job
+
+    async def render(self, username: str, report_args: dict, key: Optional[str] = None) -> bytes:
+        """
+        Render a report, or reuse the cached PDF, and return it without keeping a job.
+
+        Raises ReportQueueFull if the limits are reached and ReportFailed if
+        the report could not be rendered.
+        """
+        key = key or report_key(username, report_args)
+        pdf = self.cache.get(key)
+        if pdf is not None:
+            return pdf
+        job = self._start(username, report_args, key)
+        pdf = await asyncio.shield(job.task)
+        if pdf is None:
+            raise ReportFailed(job.error or "Error generating report")
+        return pdf
+
+    def _start(self, username: str, report_args: dict, key: str) -> ReportJob:
+        """The active job rendering this report, started now unless one already is."""
+        if self._pool is None:
+            raise RuntimeError("ReportService has not been started")
+        job = self._active.get(key)
+        if job is not None:
+            return job
+        if len(self._active) >= self.max_pending:
+            raise ReportQueueFull("Too many reports are being generated, try again shortly.")
+        if sum(job.username == username for job in self._active.values()) >= self.max_per_user:
+            raise ReportQueueFull("You already have reports being generated, wait for them to finish.")
+
+        job = ReportJob(id=uuid.uuid4().hex, username=username, key=key)
+        job.task = asyncio.create_task(self._run(job, report_args))
+        self._active[key] = job
+        return job
+
+    def stats(self) -> dict:
+        active = list(self._active.values())
+        return {
+            "queued": sum(job.status == "queued" for job in active),
+            "running": sum(job.status == "running" for job in active),
+            "cache_hits": self.cache.hits,
+            "cache_misses": self.cache.misses,
+            "cache_bytes": self.cache.size,
+        }
+
+    def get(self, job_id: str) -> Optional[ReportJob]:
+        self._prune()
+        return self._jobs.get(job_id)
+
+    def pdf(self, job: ReportJob) -> Optional[bytes]:
+        """The PDF of a finished job, or None if it failed or was evicted from the cache."""
+        return self.cache.get(job.key) if job.status == "done" else None
+
+    async def _run(self, job: ReportJob, report_args: dict) -> Optional[bytes]:
+        loop = asyncio.get_running_loop()
+        layout = report_args.get("layout", "summary")
+        timeout = self.range_timeout if layout == "range" else self.timeout
+        render_began = None
+        outcome = "failed"
+        pdf = None
+        try:
+            await self._slots.acquire()
+            render = None
+            try:
+                job.status = "running"
+                render_began = time.perf_counter()
+                render = loop.run_in_executor(self._pool, render_report, report_args)
+                # Shielded: on timeout the job fails now, but the render keeps the slot
+                pdf = await asyncio.wait_for(asyncio.shield(render), timeout)
+                job.status = outcome = "done"
+            finally:
+                self._release_when_done(render)
+            self.cache.set(job.key, pdf)
+        except asyncio.TimeoutError:
+            outcome = "timeout"
+            job.status, job.error = "failed", f"Report generation timed out after {timeout:.0f}s"
+            logger.error(f"Report {job.id} for {job.username} timed out")
+        except asyncio.CancelledError:
+            outcome = "cancelled"
+            job.status, job.error = "failed", "Cancelled"
+            raise
+        except Exception as e:
+            job.status, job.error = "failed", "Error generating report"
+            logger.error(f"Error generating report {job.id} for user {job.username}: {e}")
+        finally:
+            job.finished_at = time.time()
+            if self._active.get(job.key) is job:
+                del self._active[job.key]
+            if render_began is not None:
+                REPORT_RENDER_SECONDS.observe(time.perf_counter() - render_began, layout, outcome)
+        return pdf
+
+    def _release_when_done(self, render: Optional[asyncio.Future]) -> None:
+        """Free a render slot once its worker process is done with the render."""
+        if render is None or render.done():
+            self._slots.release()
+            return
+
+        def release(future: asyncio.Future) -> None:
+            # Consume the outcome of the abandoned render so it is not logged as unretrieved
+            if not future.cancelled():
+                future.exception()
+            self._slots.release()
+
+        render.add_done_callback(release)
+
+    def _prune(self) -> None:
+        cutoff = time.time() - self.job_ttl
+        for job_id in [job.id for job in self._jobs.values() if job.finished_at and job.finished_at < cutoff]:
+            del self._jobs[job_id]
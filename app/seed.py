@@ -0,0 +1,75 @@
+"""
+Initial rows for a freshly created database: the inventory of unassigned
+devices that signups draw from, and optionally demo users and readings.
+
+The demo data is opt-in (SEED_DEMO_DATA=1) and built lazily: passwords are
+only hashed when the tables were just created and are actually about to be
+seeded, never at import time.
+"""
+import os
+import random
+from datetime import datetime, timedelta
+
+from app.database import generate_serial_number
+from app.passwords import hash_password
+
+# Seed the demo accounts below into a fresh database
+SEED_DEMO_DATA = os.getenv("SEED_DEMO_DATA", "false").lower() in ("1", "true", "yes")
+# Unassigned devices created in a fresh database, one per future signup
+SEED_SPARE_DEVICES = int(os.getenv("SEED_SPARE_DEVICES", "20"))
+
+# username: (first name, last name, email, password, device serial number)
+DEMO_USERS = {
+    "alice": ("Alice", "Smith", "alice@example.com", "pass123", "MH-830B35DF"),
+    "bob": ("Bob", "Johnson", "bob@example.com", "pass456", "MH-EAF7EF67"),
+}
+
+
+def _demo_readings() -> list[tuple]:
+    rows = []
+    # alice: healthy and steady
+    for i in range(10):
+        rows.append((
+            "alice", "MH-830B35DF",
+            random.randrange(60, 100), random.randrange(95, 100), random.randrange(150, 155),
+            random.randrange(115, 120), random.randrange(75, 80),
+            datetime(2025, 1, 1) + timedelta(days=i),
+        ))
+    # bob: high heart rate, low oxygen, gaining weight, high diastolic pressure
+    for i in range(10):
+        rows.append((
+            "bob", "MH-EAF7EF67",
+            random.randrange(120, 150), random.randrange(80, 85), random.randrange(150 + i * 2, 155 + i * 2),
+            random.randrange(115, 120), random.randrange(90, 95),
+            datetime(2025, 2, 1) + timedelta(days=i),
+        ))
+    return rows
+
+
+def initial_seed() -> dict:
+    """
+    Build the rows passed to setup_database: SEED_SPARE_DEVICES unassigned
+    devices, plus the demo data set when SEED_DEMO_DATA is on.
+    """
+    data = demo_seed() if SEED_DEMO_DATA else {}
+    data["devices"] = [(generate_serial_number(),) for _ in range(SEED_SPARE_DEVICES)]
+    return data
+
+
+def demo_seed() -> dict:
+    """
+    Build the demo data set.
+
+    Returns:
+        dict: "users" (first_name, last_name, email, username, password hash,
+        serial_num), "user_devices" (username, serial_num) and "data" rows
+        (username, serial_num, avgHR, avgSpO2, weight, bpS, bpD, created_at)
+    """
+    return {
+        "users": [
+            (first_name, last_name, email, username, hash_password(password), serial_num)
+            for username, (first_name, last_name, email, password, serial_num) in DEMO_USERS.items()
+        ],
+        "user_devices": [(username, user[4]) for username, user in DEMO_USERS.items()],
+        "data": _demo_readings(),
+    }
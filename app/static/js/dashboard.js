@@ -36,11 +36,52 @@ logoutForm.addEventListener('click', function (event) {
 
 let charts = {};
 
+// Loaded once, then kept current by the live stream instead of re-fetching
+let dashboardData = null;
+
 async function getData() {
-    const theResponse = await fetch(`/dashboard/user/${username}/data`); 
-    const theData = await theResponse.json(); 
-    
-    return theData;  
+    if (!dashboardData) {
+        const theResponse = await fetch(`/dashboard/user/${username}/data`); 
+        dashboardData = await theResponse.json(); 
+    }
+    return dashboardData;  
+}
+
+// Series in the data endpoint's response that live readings extend
+const LIVE_SERIES = ["bpm", "spo2", "weight", "systolic", "diastolic"];
+// Charts keep showing this many of the latest readings
+const MAX_POINTS = 7;
+
+function applyLiveReadings(readings) {
+  if (!dashboardData) return;
+  readings.forEach(reading => {
+    const date = new Date(reading.created_at);
+    dashboardData.dates.push(date.toLocaleDateString("en-US", { month: "short", day: "2-digit" }));
+    LIVE_SERIES.forEach(series => dashboardData[series].push(reading[series]));
+  });
+  if (dashboardData.dates.length > MAX_POINTS) {
+    const extra = dashboardData.dates.length - MAX_POINTS;
+    dashboardData.dates.splice(0, extra);
+    LIVE_SERIES.forEach(series => dashboardData[series].splice(0, extra));
+  }
+  // The analysis covers the latest readings, so fetch it again when asked
+  dashboardData.theResponse = null;
+
+  Object.values(charts).forEach(chart => {
+    chart.data.labels = [...dashboardData.dates];
+    chart.data.datasets.forEach(dataset => {
+      dataset.data = [...dashboardData[dataset.series]];
+    });
+    chart.update();
+  });
+}
+
+function connectLiveVitals() {
+  if (!window.EventSource) return;
+  const source = new EventSource(`/dashboard/user/${username}/live`);
+  source.addEventListener("reading", event => {
+    applyLiveReadings(JSON.parse(event.data).readings);
+  });
 }
 
 document.addEventListener("DOMContentLoaded", async function () {
@@ -50,7 +91,10 @@ document.addEventListener("DOMContentLoaded", async function () {
     // alert("Click test !"); 
     theEvent.preventDefault();  
     theData = await getData(); 
-    console.log(theData); 
+    if (!theData["theResponse"]) {
+      dashboardData = null;
+      theData = await getData();
+    }
     analysisResponse.textContent = theData["theResponse"]; 
   }); 
 
@@ -93,6 +137,8 @@ document.addEventListener("DOMContentLoaded", async function () {
   document.querySelectorAll(".metric-button").forEach(button => {
     button.click();
   });
+
+  connectLiveVitals();
 });
 
 // Chart rendering function
@@ -103,8 +149,7 @@ async function renderChart(canvasId, type) {
   const ctx = canvas.getContext("2d");
 
   // ✅ Use your structured backend data
-  const response = await fetch(`/dashboard/user/${username}/data`);
-  const userData = await response.json();
+  const userData = await getData();
 
   if (type === "bp") {
     const systolic = userData["systolic"];
@@ -183,6 +228,7 @@ async function renderChart(canvasId, type) {
     datasets: type === "bp" ? [
       {
         label: "Systolic",
+        series: "systolic",
         data: data.systolic,
         borderColor: 'red',
         fill: false,
@@ -190,6 +236,7 @@ async function renderChart(canvasId, type) {
       },
       {
         label: "Diastolic",
+        series: "diastolic",
         data: data.diastolic,
         borderColor: 'blue',
         fill: false,
@@ -197,6 +244,7 @@ async function renderChart(canvasId, type) {
       }
     ] : [{
       label: label,
+      series: type,
       data: data,
       borderColor: 'blue',
       fill: false,
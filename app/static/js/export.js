@@ -40,6 +40,12 @@ document.querySelector(".export-form").addEventListener("submit", async function
     e.preventDefault();
 
     const title = document.getElementById("export-title").value;
+    // With a date range the server builds a multi-page report of that period
+    const from = document.getElementById("export-from").value;
+    const to = document.getElementById("export-to").value;
+    const body = { title };
+    if (from) body.from = from;
+    if (to) body.to = to;
 
     const currentUrl = window.location.href;
     const username = currentUrl.split('/').pop();
@@ -50,7 +56,7 @@ document.querySelector(".export-form").addEventListener("submit", async function
             headers: {
                 'Content-Type': 'application/json'
             },
-            body: JSON.stringify({ title })
+            body: JSON.stringify(body)
         });
 
         if (!response.ok) {
@@ -0,0 +1,204 @@
+"""
+Storage backends behind the helpers in app.database.
+
+A backend implements the blocking data access of the app: users, devices,
+sessions, readings and their hourly/daily rollups. app.database wraps every
+call with run_db and adds what is backend independent on top (session cache,
+serial number index, change notifications, metrics).
+
+    mysql   (default) MySQL server from MYSQL_* settings, pooled connections
+    sqlite  embedded SQLite file in WAL mode (SQLITE_PATH), for single-node deployments
+    memory  plain Python dicts, nothing persisted; for tests, benchmarks and demos
+"""
+import logging
+import os
+from datetime import datetime
+from typing import Callable, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Which backend create_storage() returns: mysql, sqlite or memory
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "mysql").lower()
+
+# Vitals columns of the data table
+DATA_FIELDS = ("avgHR", "avgSpO2", "weight", "bpS", "bpD")
+
+# Readings returned by get_recent_data, as analysed on the dashboard
+RECENT_READINGS = 7
+
+# Time bucket granularities of the rollups
+ROLLUP_RESOLUTIONS = ("hour", "day")
+
+
+class DatabaseConnectionError(Exception):
+    """Custom exception for database connection failures"""
+    pass
+
+
+def nonblocking(method):
+    """
+    Mark a storage method that never blocks (no I/O, no waiting on locks held
+    for long), so run_db calls it directly instead of on the DB thread pool.
+    """
+    method.blocking = False
+    return method
+
+
+class Storage:
+    """
+    Blocking data access used by app.database.
+
+    Rows are plain dicts keyed by column name (user, device and session rows
+    carry every column). Timestamps are naive local datetimes; a created_at
+    of None means "now". Methods may be called from several threads at once.
+    """
+
+    # Calls worth running at once on the DB thread pool
+    threads = 1
+
+    def open(self) -> None:
+        """Connect, or fail with DatabaseConnectionError so the caller can retry."""
+        pass
+
+    def close(self) -> None:
+        pass
+
+    def stats(self) -> dict:
+        """Connections held (size), idle ones and the most allowed (max_size)."""
+        return {"size": 0, "idle": 0, "max_size": 0}
+
+    def setup(self, seed: Optional[Callable[[], dict]] = None) -> bool:
+        """
+        Create the schema if it does not exist yet, bring it up to date and
+        clear sessions left over from a previous run.
+
+        `seed` is only called, and its rows inserted, when the schema was just
+        created. It returns a dict of row tuples (see app.seed.initial_seed):
+        "users" (first_name, last_name, email, username, password, serial_num),
+        "user_devices" (username, serial_num), "devices" (serial_num,) and
+        "data" (username, serial_num, avgHR, avgSpO2, weight, bpS, bpD, created_at).
+
+        Returns:
+            bool: True if the schema was created by this call
+        """
+        raise NotImplementedError
+
+    # Users
+    def get_user_by_username(self, username: str) -> Optional[dict]:
+        raise NotImplementedError
+
+    def get_user_by_id(self, user_id: int) -> Optional[dict]:
+        raise NotImplementedError
+
+    def get_user_by_serial_num(self, serial_num: str) -> Optional[dict]:
+        raise NotImplementedError
+
+    def create_user(self, username: str, first_name: str, last_name: str, email: str, password: str) -> Optional[tuple]:
+        """
+        Insert a user and assign them an unassigned device.
+
+        Returns:
+            tuple: (user id, assigned serial number), or None if no device is free
+        """
+        raise NotImplementedError
+
+    # Devices
+    def get_device_by_username(self, username: str) -> list[dict]:
+        raise NotImplementedError
+
+    def get_device_by_serial_num(self, serial_num: str) -> Optional[dict]:
+        raise NotImplementedError
+
+    def create_device(self, username: Optional[str], serial_num: str) -> int:
+        raise NotImplementedError
+
+    def delete_device(self, device_id: int) -> Optional[str]:
+        """Delete a device; returns its serial number, or None if there was no such device."""
+        raise NotImplementedError
+
+    def load_serial_index(self) -> dict:
+        """Every registered serial number (devices and users) -> username."""
+        raise NotImplementedError
+
+    def get_usernames_by_serial_nums(self, serial_nums: list[str]) -> dict:
+        raise NotImplementedError
+
+    # Sessions
+    def create_session(self, user_id: int, session_id: str) -> bool:
+        raise NotImplementedError
+
+    def get_session(self, session_id: str) -> Optional[dict]:
+        raise NotImplementedError
+
+    def get_session_user(self, session_id: str) -> Optional[dict]:
+        """{"user_id", "username"} of a session, or None."""
+        raise NotImplementedError
+
+    def delete_session(self, session_id: str) -> bool:
+        raise NotImplementedError
+
+    # Readings
+    def add_readings(self, readings: list[dict]) -> int:
+        """
+        Store readings (dicts with username, serial_num, the DATA_FIELDS and an
+        optional created_at) and fold them into the rollups, atomically.
+
+        Returns:
+            int: The number of rows inserted
+        """
+        raise NotImplementedError
+
+    def get_recent_data(self, username: str) -> list[tuple]:
+        """The latest RECENT_READINGS readings, oldest first, as (*DATA_FIELDS, created_at) tuples."""
+        raise NotImplementedError
+
+    def get_data_page(
+        self,
+        username: str,
+        start: Optional[datetime],
+        end: Optional[datetime],
+        after: Optional[tuple],
+        fields: list[str],
+        limit: int,
+        descending: bool,
+    ) -> list[dict]:
+        """See app.database.get_data_page."""
+        raise NotImplementedError
+
+    def get_rollups(
+        self, username: str, resolution: str, start: Optional[datetime], end: Optional[datetime]
+    ) -> list[dict]:
+        """See app.database.get_rollups."""
+        raise NotImplementedError
+
+
+def rollup_bucket(created_at: datetime, resolution: str) -> datetime:
+    """Start of the hour or day a reading falls in."""
+    if resolution == "hour":
+        return created_at.replace(minute=0, second=0, microsecond=0)
+    return created_at.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def seed_readings(rows: Iterable[tuple]) -> list[dict]:
+    """Seed "data" tuples as reading dicts for add_readings."""
+    columns = ("username", "serial_num", *DATA_FIELDS, "created_at")
+    return [dict(zip(columns, row)) for row in rows]
+
+
+def create_storage(backend: str = STORAGE_BACKEND) -> Storage:
+    """
+    Return the configured backend. Backends are imported on demand, so
+    mysql-connector is only needed when MySQL is used.
+    """
+    if backend == "mysql":
+        from app.storage.mysql import MySQLStorage
+        return MySQLStorage()
+    if backend == "sqlite":
+        from app.storage.sqlite import SQLiteStorage
+        logger.info("Using embedded SQLite storage")
+        return SQLiteStorage()
+    if backend == "memory":
+        from app.storage.memory import MemoryStorage
+        logger.warning("Using in-memory storage: nothing is persisted")
+        return MemoryStorage()
+    raise ValueError(f"Unknown STORAGE_BACKEND {backend!r}, expected mysql, sqlite or memory")
@@ -0,0 +1,314 @@
+"""
+In-memory storage: plain Python dicts, nothing persisted.
+
+Every call is a few dict lookups or a binary search, so run_db calls the
+methods directly on the event loop instead of handing them to a thread. Meant
+for tests, benchmarks and demos, and as the reference for what the other
+backends return.
+"""
+import threading
+from bisect import bisect_left, bisect_right, insort
+from datetime import datetime
+from itertools import count
+from typing import Callable, Optional
+
+from app.storage import (
+    DATA_FIELDS,
+    RECENT_READINGS,
+    ROLLUP_RESOLUTIONS,
+    Storage,
+    nonblocking,
+    rollup_bucket,
+    seed_readings,
+)
+
+
+class MemoryStorage(Storage):
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._created = False
+        self._clear()
+
+    def _clear(self) -> None:
+        self.users: dict[str, dict] = {}
+        self.users_by_id: dict[int, dict] = {}
+        self.users_by_serial_num: dict[str, dict] = {}
+        self.emails: set[str] = set()
+        self.devices: dict[int, dict] = {}
+        self.devices_by_serial_num: dict[str, dict] = {}
+        self.sessions: dict[str, dict] = {}
+        # username -> (created_at, id) keys in order, and the rows in the same order
+        self.data_keys: dict[str, list[tuple]] = {}
+        self.data_rows: dict[str, list[dict]] = {}
+        # resolution -> username -> bucket -> aggregates
+        self.rollups: dict[str, dict[str, dict[datetime, dict]]] = {
+            resolution: {} for resolution in ROLLUP_RESOLUTIONS
+        }
+        self._user_ids = count(1)
+        self._device_ids = count(1)
+        self._data_ids = count(1)
+
+    @nonblocking
+    def setup(self, seed: Optional[Callable[[], dict]] = None) -> bool:
+        with self._lock:
+            if self._created:
+                self.sessions.clear()
+                return False
+            self._created = True
+            if seed is not None:
+                data = seed()
+                for first_name, last_name, email, username, password, serial_num in data.get("users", ()):
+                    self._insert_user(username, first_name, last_name, email, password, serial_num)
+                for username, serial_num in data.get("user_devices", ()):
+                    self._insert_device(username, serial_num)
+                for (serial_num,) in data.get("devices", ()):
+                    self._insert_device(None, serial_num)
+                self._insert_readings(seed_readings(data.get("data", ())))
+            return True
+
+    # Users
+    @nonblocking
+    def get_user_by_username(self, username: str) -> Optional[dict]:
+        return _copy(self.users.get(username))
+
+    @nonblocking
+    def get_user_by_id(self, user_id: int) -> Optional[dict]:
+        return _copy(self.users_by_id.get(user_id))
+
+    @nonblocking
+    def get_user_by_serial_num(self, serial_num: str) -> Optional[dict]:
+        return _copy(self.users_by_serial_num.get(serial_num))
+
+    @nonblocking
+    def create_user(self, username: str, first_name: str, last_name: str, email: str, password: str) -> Optional[tuple]:
+        with self._lock:
+            device = next((d for d in self.devices.values() if d["username"] is None), None)
+            if device is None:
+                return None
+            user = self._insert_user(username, first_name, last_name, email, password, device["serial_num"])
+            device["username"] = username
+            return user["id"], device["serial_num"]
+
+    def _insert_user(self, username, first_name, last_name, email, password, serial_num) -> dict:
+        if username in self.users:
+            raise ValueError(f"Duplicate username {username!r}")
+        if email in self.emails:
+            raise ValueError(f"Duplicate email {email!r}")
+        if serial_num is not None and serial_num in self.users_by_serial_num:
+            raise ValueError(f"Duplicate serial number {serial_num!r}")
+        user = {
+            "id": next(self._user_ids),
+            "first_name": first_name,
+            "last_name": last_name,
+            "username": username,
+            "password": password,
+            "email": email,
+            "serial_num": serial_num,
+            "created_at": datetime.now(),
+        }
+        self.users[username] = user
+        self.users_by_id[user["id"]] = user
+        self.emails.add(email)
+        if serial_num is not None:
+            self.users_by_serial_num[serial_num] = user
+        return user
+
+    # Devices
+    @nonblocking
+    def get_device_by_username(self, username: str) -> list[dict]:
+        return [dict(device) for device in self.devices.values() if device["username"] == username]
+
+    @nonblocking
+    def get_device_by_serial_num(self, serial_num: str) -> Optional[dict]:
+        return _copy(self.devices_by_serial_num.get(serial_num))
+
+    @nonblocking
+    def create_device(self, username: Optional[str], serial_num: str) -> int:
+        with self._lock:
+            return self._insert_device(username, serial_num)["id"]
+
+    def _insert_device(self, username: Optional[str], serial_num: str) -> dict:
+        if serial_num in self.devices_by_serial_num:
+            raise ValueError(f"Duplicate serial number {serial_num!r}")
+        if username is not None and username not in self.users:
+            raise ValueError(f"Unknown user {username!r}")
+        device = {"id": next(self._device_ids), "username": username, "serial_num": serial_num, "created_at": datetime.now()}
+        self.devices[device["id"]] = device
+        self.devices_by_serial_num[serial_num] = device
+        return device
+
+    @nonblocking
+    def delete_device(self, device_id: int) -> Optional[str]:
+        with self._lock:
+            device = self.devices.pop(device_id, None)
+            if device is None:
+                return None
+            del self.devices_by_serial_num[device["serial_num"]]
+            return device["serial_num"]
+
+    @nonblocking
+    def load_serial_index(self) -> dict:
+        with self._lock:
+            index = {serial_num: user["username"] for serial_num, user in self.users_by_serial_num.items()}
+            index.update(
+                (device["serial_num"], device["username"])
+                for device in self.devices.values() if device["username"] is not None
+            )
+            return index
+
+    @nonblocking
+    def get_usernames_by_serial_nums(self, serial_nums: list[str]) -> dict:
+        usernames = {}
+        for serial_num in serial_nums:
+            owner = self.devices_by_serial_num.get(serial_num) or self.users_by_serial_num.get(serial_num)
+            if owner is not None and owner["username"] is not None:
+                usernames[serial_num] = owner["username"]
+        return usernames
+
+    # Sessions
+    @nonblocking
+    def create_session(self, user_id: int, session_id: str) -> bool:
+        with self._lock:
+            if session_id in self.sessions:
+                raise ValueError(f"Duplicate session id {session_id!r}")
+            if user_id not in self.users_by_id:
+                raise ValueError(f"Unknown user id {user_id}")
+            self.sessions[session_id] = {"id": session_id, "user_id": user_id, "created_at": datetime.now()}
+            return True
+
+    @nonblocking
+    def get_session(self, session_id: str) -> Optional[dict]:
+        return _copy(self.sessions.get(session_id))
+
+    @nonblocking
+    def get_session_user(self, session_id: str) -> Optional[dict]:
+        session = self.sessions.get(session_id)
+        user = self.users_by_id.get(session["user_id"]) if session else None
+        if user is None:
+            return None
+        return {"user_id": user["id"], "username": user["username"]}
+
+    @nonblocking
+    def delete_session(self, session_id: str) -> bool:
+        self.sessions.pop(session_id, None)
+        return True
+
+    # Readings
+    @nonblocking
+    def add_readings(self, readings: list[dict]) -> int:
+        with self._lock:
+            self._insert_readings(readings)
+        return len(readings)
+
+    def _insert_readings(self, readings: list[dict]) -> None:
+        # Check every reading before touching anything, so a bad one leaves
+        # neither rows nor rollups behind
+        for reading in readings:
+            _check_reading(reading)
+        now = datetime.now()
+        for reading in readings:
+            username = reading["username"]
+            row = {
+                "id": next(self._data_ids),
+                "serial_num": reading["serial_num"],
+                **{field: reading.get(field) for field in DATA_FIELDS},
+                "created_at": reading.get("created_at") or now,
+            }
+            if row["weight"] is not None:
+                # A DOUBLE column on MySQL, REAL on SQLite
+                row["weight"] = float(row["weight"])
+            key = (row["created_at"], row["id"])
+            keys = self.data_keys.setdefault(username, [])
+            rows = self.data_rows.setdefault(username, [])
+            if not keys or key > keys[-1]:
+                keys.append(key)
+                rows.append(row)
+            else:
+                index = bisect_right(keys, key)
+                insort(keys, key)
+                rows.insert(index, row)
+            for resolution in ROLLUP_RESOLUTIONS:
+                self._fold(resolution, username, row)
+
+    def _fold(self, resolution: str, username: str, row: dict) -> None:
+        buckets = self.rollups[resolution].setdefault(username, {})
+        bucket = rollup_bucket(row["created_at"], resolution)
+        rollup = buckets.get(bucket)
+        if rollup is None:
+            rollup = buckets[bucket] = {"readings": 0}
+            for field in DATA_FIELDS:
+                rollup.update({f"{field}_min": None, f"{field}_max": None, f"{field}_sum": 0, f"{field}_count": 0})
+        rollup["readings"] += 1
+        for field in DATA_FIELDS:
+            value = row[field]
+            if value is None:
+                continue
+            low, high = rollup[f"{field}_min"], rollup[f"{field}_max"]
+            rollup[f"{field}_min"] = value if low is None else min(low, value)
+            rollup[f"{field}_max"] = value if high is None else max(high, value)
+            rollup[f"{field}_sum"] += value
+            rollup[f"{field}_count"] += 1
+
+    @nonblocking
+    def get_recent_data(self, username: str) -> list[tuple]:
+        rows = self.data_rows.get(username, [])[-RECENT_READINGS:]
+        return [(*(row[field] for field in DATA_FIELDS), row["created_at"]) for row in rows]
+
+    @nonblocking
+    def get_data_page(self, username, start, end, after, fields, limit, descending) -> list[dict]:
+        with self._lock:
+            keys = self.data_keys.get(username, [])
+            rows = self.data_rows.get(username, [])
+            # (t,) sorts before every (t, id), so these find the first key at or after t
+            low = bisect_left(keys, (start,)) if start is not None else 0
+            high = bisect_left(keys, (end,)) if end is not None else len(keys)
+            if after is not None:
+                if descending:
+                    high = min(high, bisect_left(keys, tuple(after)))
+                else:
+                    low = max(low, bisect_right(keys, tuple(after)))
+            if descending:
+                page = rows[max(low, high - limit):high][::-1]
+            else:
+                page = rows[low:min(high, low + limit)]
+            return [
+                {"id": row["id"], "created_at": row["created_at"], **{field: row[field] for field in fields}}
+                for row in page
+            ]
+
+    @nonblocking
+    def get_rollups(self, username, resolution, start, end) -> list[dict]:
+        with self._lock:
+            buckets = sorted(self.rollups[resolution].get(username, {}).items())
+            result = []
+            for bucket, rollup in buckets:
+                if (start is not None and bucket < start) or (end is not None and bucket >= end):
+                    continue
+                row = {"bucket": bucket, "readings": rollup["readings"]}
+                for field in DATA_FIELDS:
+                    total, counted = rollup[f"{field}_sum"], rollup[f"{field}_count"]
+                    row[f"{field}_min"] = rollup[f"{field}_min"]
+                    row[f"{field}_max"] = rollup[f"{field}_max"]
+                    row[f"{field}_mean"] = total / counted if counted else None
+                    row[f"{field}_count"] = counted
+                result.append(row)
+            return result
+
+
+def _check_reading(reading: dict) -> None:
+    """Reject what the SQL schemas reject: missing keys, non-numeric vitals and aware timestamps."""
+    for key in ("username", "serial_num"):
+        if not isinstance(reading.get(key), str):
+            raise ValueError(f"Reading {key} must be a string, got {reading.get(key)!r}")
+    for field in DATA_FIELDS:
+        value = reading.get(field)
+        allowed = (int, float) if field == "weight" else (int,)
+        if value is not None and (isinstance(value, bool) or not isinstance(value, allowed)):
+            raise ValueError(f"Reading {field} must be a number, got {value!r}")
+    created_at = reading.get("created_at")
+    if created_at is not None and (not isinstance(created_at, datetime) or created_at.tzinfo is not None):
+        raise ValueError(f"Reading created_at must be a naive local datetime, got {created_at!r}")
+
+
+def _copy(row: Optional[dict]) -> Optional[dict]:
+    return dict(row) if row is not None else None
@@ -0,0 +1,831 @@
+"""
+MySQL storage: the production backend, on a pool of mysql-connector connections.
+"""
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Callable, Optional
+
+import mysql.connector
+from dotenv import load_dotenv
+from mysql.connector import Error
+
+from app.storage import (
+    DATA_FIELDS,
+    RECENT_READINGS,
+    DatabaseConnectionError,
+    Storage,
+)
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Database connection settings
+DB_CONFIG = {
+    "host": os.getenv("MYSQL_HOST"),
+    "user": os.getenv("MYSQL_USER"),
+    "password": os.getenv("MYSQL_PASSWORD"),
+    "database": os.getenv("MYSQL_DATABASE"),
+    "port": os.getenv("MYSQL_PORT"),
+    # "ssl_ca": os.getenv('MYSQL_SSL_CA'),
+    # "ssl_verify_identity": True
+}
+
+# Connection pool settings
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "2"))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+DB_POOL_ACQUIRE_TIMEOUT = float(os.getenv("DB_POOL_ACQUIRE_TIMEOUT", "10"))
+# Idle connections older than this are pinged before being handed out
+DB_POOL_HEALTHCHECK_INTERVAL = float(os.getenv("DB_POOL_HEALTHCHECK_INTERVAL", "30"))
+
+
+
+def get_db_connection(
+    max_retries: int = 12,  # 12 retries = 1 minute total (12 * 5 seconds)
+    retry_delay: int = 5,  # 5 seconds between retries
+) -> mysql.connector.MySQLConnection:
+    """
+    Create database connection with retry mechanism.
+
+    This blocks the calling thread while it retries; inside the app use the
+    pool (see init_db_pool / run_db), which only makes single attempts here.
+    """
+    connection: Optional[mysql.connector.MySQLConnection] = None
+    attempt = 1
+    last_error = None
+
+    while attempt <= max_retries:
+        try:
+            connection = mysql.connector.connect(
+                host=DB_CONFIG["host"],
+                user=DB_CONFIG["user"],
+                port=DB_CONFIG["port"],
+                password=DB_CONFIG["password"],
+                database=DB_CONFIG["database"],
+                # ssl_ca=DB_CONFIG["ssl_ca"],
+                # ssl_verify_identity=True
+            )
+
+            # Test the connection
+            connection.ping(reconnect=True, attempts=1, delay=0)
+            logger.info("Database connection established successfully")
+            return connection
+
+        except Error as err:
+            last_error = err
+
+            if connection is not None:
+                try:
+                    connection.close()
+                except Exception:
+                    pass
+
+            if attempt == max_retries:
+                break
+
+            logger.warning(
+                f"Connection attempt {attempt}/{max_retries} failed: {err}. "
+                f"Retrying in {retry_delay} seconds..."
+            )
+            time.sleep(retry_delay)
+            attempt += 1
+
+    raise DatabaseConnectionError(
+        f"Failed to connect to database after {max_retries} attempts. "
+        f"Last error: {last_error}"
+    )
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of MySQL connections.
+
+    Keeps at least `min_size` connections open and never more than `max_size`.
+    Connections that have been idle longer than `healthcheck_interval` seconds
+    are pinged before being handed out and replaced if the ping fails.
+    """
+
+    def __init__(
+        self,
+        min_size: int = DB_POOL_MIN_SIZE,
+        max_size: int = DB_POOL_MAX_SIZE,
+        healthcheck_interval: float = DB_POOL_HEALTHCHECK_INTERVAL,
+        acquire_timeout: float = DB_POOL_ACQUIRE_TIMEOUT,
+    ):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError(f"Invalid pool size: min={min_size}, max={max_size}")
+        self.min_size = min_size
+        self.max_size = max_size
+        self.healthcheck_interval = healthcheck_interval
+        self.acquire_timeout = acquire_timeout
+        self._idle = deque()  # (connection, last_used) pairs, most recent on the right
+        self._size = 0  # idle + borrowed connections
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def open(self) -> None:
+        """Open the minimum number of connections."""
+        try:
+            for _ in range(self.min_size):
+                connection = get_db_connection(max_retries=1)
+                with self._cond:
+                    self._size += 1
+                    self._idle.append((connection, time.monotonic()))
+        except Exception:
+            self.close()
+            raise
+        logger.info(f"Database pool opened (min={self.min_size}, max={self.max_size})")
+
+    def acquire(self) -> mysql.connector.MySQLConnection:
+        """Borrow a healthy connection, opening a new one if the pool may still grow."""
+        deadline = time.monotonic() + self.acquire_timeout
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise DatabaseConnectionError("Database pool is closed")
+                if self._idle:
+                    connection, last_used = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    self._size += 1
+                    connection, last_used = None, None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise DatabaseConnectionError(
+                        f"Timed out waiting for a database connection "
+                        f"(pool size {self.max_size})"
+                    )
+                self._cond.wait(remaining)
+
+        if connection is not None and time.monotonic() - last_used > self.healthcheck_interval:
+            try:
+                connection.ping(reconnect=False)
+            except Error as err:
+                logger.warning(f"Discarding stale pooled connection: {err}")
+                self._close_quietly(connection)
+                connection = None
+
+        if connection is None:
+            try:
+                connection = get_db_connection(max_retries=1)
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+                raise
+        return connection
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {"size": self._size, "idle": len(self._idle), "max_size": self.max_size}
+
+    def release(self, connection: mysql.connector.MySQLConnection, discard: bool = False) -> None:
+        """Return a connection to the pool, or drop it if it is broken or the pool is closed."""
+        if not discard:
+            # With autocommit off even a SELECT opens a transaction; roll it back
+            # so the next borrower does not read from a stale snapshot.
+            try:
+                if connection.in_transaction:
+                    connection.rollback()
+            except Error:
+                discard = True
+
+        with self._cond:
+            if discard or self._closed:
+                self._size -= 1
+                drop = True
+            else:
+                self._idle.append((connection, time.monotonic()))
+                drop = False
+            self._cond.notify()
+
+        if drop:
+            self._close_quietly(connection)
+
+    def close(self) -> None:
+        """Close all idle connections; borrowed ones are closed when they are released."""
+        with self._cond:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for connection, _ in idle:
+            self._close_quietly(connection)
+        logger.info("Database pool closed")
+
+    @staticmethod
+    def _close_quietly(connection) -> None:
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+
+# Pre-aggregated vitals per user and time bucket, for long-range charts.
+# resolution -> (table, bucket expression over data.created_at)
+ROLLUP_TABLES = {
+    "hour": ("data_hourly", "TIMESTAMP(DATE(created_at), MAKETIME(HOUR(created_at), 0, 0))"),
+    "day": ("data_daily", "TIMESTAMP(DATE(created_at))"),
+}
+_ROLLUP_AGGREGATES = ("min", "max", "sum", "count")
+
+
+def _rollup_table_sql(table: str) -> str:
+    metric_columns = ",\n".join(
+        f"{field}_min INT DEFAULT NULL, {field}_max INT DEFAULT NULL, "
+        f"{field}_sum BIGINT NOT NULL DEFAULT 0, {field}_count INT NOT NULL DEFAULT 0"
+        for field in DATA_FIELDS
+    )
+    return f"""
+        CREATE TABLE {table} (
+            username VARCHAR(255) NOT NULL,
+            bucket DATETIME NOT NULL,
+            readings INT NOT NULL DEFAULT 0,
+            {metric_columns},
+            PRIMARY KEY (username, bucket)
+        )
+    """
+
+
+def _rollup_upsert_sql(resolution: str, where: str) -> str:
+    """
+    Fold the data rows matching `where` into a rollup table.
+
+    Buckets that already exist are merged (min/max combined, sums and counts
+    added), so the same statement serves incremental updates and backfills.
+    """
+    table, bucket = ROLLUP_TABLES[resolution]
+    columns = ["username", "bucket", "readings"] + [
+        f"{field}_{aggregate}" for field in DATA_FIELDS for aggregate in _ROLLUP_AGGREGATES
+    ]
+    selects = ["username AS n_username", f"{bucket} AS n_bucket", "COUNT(*) AS n_readings"]
+    updates = [f"readings = {table}.readings + n_readings"]
+    for field in DATA_FIELDS:
+        selects += [
+            f"MIN({field}) AS n_{field}_min",
+            f"MAX({field}) AS n_{field}_max",
+            f"COALESCE(SUM({field}), 0) AS n_{field}_sum",
+            f"COUNT({field}) AS n_{field}_count",
+        ]
+        updates += [
+            f"{field}_min = LEAST(COALESCE({table}.{field}_min, n_{field}_min), COALESCE(n_{field}_min, {table}.{field}_min))",
+            f"{field}_max = GREATEST(COALESCE({table}.{field}_max, n_{field}_max), COALESCE(n_{field}_max, {table}.{field}_max))",
+            f"{field}_sum = {table}.{field}_sum + n_{field}_sum",
+            f"{field}_count = {table}.{field}_count + n_{field}_count",
+        ]
+    return f"""
+        INSERT INTO {table} ({", ".join(columns)})
+        SELECT * FROM (
+            SELECT {", ".join(selects)}
+            FROM data
+            WHERE {where}
+            GROUP BY n_username, n_bucket
+        ) AS new_rows
+        ON DUPLICATE KEY UPDATE {", ".join(updates)}
+    """
+
+
+def _update_rollups(cursor, first_id: int, last_id: int) -> None:
+    """Add the data rows with ids first_id..last_id to every rollup table."""
+    for resolution in ROLLUP_TABLES:
+        cursor.execute(_rollup_upsert_sql(resolution, "id BETWEEN %s AND %s"), (first_id, last_id))
+
+
+# Schema changes applied on top of the tables created by setup_database, in
+# order, to fresh and existing deployments alike. Each entry is
+# (version, description, [statements]). Append new migrations with the next
+# version number; never edit or reorder released ones.
+MIGRATIONS = [
+    (1, "index data by user and time", [
+        "CREATE INDEX idx_data_username_created_at ON data (username, created_at)",
+    ]),
+    (2, "index sessions by user", [
+        "CREATE INDEX idx_sessions_user_id ON sessions (user_id)",
+    ]),
+    (3, "hourly and daily rollup tables", [
+        _rollup_table_sql(table) for table, _ in ROLLUP_TABLES.values()
+    ]),
+    (4, "backfill rollups from existing data", [
+        _rollup_upsert_sql(resolution, "1 = 1") for resolution in ROLLUP_TABLES
+    ]),
+    # Devices report tenths of a pound, which INT silently truncated
+    (5, "store weight with decimals", [
+        "ALTER TABLE data MODIFY weight DOUBLE DEFAULT NULL",
+        *(
+            f"ALTER TABLE {table} MODIFY weight_min DOUBLE DEFAULT NULL, "
+            "MODIFY weight_max DOUBLE DEFAULT NULL, MODIFY weight_sum DOUBLE NOT NULL DEFAULT 0"
+            for table, _ in ROLLUP_TABLES.values()
+        ),
+    ]),
+]
+
+# MySQL error codes that mean a migration statement has already taken effect
+_ALREADY_APPLIED_ERRORS = {
+    1050,  # ER_TABLE_EXISTS_ERROR
+    1060,  # ER_DUP_FIELDNAME
+    1061,  # ER_DUP_KEYNAME
+}
+
+
+def apply_migrations(connection) -> list[int]:
+    """
+    Bring the schema up to date by running every migration not yet recorded
+    in the schema_migrations table.
+
+    A named lock keeps several workers starting at once from racing each
+    other. Statements that fail because their change already exists are
+    skipped, so a migration interrupted halfway can simply be re-run.
+
+    Returns:
+        list[int]: The versions applied by this call
+    """
+    cursor = connection.cursor()
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INT PRIMARY KEY,
+            description VARCHAR(255) NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    cursor.execute("SELECT GET_LOCK('medhome_schema_migrations', 60)")
+    if cursor.fetchone()[0] != 1:
+        raise DatabaseConnectionError("Timed out waiting for the schema migration lock")
+
+    applied = []
+    try:
+        cursor.execute("SELECT version FROM schema_migrations")
+        done = {row[0] for row in cursor.fetchall()}
+        for version, description, statements in MIGRATIONS:
+            if version in done:
+                continue
+            logger.info(f"Applying migration {version}: {description}")
+            for statement in statements:
+                try:
+                    cursor.execute(statement)
+                except Error as e:
+                    if e.errno not in _ALREADY_APPLIED_ERRORS:
+                        logger.error(f"Migration {version} failed: {e}")
+                        raise
+                    logger.info(f"Migration {version}: already applied ({e.msg})")
+            cursor.execute(
+                "INSERT INTO schema_migrations (version, description) VALUES (%s, %s)",
+                (version, description),
+            )
+            connection.commit()
+            applied.append(version)
+    finally:
+        cursor.execute("SELECT RELEASE_LOCK('medhome_schema_migrations')")
+        cursor.fetchone()
+        cursor.close()
+
+    if applied:
+        logger.info(f"Applied migrations: {applied}")
+    return applied
+
+
+# Table definitions, created on a fresh database; later changes go in MIGRATIONS
+TABLE_SCHEMAS = {
+    "users": """
+        CREATE TABLE users (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            first_name VARCHAR(255) NOT NULL,
+            last_name VARCHAR(255) NOT NULL,
+            username VARCHAR(255) NOT NULL UNIQUE,
+            password VARCHAR(255) NOT NULL,
+            email VARCHAR(255) NOT NULL UNIQUE,
+            serial_num VARCHAR(255) UNIQUE DEFAULT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """,
+    "sessions": """
+        CREATE TABLE sessions (
+            id VARCHAR(36) PRIMARY KEY,
+            user_id INT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+        )
+    """,
+    "devices": """
+        CREATE TABLE devices (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            username VARCHAR(255) DEFAULT NULL,
+            serial_num VARCHAR(255) NOT NULL UNIQUE,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (username) REFERENCES users(username) ON DELETE CASCADE
+        )
+    """,
+    "data": """
+        CREATE TABLE data (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            username VARCHAR(255) NOT NULL,
+            serial_num VARCHAR(255) NOT NULL,
+            avgHR INT DEFAULT NULL,
+            avgSpO2 INT DEFAULT NULL,
+            weight INT DEFAULT NULL,
+            bpS INT DEFAULT NULL,
+            bpD INT DEFAULT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """
+}
+
+# Rows per INSERT statement when storing a batch of readings
+READINGS_INSERT_CHUNK = 500
+
+
+class MySQLStorage(Storage):
+    """
+    Storage on a MySQL server.
+
+    Every method borrows a connection from the pool for the duration of the
+    call. Without an open pool (scripts using the storage directly) each call
+    makes a one-off connection instead.
+    """
+
+    def __init__(
+        self,
+        min_size: int = DB_POOL_MIN_SIZE,
+        max_size: int = DB_POOL_MAX_SIZE,
+    ):
+        self.min_size = min_size
+        self.max_size = max_size
+        self.threads = max_size
+        self.pool: Optional[ConnectionPool] = None
+
+    def open(self) -> None:
+        if self.pool is not None:
+            return
+        pool = ConnectionPool(min_size=self.min_size, max_size=self.max_size)
+        pool.open()
+        self.pool = pool
+
+    def close(self) -> None:
+        if self.pool is not None:
+            self.pool.close()
+            self.pool = None
+
+    def stats(self) -> dict:
+        if self.pool is None:
+            return {"size": 0, "idle": 0, "max_size": self.max_size}
+        return self.pool.stats()
+
+    def acquire_connection(self) -> mysql.connector.MySQLConnection:
+        """
+        Borrow a connection from the pool.
+
+        Falls back to a one-off connection when the pool has not been opened
+        (e.g. when the storage is used from a script outside the app).
+        Every connection must be handed back with `release_connection`.
+        """
+        if self.pool is None:
+            return get_db_connection()
+        return self.pool.acquire()
+
+    def release_connection(self, connection: mysql.connector.MySQLConnection) -> None:
+        """Return a connection obtained from `acquire_connection`."""
+        if self.pool is None:
+            if connection.is_connected():
+                connection.close()
+            return
+        self.pool.release(connection)
+
+    def _fetch(self, query: str, params: tuple = (), one: bool = False, dictionary: bool = True):
+        """Run a read-only query and return its rows (or first row)."""
+        connection = None
+        cursor = None
+        try:
+            connection = self.acquire_connection()
+            cursor = connection.cursor(dictionary=dictionary)
+            cursor.execute(query, params)
+            return cursor.fetchone() if one else cursor.fetchall()
+        finally:
+            if cursor:
+                cursor.close()
+            if connection:
+                self.release_connection(connection)
+
+    def _execute(self, query: str, params: tuple = ()) -> int:
+        """Run one write statement, commit, and return the row id it generated."""
+        connection = None
+        cursor = None
+        try:
+            connection = self.acquire_connection()
+            cursor = connection.cursor()
+            cursor.execute(query, params)
+            connection.commit()
+            return cursor.lastrowid
+        finally:
+            if cursor:
+                cursor.close()
+            if connection:
+                self.release_connection(connection)
+
+    def setup(self, seed: Optional[Callable[[], dict]] = None) -> bool:
+        connection = None
+        cursor = None
+        try:
+            # Get database connection
+            connection = self.acquire_connection()
+            cursor = connection.cursor()
+
+            # Check if tables already exist and clear sessions only if they do
+            cursor.execute("SHOW TABLES")
+            existing_tables = [table[0] for table in cursor.fetchall()]
+            if all(table in existing_tables for table in TABLE_SCHEMAS.keys()):
+                logger.info("Tables already exist. Clearing sessions table...")
+                cursor.execute("DELETE FROM sessions")
+                connection.commit()
+                apply_migrations(connection)
+                return False
+            else:
+                logger.info("Tables do not exist. Proceeding to drop and recreate tables...")
+
+            # Recreate tables one by one
+            for table_name, create_query in TABLE_SCHEMAS.items():
+                try:
+                    # Create table
+                    logger.info(f"Creating table {table_name}...")
+                    cursor.execute(create_query)
+                    connection.commit()
+                    logger.info(f"Table {table_name} created successfully")
+
+                except Error as e:
+                    logger.error(f"Error creating table {table_name}: {e}")
+                    raise
+
+            apply_migrations(connection)
+
+            if seed is not None:
+                self._insert_seed(connection, cursor, seed())
+            return True
+
+        except Exception as e:
+            logger.error(f"Database setup failed: {e}")
+            raise
+
+        finally:
+            if cursor:
+                cursor.close()
+            if connection:
+                self.release_connection(connection)
+
+    @staticmethod
+    def _insert_seed(connection, cursor, data: dict) -> None:
+        # executemany turns each INSERT into multi-row statements; one transaction for everything
+        statements = [
+            ("users", "INSERT INTO users (first_name, last_name, email, username, password, serial_num) VALUES (%s, %s, %s, %s, %s, %s)"),
+            ("user_devices", "INSERT INTO devices (username, serial_num) VALUES (%s, %s)"),
+            ("devices", "INSERT INTO devices (serial_num) VALUES (%s)"),
+            ("data", "INSERT INTO data (username, serial_num, avgHR, avgSpO2, weight, bpS, bpD, created_at) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)"),
+        ]
+        try:
+            for key, insert_query in statements:
+                rows = data.get(key)
+                if rows:
+                    cursor.executemany(insert_query, rows)
+                    logger.info(f"Seeded {len(rows)} {key.replace('_', ' ')}")
+            if data.get("data"):
+                for resolution in ROLLUP_TABLES:
+                    cursor.execute(_rollup_upsert_sql(resolution, "1 = 1"))
+            connection.commit()
+        except Error as e:
+            connection.rollback()
+            logger.error(f"Error inserting seed data: {e}")
+            raise
+
+    def get_user_by_username(self, username: str) -> Optional[dict]:
+        return self._fetch("SELECT * FROM users WHERE username = %s", (username,), one=True)
+
+    def get_user_by_id(self, user_id: int) -> Optional[dict]:
+        return self._fetch("SELECT * FROM users WHERE id = %s", (user_id,), one=True)
+
+    def get_user_by_serial_num(self, serial_num: str) -> Optional[dict]:
+        return self._fetch("SELECT * FROM users WHERE serial_num = %s", (serial_num,), one=True)
+
+    def create_user(self, username: str, first_name: str, last_name: str, email: str, password: str) -> Optional[tuple]:
+        connection = None
+        cursor = None
+        try:
+            connection = self.acquire_connection()
+            cursor = connection.cursor()
+
+            # Fetch an available unassigned serial number
+            cursor.execute("SELECT serial_num FROM devices WHERE username IS NULL LIMIT 1")
+            serial_result = cursor.fetchone()
+            serial_num = serial_result[0] if serial_result else None
+
+            if not serial_num:
+                return None
+
+            # Insert the user with the serial number
+            insert_query = """
+                INSERT INTO users (first_name, last_name, email, username, password, serial_num)
+                VALUES (%s, %s, %s, %s, %s, %s)
+            """
+            cursor.execute(insert_query, (first_name, last_name, email, username, password, serial_num))
+            connection.commit()
+            user_id = cursor.lastrowid
+
+            # Update the devices table to assign the serial number to the user
+            cursor.execute(
+                "UPDATE devices SET username = %s WHERE serial_num = %s", (username, serial_num)
+            )
+            connection.commit()
+            return user_id, serial_num
+
+        finally:
+            if cursor:
+                cursor.close()
+            if connection:
+                self.release_connection(connection)
+
+    def get_device_by_username(self, username: str) -> list[dict]:
+        return self._fetch("SELECT * FROM devices WHERE username = %s", (username,))
+
+    def get_device_by_serial_num(self, serial_num: str) -> Optional[dict]:
+        return self._fetch("SELECT * FROM devices WHERE serial_num = %s", (serial_num,), one=True)
+
+    def create_device(self, username: Optional[str], serial_num: str) -> int:
+        return self._execute(
+            "INSERT INTO devices (username, serial_num) VALUES (%s, %s)", (username, serial_num)
+        )
+
+    def delete_device(self, device_id: int) -> Optional[str]:
+        connection = None
+        cursor = None
+        try:
+            connection = self.acquire_connection()
+            cursor = connection.cursor()
+            cursor.execute("SELECT serial_num FROM devices WHERE id = %s", (device_id,))
+            device = cursor.fetchone()
+            cursor.execute(
+                "DELETE FROM devices WHERE id = %s", (device_id,)
+            )
+            connection.commit()
+            return device[0] if device else None
+        finally:
+            if cursor:
+                cursor.close()
+            if connection:
+                self.release_connection(connection)
+
+    def load_serial_index(self) -> dict:
+        return dict(self._fetch("""
+            SELECT serial_num, username FROM devices WHERE username IS NOT NULL
+            UNION
+            SELECT serial_num, username FROM users WHERE serial_num IS NOT NULL
+        """, dictionary=False))
+
+    def get_usernames_by_serial_nums(self, serial_nums: list[str]) -> dict:
+        placeholders = ", ".join(["%s"] * len(serial_nums))
+        return dict(self._fetch(
+            f"""
+            SELECT serial_num, username FROM devices
+            WHERE username IS NOT NULL AND serial_num IN ({placeholders})
+            UNION
+            SELECT serial_num, username FROM users WHERE serial_num IN ({placeholders})
+            """,
+            tuple(serial_nums) * 2,
+            dictionary=False,
+        ))
+
+    def create_session(self, user_id: int, session_id: str) -> bool:
+        self._execute(
+            "INSERT INTO sessions (id, user_id) VALUES (%s, %s)", (session_id, user_id)
+        )
+        return True
+
+    def get_session(self, session_id: str) -> Optional[dict]:
+        return self._fetch("SELECT * FROM sessions s WHERE s.id = %s", (session_id,), one=True)
+
+    def get_session_user(self, session_id: str) -> Optional[dict]:
+        return self._fetch(
+            """
+            SELECT s.user_id, u.username
+            FROM sessions s
+            JOIN users u ON u.id = s.user_id
+            WHERE s.id = %s
+            """,
+            (session_id,),
+            one=True,
+        )
+
+    def delete_session(self, session_id: str) -> bool:
+        self._execute("DELETE FROM sessions WHERE id = %s", (session_id,))
+        return True
+
+    def add_readings(self, readings: list[dict]) -> int:
+        connection = None
+        cursor = None
+        row_sql = "(%s, %s, %s, %s, %s, %s, %s, COALESCE(%s, CURRENT_TIMESTAMP))"
+        try:
+            connection = self.acquire_connection()
+            cursor = connection.cursor()
+            for start in range(0, len(readings), READINGS_INSERT_CHUNK):
+                chunk = readings[start:start + READINGS_INSERT_CHUNK]
+                params = []
+                for reading in chunk:
+                    params.extend((
+                        reading["username"],
+                        reading["serial_num"],
+                        reading.get("avgHR"),
+                        reading.get("avgSpO2"),
+                        reading.get("weight"),
+                        reading.get("bpS"),
+                        reading.get("bpD"),
+                        reading.get("created_at"),
+                    ))
+                cursor.execute(
+                    "INSERT INTO data (username, serial_num, avgHR, avgSpO2, weight, bpS, bpD, created_at) "
+                    "VALUES " + ", ".join([row_sql] * len(chunk)),
+                    tuple(params),
+                )
+                # lastrowid is the id of the first row; a multi-row insert gets consecutive ids
+                _update_rollups(cursor, cursor.lastrowid, cursor.lastrowid + len(chunk) - 1)
+            connection.commit()
+            return len(readings)
+        finally:
+            if cursor:
+                cursor.close()
+            if connection:
+                self.release_connection(connection)
+
+    def get_recent_data(self, username: str) -> list[tuple]:
+        return self._fetch(f"""
+            SELECT *
+            FROM (
+                SELECT avgHR, avgSpO2, weight, bpS, bpD, created_at
+                FROM data
+                WHERE username = %s
+                ORDER BY created_at DESC
+                LIMIT {RECENT_READINGS}
+            ) AS recent_data
+            ORDER BY created_at ASC;
+        """, (username,), dictionary=False)
+
+    def get_data_page(self, username, start, end, after, fields, limit, descending) -> list[dict]:
+        conditions = ["username = %s"]
+        params = [username]
+        if start is not None:
+            conditions.append("created_at >= %s")
+            params.append(start)
+        if end is not None:
+            conditions.append("created_at < %s")
+            params.append(end)
+        if after is not None:
+            # Row-wise comparison on (created_at, id) lets the
+            # (username, created_at) index seek straight to the next page
+            op = "<" if descending else ">"
+            conditions.append(f"(created_at {op} %s OR (created_at = %s AND id {op} %s))")
+            params.extend((after[0], after[0], after[1]))
+        direction = "DESC" if descending else "ASC"
+        columns = ", ".join(["id", "created_at", *fields])
+        return self._fetch(
+            f"""
+            SELECT {columns}
+            FROM data
+            WHERE {" AND ".join(conditions)}
+            ORDER BY created_at {direction}, id {direction}
+            LIMIT %s
+            """,
+            (*params, limit),
+        )
+
+    def get_rollups(self, username, resolution, start, end) -> list[dict]:
+        table, _ = ROLLUP_TABLES[resolution]
+        columns = ["bucket", "readings"]
+        for field in DATA_FIELDS:
+            columns += [
+                f"{field}_min",
+                f"{field}_max",
+                f"{field}_sum / NULLIF({field}_count, 0) AS {field}_mean",
+                f"{field}_count",
+            ]
+        conditions = ["username = %s"]
+        params = [username]
+        if start is not None:
+            conditions.append("bucket >= %s")
+            params.append(start)
+        if end is not None:
+            conditions.append("bucket < %s")
+            params.append(end)
+        rows = self._fetch(
+            f"""
+            SELECT {", ".join(columns)}
+            FROM {table}
+            WHERE {" AND ".join(conditions)}
+            ORDER BY bucket ASC
+            """,
+            tuple(params),
+        )
+        for row in rows:
+            for field in DATA_FIELDS:
+                mean = row[f"{field}_mean"]
+                row[f"{field}_mean"] = float(mean) if mean is not None else None
+        return rows
@@ -0,0 +1,435 @@
+"""
+Embedded SQLite storage for single-node deployments: no database server, and
+reads served from the local file in microseconds.
+
+The database runs in WAL mode, so readers never wait for the writer and
+commits are a single append to the log. Each DB thread keeps its own
+connection; concurrent writers take turns (waiting up to SQLITE_BUSY_TIMEOUT).
+Only one app process should use a database file at a time.
+"""
+import logging
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Callable, Optional
+
+from app.storage import (
+    DATA_FIELDS,
+    RECENT_READINGS,
+    ROLLUP_RESOLUTIONS,
+    Storage,
+    seed_readings,
+)
+
+logger = logging.getLogger(__name__)
+
+# Database file, created on first start
+SQLITE_PATH = os.getenv("SQLITE_PATH", "medhome.db")
+# Threads (each with its own connection) running storage calls at once
+SQLITE_THREADS = int(os.getenv("SQLITE_THREADS", "4"))
+# Milliseconds a writer waits for another one to commit before failing
+SQLITE_BUSY_TIMEOUT = int(os.getenv("SQLITE_BUSY_TIMEOUT", "5000"))
+
+# Schema changes after version 1, as (version, description, statements) in
+# order. SCHEMA always creates the latest version; these upgrade older files.
+MIGRATIONS: list[tuple[int, str, list[str]]] = []
+
+# Stored in PRAGMA user_version
+SCHEMA_VERSION = MIGRATIONS[-1][0] if MIGRATIONS else 1
+
+# Timestamps are stored as text in local time, like MySQL TIMESTAMP columns in
+# the server's time zone. Always with microseconds, so they compare as strings.
+_NOW = "(strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime') || '000')"
+# What _NOW and the datetime adapter produce; anything else would sort wrongly
+_TIMESTAMP_GLOB = "[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9] [0-9][0-9]:[0-9][0-9]:[0-9][0-9].[0-9][0-9][0-9][0-9][0-9][0-9]"
+
+_ROLLUP_COLUMNS = ",\n".join(
+    f"{field}_min, {field}_max, {field}_sum NUMERIC NOT NULL DEFAULT 0, {field}_count INTEGER NOT NULL DEFAULT 0"
+    for field in DATA_FIELDS
+)
+
+# SQLite columns take any value their affinity cannot convert (text in an
+# INTEGER column); the CHECKs reject what MySQL's typed columns would. Weight
+# is REAL like MySQL's DOUBLE.
+SCHEMA = [
+    """
+    CREATE TABLE users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        first_name TEXT NOT NULL,
+        last_name TEXT NOT NULL,
+        username TEXT NOT NULL UNIQUE,
+        password TEXT NOT NULL,
+        email TEXT NOT NULL UNIQUE,
+        serial_num TEXT UNIQUE DEFAULT NULL,
+        created_at TIMESTAMP DEFAULT """ + _NOW + """
+    )
+    """,
+    """
+    CREATE TABLE sessions (
+        id TEXT PRIMARY KEY,
+        user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+        created_at TIMESTAMP DEFAULT """ + _NOW + """
+    )
+    """,
+    "CREATE INDEX idx_sessions_user_id ON sessions (user_id)",
+    """
+    CREATE TABLE devices (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT DEFAULT NULL REFERENCES users(username) ON DELETE CASCADE,
+        serial_num TEXT NOT NULL UNIQUE,
+        created_at TIMESTAMP DEFAULT """ + _NOW + """
+    )
+    """,
+    """
+    CREATE TABLE data (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT NOT NULL,
+        serial_num TEXT NOT NULL,
+        avgHR INTEGER DEFAULT NULL CHECK (typeof(avgHR) IN ('integer', 'null')),
+        avgSpO2 INTEGER DEFAULT NULL CHECK (typeof(avgSpO2) IN ('integer', 'null')),
+        weight REAL DEFAULT NULL CHECK (typeof(weight) IN ('real', 'null')),
+        bpS INTEGER DEFAULT NULL CHECK (typeof(bpS) IN ('integer', 'null')),
+        bpD INTEGER DEFAULT NULL CHECK (typeof(bpD) IN ('integer', 'null')),
+        created_at TIMESTAMP NOT NULL DEFAULT """ + _NOW + """ CHECK (created_at GLOB '""" + _TIMESTAMP_GLOB + """')
+    )
+    """,
+    "CREATE INDEX idx_data_username_created_at ON data (username, created_at)",
+    *(
+        f"""
+        CREATE TABLE data_{'hourly' if resolution == 'hour' else 'daily'} (
+            username TEXT NOT NULL,
+            bucket TIMESTAMP NOT NULL,
+            readings INTEGER NOT NULL DEFAULT 0,
+            {_ROLLUP_COLUMNS},
+            PRIMARY KEY (username, bucket)
+        ) WITHOUT ROWID
+        """
+        for resolution in ROLLUP_RESOLUTIONS
+    ),
+]
+
+# resolution -> (table, bucket expression over data.created_at)
+ROLLUP_TABLES = {
+    "hour": ("data_hourly", "strftime('%Y-%m-%d %H:00:00.000000', created_at)"),
+    "day": ("data_daily", "strftime('%Y-%m-%d 00:00:00.000000', created_at)"),
+}
+
+
+def _rollup_upsert_sql(resolution: str) -> str:
+    """Fold the data rows with ids in a range (two parameters) into a rollup table."""
+    table, bucket = ROLLUP_TABLES[resolution]
+    columns = ["username", "bucket", "readings"]
+    selects = ["username", bucket, "COUNT(*)"]
+    updates = ["readings = readings + excluded.readings"]
+    for field in DATA_FIELDS:
+        columns += [f"{field}_min", f"{field}_max", f"{field}_sum", f"{field}_count"]
+        selects += [f"MIN({field})", f"MAX({field})", f"COALESCE(SUM({field}), 0)", f"COUNT({field})"]
+        # Two-argument min()/max() are NULL if either side is
+        updates += [
+            f"{field}_min = min(COALESCE({field}_min, excluded.{field}_min), COALESCE(excluded.{field}_min, {field}_min))",
+            f"{field}_max = max(COALESCE({field}_max, excluded.{field}_max), COALESCE(excluded.{field}_max, {field}_max))",
+            f"{field}_sum = {field}_sum + excluded.{field}_sum",
+            f"{field}_count = {field}_count + excluded.{field}_count",
+        ]
+    return f"""
+        INSERT INTO {table} ({", ".join(columns)})
+        SELECT {", ".join(selects)} FROM data
+        WHERE id BETWEEN ? AND ?
+        GROUP BY 1, 2
+        ON CONFLICT (username, bucket) DO UPDATE SET {", ".join(updates)}
+    """
+
+
+_ROLLUP_UPSERTS = {resolution: _rollup_upsert_sql(resolution) for resolution in ROLLUP_RESOLUTIONS}
+
+
+def _timestamp(value: bytes) -> datetime:
+    return datetime.fromisoformat(value.decode())
+
+
+sqlite3.register_converter("TIMESTAMP", _timestamp)
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(" ", timespec="microseconds"))
+
+
+class SQLiteStorage(Storage):
+    def __init__(self, path: str = SQLITE_PATH, threads: int = SQLITE_THREADS):
+        if path == ":memory:":
+            raise ValueError("Every thread would get its own empty database; use the memory backend instead")
+        self.path = path
+        self.threads = threads
+        self._local = threading.local()
+        self._connections: list[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(
+                self.path,
+                detect_types=sqlite3.PARSE_DECLTYPES,
+                timeout=SQLITE_BUSY_TIMEOUT / 1000,
+                check_same_thread=False,
+            )
+            connection.row_factory = sqlite3.Row
+            connection.execute("PRAGMA journal_mode = WAL")
+            # With WAL, NORMAL only syncs at checkpoints: a power cut may lose
+            # the latest commits but never corrupts the database
+            connection.execute("PRAGMA synchronous = NORMAL")
+            connection.execute("PRAGMA foreign_keys = ON")
+            self._local.connection = connection
+            with self._lock:
+                self._connections.append(connection)
+        return connection
+
+    def open(self) -> None:
+        self._connect()
+        logger.info(f"SQLite database {self.path} opened (WAL)")
+
+    def close(self) -> None:
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for connection in connections:
+            connection.close()
+        self._local = threading.local()
+
+    def stats(self) -> dict:
+        with self._lock:
+            size = len(self._connections)
+        return {"size": size, "idle": size, "max_size": self.threads}
+
+    def _fetch(self, query: str, params: tuple = (), one: bool = False):
+        cursor = self._connect().execute(query, params)
+        if one:
+            row = cursor.fetchone()
+            return dict(row) if row is not None else None
+        return [dict(row) for row in cursor.fetchall()]
+
+    def _execute(self, query: str, params: tuple = ()) -> int:
+        connection = self._connect()
+        with connection:
+            return connection.execute(query, params).lastrowid
+
+    def setup(self, seed: Optional[Callable[[], dict]] = None) -> bool:
+        connection = self._connect()
+        version = connection.execute("PRAGMA user_version").fetchone()[0]
+        if version:
+            if version > SCHEMA_VERSION:
+                raise RuntimeError(f"{self.path} has schema version {version}, newer than this app ({SCHEMA_VERSION})")
+            if version < SCHEMA_VERSION:
+                self._migrate(connection, version)
+            logger.info("Tables already exist. Clearing sessions table...")
+            with connection:
+                connection.execute("DELETE FROM sessions")
+            return False
+
+        logger.info(f"Creating tables in {self.path}...")
+        with connection:
+            for statement in SCHEMA:
+                connection.execute(statement)
+            connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            if seed is not None:
+                self._insert_seed(connection, seed())
+        return True
+
+    def _migrate(self, connection: sqlite3.Connection, version: int) -> None:
+        """Upgrade a database from `version` to SCHEMA_VERSION, all or nothing."""
+        pending = [migration for migration in MIGRATIONS if migration[0] > version]
+        if [number for number, _, _ in pending] != list(range(version + 1, SCHEMA_VERSION + 1)):
+            raise RuntimeError(f"No migration path for {self.path} from schema version {version} to {SCHEMA_VERSION}")
+        with connection:
+            # DDL does not open a transaction implicitly
+            connection.execute("BEGIN")
+            for number, description, statements in pending:
+                logger.info(f"Applying migration {number}: {description}")
+                for statement in statements:
+                    connection.execute(statement)
+            connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        logger.info(f"Applied migrations: {[number for number, _, _ in pending]}")
+
+    def _insert_seed(self, connection: sqlite3.Connection, data: dict) -> None:
+        statements = [
+            ("users", "INSERT INTO users (first_name, last_name, email, username, password, serial_num) VALUES (?, ?, ?, ?, ?, ?)"),
+            ("user_devices", "INSERT INTO devices (username, serial_num) VALUES (?, ?)"),
+            ("devices", "INSERT INTO devices (serial_num) VALUES (?)"),
+        ]
+        for key, insert_query in statements:
+            rows = data.get(key)
+            if rows:
+                connection.executemany(insert_query, rows)
+                logger.info(f"Seeded {len(rows)} {key.replace('_', ' ')}")
+        if data.get("data"):
+            self._insert_readings(connection, seed_readings(data["data"]))
+            logger.info(f"Seeded {len(data['data'])} data")
+
+    def get_user_by_username(self, username: str) -> Optional[dict]:
+        return self._fetch("SELECT * FROM users WHERE username = ?", (username,), one=True)
+
+    def get_user_by_id(self, user_id: int) -> Optional[dict]:
+        return self._fetch("SELECT * FROM users WHERE id = ?", (user_id,), one=True)
+
+    def get_user_by_serial_num(self, serial_num: str) -> Optional[dict]:
+        return self._fetch("SELECT * FROM users WHERE serial_num = ?", (serial_num,), one=True)
+
+    def create_user(self, username: str, first_name: str, last_name: str, email: str, password: str) -> Optional[tuple]:
+        connection = self._connect()
+        with connection:
+            row = connection.execute("SELECT serial_num FROM devices WHERE username IS NULL LIMIT 1").fetchone()
+            if row is None:
+                return None
+            serial_num = row[0]
+            user_id = connection.execute(
+                "INSERT INTO users (first_name, last_name, email, username, password, serial_num) VALUES (?, ?, ?, ?, ?, ?)",
+                (first_name, last_name, email, username, password, serial_num),
+            ).lastrowid
+            connection.execute("UPDATE devices SET username = ? WHERE serial_num = ?", (username, serial_num))
+        return user_id, serial_num
+
+    def get_device_by_username(self, username: str) -> list[dict]:
+        return self._fetch("SELECT * FROM devices WHERE username = ?", (username,))
+
+    def get_device_by_serial_num(self, serial_num: str) -> Optional[dict]:
+        return self._fetch("SELECT * FROM devices WHERE serial_num = ?", (serial_num,), one=True)
+
+    def create_device(self, username: Optional[str], serial_num: str) -> int:
+        return self._execute("INSERT INTO devices (username, serial_num) VALUES (?, ?)", (username, serial_num))
+
+    def delete_device(self, device_id: int) -> Optional[str]:
+        connection = self._connect()
+        with connection:
+            row = connection.execute("DELETE FROM devices WHERE id = ? RETURNING serial_num", (device_id,)).fetchone()
+        return row[0] if row else None
+
+    def load_serial_index(self) -> dict:
+        rows = self._connect().execute("""
+            SELECT serial_num, username FROM devices WHERE username IS NOT NULL
+            UNION
+            SELECT serial_num, username FROM users WHERE serial_num IS NOT NULL
+        """).fetchall()
+        return {serial_num: username for serial_num, username in rows}
+
+    def get_usernames_by_serial_nums(self, serial_nums: list[str]) -> dict:
+        placeholders = ", ".join(["?"] * len(serial_nums))
+        rows = self._connect().execute(
+            f"""
+            SELECT serial_num, username FROM devices
+            WHERE username IS NOT NULL AND serial_num IN ({placeholders})
+            UNION
+            SELECT serial_num, username FROM users WHERE serial_num IN ({placeholders})
+            """,
+            tuple(serial_nums) * 2,
+        ).fetchall()
+        return {serial_num: username for serial_num, username in rows}
+
+    def create_session(self, user_id: int, session_id: str) -> bool:
+        self._execute("INSERT INTO sessions (id, user_id) VALUES (?, ?)", (session_id, user_id))
+        return True
+
+    def get_session(self, session_id: str) -> Optional[dict]:
+        return self._fetch("SELECT * FROM sessions WHERE id = ?", (session_id,), one=True)
+
+    def get_session_user(self, session_id: str) -> Optional[dict]:
+        return self._fetch(
+            """
+            SELECT s.user_id, u.username
+            FROM sessions s
+            JOIN users u ON u.id = s.user_id
+            WHERE s.id = ?
+            """,
+            (session_id,),
+            one=True,
+        )
+
+    def delete_session(self, session_id: str) -> bool:
+        self._execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+        return True
+
+    def add_readings(self, readings: list[dict]) -> int:
+        connection = self._connect()
+        with connection:
+            self._insert_readings(connection, readings)
+        return len(readings)
+
+    @staticmethod
+    def _insert_readings(connection: sqlite3.Connection, readings: list[dict]) -> None:
+        cursor = connection.executemany(
+            "INSERT INTO data (username, serial_num, avgHR, avgSpO2, weight, bpS, bpD, created_at) "
+            f"VALUES (?, ?, ?, ?, ?, ?, ?, COALESCE(?, {_NOW}))",
+            [
+                (
+                    reading["username"], reading["serial_num"],
+                    *(reading.get(field) for field in DATA_FIELDS),
+                    reading.get("created_at"),
+                )
+                for reading in readings
+            ],
+        )
+        # Ids are consecutive within the transaction; lastrowid is not set by executemany
+        last_id = connection.execute("SELECT last_insert_rowid()").fetchone()[0]
+        first_id = last_id - cursor.rowcount + 1
+        for upsert in _ROLLUP_UPSERTS.values():
+            connection.execute(upsert, (first_id, last_id))
+
+    def get_recent_data(self, username: str) -> list[tuple]:
+        rows = self._connect().execute(
+            f"""
+            SELECT {", ".join(DATA_FIELDS)}, created_at FROM data
+            WHERE username = ?
+            ORDER BY created_at DESC, id DESC
+            LIMIT {RECENT_READINGS}
+            """,
+            (username,),
+        ).fetchall()
+        return [tuple(row) for row in reversed(rows)]
+
+    def get_data_page(self, username, start, end, after, fields, limit, descending) -> list[dict]:
+        conditions = ["username = ?"]
+        params = [username]
+        if start is not None:
+            conditions.append("created_at >= ?")
+            params.append(start)
+        if end is not None:
+            conditions.append("created_at < ?")
+            params.append(end)
+        if after is not None:
+            op = "<" if descending else ">"
+            conditions.append(f"(created_at, id) {op} (?, ?)")
+            params.extend((after[0], after[1]))
+        direction = "DESC" if descending else "ASC"
+        return self._fetch(
+            f"""
+            SELECT {", ".join(["id", "created_at", *fields])}
+            FROM data
+            WHERE {" AND ".join(conditions)}
+            ORDER BY created_at {direction}, id {direction}
+            LIMIT ?
+            """,
+            (*params, limit),
+        )
+
+    def get_rollups(self, username, resolution, start, end) -> list[dict]:
+        table, _ = ROLLUP_TABLES[resolution]
+        columns = ["bucket", "readings"]
+        for field in DATA_FIELDS:
+            columns += [
+                f"{field}_min",
+                f"{field}_max",
+                f"{field}_sum * 1.0 / NULLIF({field}_count, 0) AS {field}_mean",
+                f"{field}_count",
+            ]
+        conditions = ["username = ?"]
+        params = [username]
+        if start is not None:
+            conditions.append("bucket >= ?")
+            params.append(start)
+        if end is not None:
+            conditions.append("bucket < ?")
+            params.append(end)
+        return self._fetch(
+            f"""
+            SELECT {", ".join(columns)} FROM {table}
+            WHERE {" AND ".join(conditions)}
+            ORDER BY bucket ASC
+            """,
+            tuple(params),
+        )
@@ -0,0 +1,92 @@
+"""
+Benchmark: rendering the four report charts with the old pyplot code vs. the
+reused Agg figure in app.charts.
+
+Times only chart rendering (PNG bytes in memory), per report, in one process.
+
+    python -m benchmarks.bench_charts                    # 50 reports of 7 readings
+    python -m benchmarks.bench_charts --reports 20 --points 90
+"""
+import argparse
+import io
+import random
+import statistics
+import time
+from datetime import date, timedelta
+
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+
+from app.charts import render_chart
+
+
+def pyplot_chart(dates, y_values, title, ylabel, extra_y=None, extra_label=None) -> io.BytesIO:
+    # create_plot as it was in app/pdf.py: a fresh pyplot figure per chart
+    plt.figure(figsize=(4, 3))
+    plt.plot(dates, y_values, marker='o', label=ylabel)
+    plt.xticks(rotation=45)
+    if extra_y is not None:
+        plt.plot(dates, extra_y, marker='o', label=extra_label)
+    plt.title(title)
+    plt.xlabel("Date")
+    plt.ylabel(ylabel if not extra_label else "mmHg")
+    plt.grid(True)
+    if extra_label:
+        plt.legend()
+    plt.tight_layout()
+    png = io.BytesIO()
+    plt.savefig(png, format="png")
+    plt.close()
+    return png
+
+
+def make_report(points: int) -> dict:
+    start = date(2025, 1, 1)
+    return {
+        "dates": [(start + timedelta(days=i)).isoformat() for i in range(points)],
+        "bpm": [random.randrange(55, 120) for _ in range(points)],
+        "spo2": [random.randrange(88, 100) for _ in range(points)],
+        "weight": [random.randrange(100, 250) for _ in range(points)],
+        "systolic": [random.randrange(100, 160) for _ in range(points)],
+        "diastolic": [random.randrange(60, 100) for _ in range(points)],
+    }
+
+
+def render_report(chart, r: dict) -> int:
+    pngs = [
+        chart(r["dates"], r["bpm"], "Heart Rate", "BPM"),
+        chart(r["dates"], r["spo2"], "Oxygen Saturation", "SpO₂ (%)"),
+        chart(r["dates"], r["weight"], "Weight", "lbs"),
+        chart(r["dates"], r["systolic"], "Blood Pressure", "Systolic", r["diastolic"], "Diastolic"),
+    ]
+    return sum(len(png.getvalue()) for png in pngs)
+
+
+def run(label: str, chart, reports: list[dict]) -> float:
+    render_report(chart, reports[0])  # warm up fonts and caches
+    timings = []
+    for r in reports:
+        began = time.perf_counter()
+        render_report(chart, r)
+        timings.append((time.perf_counter() - began) * 1000)
+    median = statistics.median(timings)
+    print(f"  {label:<14} median {median:8.1f} ms/report   p95 {statistics.quantiles(timings, n=20)[-1]:8.1f} ms")
+    return median
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reports", type=int, default=50)
+    parser.add_argument("--points", type=int, default=7, help="readings per chart")
+    args = parser.parse_args()
+
+    reports = [make_report(args.points) for _ in range(args.reports)]
+    print(f"{args.reports} reports x 4 charts, {args.points} readings each")
+    before = run("pyplot", pyplot_chart, reports)
+    after = run("reused Agg", render_chart, reports)
+    print(f"  speedup {before / after:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
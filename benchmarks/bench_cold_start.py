@@ -0,0 +1,48 @@
+"""
+Benchmark: cold-start cost of a web worker, i.e. `import app.main` in a fresh
+interpreter, plus building the demo seed data (only done for a fresh database
+with SEED_DEMO_DATA=1).
+
+Every import run is a separate subprocess, so nothing is shared between runs.
+
+    python -m benchmarks.bench_cold_start
+    python -m benchmarks.bench_cold_start --runs 10
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+
+IMPORT_SCRIPT = (
+    "import time; began = time.perf_counter(); import app.main; "
+    "print(time.perf_counter() - began)"
+)
+
+
+def time_import() -> float:
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_SCRIPT], capture_output=True, text=True, check=True,
+    ).stdout
+    return float(output.strip().splitlines()[-1]) * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    imports = [time_import() for _ in range(args.runs)]
+    print(f"import app.main   median {statistics.median(imports):7.0f} ms   "
+          f"min {min(imports):7.0f} ms   max {max(imports):7.0f} ms   ({args.runs} runs)")
+
+    from app.seed import demo_seed
+
+    began = time.perf_counter()
+    seed = demo_seed()
+    print(f"demo_seed()       {(time.perf_counter() - began) * 1000:7.0f} ms   "
+          f"({len(seed['users'])} password hashes, {len(seed['data'])} readings)")
+
+
+if __name__ == "__main__":
+    main()
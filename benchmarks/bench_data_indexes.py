@@ -0,0 +1,114 @@
+"""
+Benchmark: recent-readings query on a large `data` table, with and without
+the (username, created_at) index added by migration 1.
+
+Builds a synthetic copy of the data table (`bench_data`, dropped afterwards)
+on the MySQL server configured in .env, then times the query used by
+get_data_from_user for a handful of users.
+
+    python -m benchmarks.bench_data_indexes                    # 2,000,000 rows, 20,000 users
+    python -m benchmarks.bench_data_indexes --rows 5000000 --users 100000
+"""
+import argparse
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from app.storage.mysql import get_db_connection
+
+QUERY = """
+    SELECT *
+    FROM (
+        SELECT avgHR, avgSpO2, weight, bpS, bpD, created_at
+        FROM bench_data
+        WHERE username = %s
+        ORDER BY created_at DESC
+        LIMIT 7
+    ) AS recent_data
+    ORDER BY created_at ASC
+"""
+
+
+def populate(cursor, connection, rows: int, users: int, chunk: int = 10000) -> None:
+    cursor.execute("DROP TABLE IF EXISTS bench_data")
+    cursor.execute("CREATE TABLE bench_data LIKE data")
+    # Start from the original, unindexed layout
+    cursor.execute("SHOW INDEX FROM bench_data WHERE Key_name <> 'PRIMARY'")
+    for index_name in {row[2] for row in cursor.fetchall()}:
+        cursor.execute(f"DROP INDEX {index_name} ON bench_data")
+
+    start = datetime(2020, 1, 1)
+    row_sql = "(%s, %s, %s, %s, %s, %s, %s, %s)"
+    inserted = 0
+    began = time.perf_counter()
+    while inserted < rows:
+        n = min(chunk, rows - inserted)
+        params = []
+        for i in range(n):
+            user = random.randrange(users)
+            params.extend((
+                f"user{user}", f"MH-{user:08X}",
+                random.randrange(55, 120), random.randrange(88, 100), random.randrange(100, 250),
+                random.randrange(100, 160), random.randrange(60, 100),
+                start + timedelta(minutes=inserted + i),
+            ))
+        cursor.execute(
+            "INSERT INTO bench_data (username, serial_num, avgHR, avgSpO2, weight, bpS, bpD, created_at) "
+            "VALUES " + ", ".join([row_sql] * n),
+            tuple(params),
+        )
+        connection.commit()
+        inserted += n
+    print(f"Inserted {rows:,} rows for {users:,} users in {time.perf_counter() - began:.1f}s")
+
+
+def time_queries(cursor, usernames: list[str], repeat: int) -> list[float]:
+    timings = []
+    for _ in range(repeat):
+        for username in usernames:
+            began = time.perf_counter()
+            cursor.execute(QUERY, (username,))
+            cursor.fetchall()
+            timings.append((time.perf_counter() - began) * 1000)
+    return timings
+
+
+def report(label: str, cursor, timings: list[float]) -> None:
+    cursor.execute("EXPLAIN " + QUERY, ("user0",))
+    plan = [f"{row[2]}:{row[4]}:{row[5] or '-'}" for row in cursor.fetchall()]
+    print(f"  {label:<12} median {statistics.median(timings):9.2f} ms   "
+          f"max {max(timings):9.2f} ms   plan {', '.join(plan)}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    parser.add_argument("--users", type=int, default=20_000)
+    parser.add_argument("--samples", type=int, default=20, help="distinct users queried")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--keep", action="store_true", help="keep bench_data afterwards")
+    args = parser.parse_args()
+
+    connection = get_db_connection()
+    cursor = connection.cursor()
+    try:
+        populate(cursor, connection, args.rows, args.users)
+        usernames = [f"user{random.randrange(args.users)}" for _ in range(args.samples)]
+
+        report("no index", cursor, time_queries(cursor, usernames, args.repeat))
+
+        began = time.perf_counter()
+        cursor.execute("CREATE INDEX idx_data_username_created_at ON bench_data (username, created_at)")
+        print(f"Built (username, created_at) index in {time.perf_counter() - began:.1f}s")
+
+        report("with index", cursor, time_queries(cursor, usernames, args.repeat))
+    finally:
+        if not args.keep:
+            cursor.execute("DROP TABLE IF EXISTS bench_data")
+        cursor.close()
+        connection.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Benchmark: blocking DB calls on the event loop vs. offloaded with run_db.
+
+Simulates many concurrent requests that each make one database call and
+reports throughput plus the worst event-loop stall seen by a heartbeat task.
+
+    python -m benchmarks.bench_db_offload                 # simulated 10 ms queries
+    python -m benchmarks.bench_db_offload --mysql         # SELECT SLEEP() on the configured MySQL
+    python -m benchmarks.bench_db_offload --requests 500 --latency 0.02
+"""
+import argparse
+import asyncio
+import time
+
+from app import database
+from app.storage.mysql import MySQLStorage
+
+
+def simulated_query(latency: float) -> int:
+    # Stand-in for a mysql.connector round trip: the thread blocks on I/O.
+    time.sleep(latency)
+    return 1
+
+
+def mysql_query(latency: float) -> int:
+    connection = database.storage.acquire_connection()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT SLEEP(%s)", (latency,))
+            return cursor.fetchone()[0]
+    finally:
+        database.storage.release_connection(connection)
+
+
+async def heartbeat(stop: asyncio.Event, interval: float = 0.005) -> float:
+    """Return the largest delay between scheduled and actual wake-ups."""
+    worst = 0.0
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        worst = max(worst, time.perf_counter() - start - interval)
+    return worst
+
+
+async def run(mode: str, query, requests: int, latency: float) -> tuple[float, float]:
+    async def one_request():
+        if mode == "inline":
+            # What the helpers used to do: a blocking call inside `async def`
+            query(latency)
+        else:
+            await database.run_db(query, latency)
+
+    stop = asyncio.Event()
+    monitor = asyncio.create_task(heartbeat(stop))
+    start = time.perf_counter()
+    await asyncio.gather(*(one_request() for _ in range(requests)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    return requests / elapsed, await monitor
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.01, help="seconds per query")
+    parser.add_argument("--mysql", action="store_true", help="query the MySQL server from .env")
+    args = parser.parse_args()
+
+    query = simulated_query
+    if args.mysql:
+        database.storage = MySQLStorage()
+        await database.init_db_pool()
+        query = mysql_query
+
+    print(f"{args.requests} concurrent requests, {args.latency * 1000:.0f} ms per query, "
+          f"{database.storage.threads} DB threads")
+    try:
+        for mode in ("inline", "offloaded"):
+            throughput, stall = await run(mode, query, args.requests, args.latency)
+            print(f"  {mode:<10} {throughput:8.1f} req/s   worst loop stall {stall * 1000:8.1f} ms")
+    finally:
+        await database.close_db_pool()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
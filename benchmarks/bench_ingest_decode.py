@@ -0,0 +1,88 @@
+"""
+Benchmark: decoding device uploads as JSON vs. binary frames (app/protocol.py).
+
+Compares, per reading, the bytes on the wire and the server-side parse and
+validation time of:
+  - the single-reading JSON body of /avgHRavgSpO2weightbpSbpD (json.loads, as request.json() does)
+  - a /readings/batch JSON body (json.loads + Reading validation)
+  - a /readings/binary body (decode_frames)
+
+    python -m benchmarks.bench_ingest_decode
+    python -m benchmarks.bench_ingest_decode --batch 500 --repeat 200
+"""
+import argparse
+import json
+import random
+import time
+from datetime import datetime, timedelta
+
+from app.models import Reading
+from app.protocol import decode_frames, encode_frame
+
+REQUIRED_FIELDS = ["serial_num", "avgHR", "avgSpO2", "weight", "bpS", "bpD"]
+SERIAL_NUM = "MH-830B35DF"
+
+
+def make_readings(n: int) -> list[dict]:
+    start = datetime(2025, 1, 1)
+    return [
+        {
+            "serial_num": SERIAL_NUM,
+            "avgHR": random.randrange(55, 120),
+            "avgSpO2": random.randrange(88, 100),
+            "weight": round(random.uniform(100, 250), 1),
+            "bpS": random.randrange(100, 160),
+            "bpD": random.randrange(60, 100),
+            "created_at": start + timedelta(minutes=i),
+        }
+        for i in range(n)
+    ]
+
+
+def decode_single_json(bodies: list[bytes]) -> None:
+    for body in bodies:
+        data = json.loads(body)
+        if not all(field in data for field in REQUIRED_FIELDS):
+            raise ValueError("missing field")
+
+
+def decode_batch_json(body: bytes) -> None:
+    for raw in json.loads(body)["readings"]:
+        Reading.model_validate(raw)
+
+
+def time_per_reading(func, arg, readings: int, repeat: int) -> float:
+    func(arg)
+    began = time.perf_counter()
+    for _ in range(repeat):
+        func(arg)
+    return (time.perf_counter() - began) / (repeat * readings) * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch", type=int, default=100, help="readings per upload")
+    parser.add_argument("--repeat", type=int, default=500)
+    args = parser.parse_args()
+
+    readings = make_readings(args.batch)
+    # What the firmware sends today: no timestamp, one reading per request
+    single = [
+        json.dumps({field: r[field] for field in REQUIRED_FIELDS}).encode() for r in readings
+    ]
+    batch = json.dumps({"readings": readings}, default=str).encode()
+    binary = encode_frame(SERIAL_NUM, readings, timestamps=True)
+
+    cases = [
+        ("JSON, 1 per request", decode_single_json, single, sum(len(b) for b in single)),
+        ("JSON batch", decode_batch_json, batch, len(batch)),
+        ("binary frames", lambda body: decode_frames(body, args.batch), binary, len(binary)),
+    ]
+    print(f"{args.batch} readings per upload, {args.repeat} repeats")
+    for label, func, arg, size in cases:
+        micros = time_per_reading(func, arg, args.batch, args.repeat)
+        print(f"  {label:<20} {size / args.batch:7.1f} bytes/reading   {micros:7.2f} us/reading")
+
+
+if __name__ == "__main__":
+    main()
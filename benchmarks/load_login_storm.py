@@ -0,0 +1,107 @@
+"""
+Load test: latency of other endpoints during a login storm, with bcrypt run
+inline on the event loop vs. on the password thread pool.
+
+Runs the app in-process over httpx's ASGI transport with the database calls
+stubbed out, so only the password work competes with the probe requests.
+A steady stream of GET /hello probes measures what devices and dashboards
+would see while `--logins` logins (`--concurrency` at a time) are in flight.
+
+    python -m benchmarks.load_login_storm
+    python -m benchmarks.load_login_storm --logins 200 --concurrency 50 --rounds 12
+
+Requires httpx.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import bcrypt
+import httpx
+
+from app import main
+from app.passwords import PasswordHasher, verify_password
+
+
+def percentile(values: list[float], p: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+class InlineHasher(PasswordHasher):
+    """The old behaviour: bcrypt called directly on the event loop."""
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return verify_password(plain_password, hashed_password)
+
+
+async def run(label: str, hasher: PasswordHasher, args) -> None:
+    main.password_hasher = hasher
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        stop = asyncio.Event()
+        probe_latencies = []
+
+        async def probe():
+            # Latency counts from when the probe was due, not from when the
+            # loop got round to sending it, so a stalled loop shows up in full
+            due = time.perf_counter()
+            while not stop.is_set():
+                await asyncio.sleep(max(0.0, due - time.perf_counter()))
+                await client.get("/hello")
+                now = time.perf_counter()
+                probe_latencies.append((now - due) * 1000)
+                due = max(due + args.probe_interval, now)
+
+        semaphore = asyncio.Semaphore(args.concurrency)
+        statuses = {}
+
+        async def login():
+            async with semaphore:
+                response = await client.post("/login", data={"username": "storm", "password": "pass123"})
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+        probe_task = asyncio.create_task(probe())
+        await asyncio.sleep(0.5)
+        baseline = list(probe_latencies)
+        began = time.perf_counter()
+        await asyncio.gather(*(login() for _ in range(args.logins)))
+        storm_seconds = time.perf_counter() - began
+        stop.set()
+        await probe_task
+
+    during = probe_latencies[len(baseline):]
+    print(f"  {label:<14} logins {args.logins / storm_seconds:6.1f}/s {statuses}")
+    print(f"  {'':<14} /hello p50 {statistics.median(during):8.1f} ms   p99 {percentile(during, 99):8.1f} ms   "
+          f"max {max(during):8.1f} ms   (idle p99 {percentile(baseline, 99):.1f} ms)")
+
+
+async def main_async(args) -> None:
+    hashed = bcrypt.hashpw(b"pass123", bcrypt.gensalt(args.rounds)).decode()
+
+    async def get_user(username):
+        return {"id": 1, "username": username, "password": hashed}
+
+    async def create_session(user_id, session_id):
+        return True
+
+    main.get_user_by_username = get_user
+    main.create_session = create_session
+
+    print(f"{args.logins} logins, {args.concurrency} concurrent, bcrypt cost {args.rounds}")
+    await run("inline", InlineHasher(), args)
+    await run("thread pool", PasswordHasher(max_pending=args.concurrency), args)
+
+
+def cli() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--rounds", type=int, default=12, help="bcrypt cost factor (gensalt default)")
+    parser.add_argument("--probe-interval", type=float, default=0.01)
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,353 @@
+"""
+Load test: a realistic mix of device and user traffic, with throughput and
+p50/p95/p99 latency per operation, and baselines to catch regressions.
+
+Operations (weights set with --mix):
+  ingest     POST /avgHRavgSpO2weightbpSbpD, one reading from the user's device
+  dashboard  GET /dashboard/user/{username}/data
+  login      POST /login then POST /logout
+  export     POST /export/user/{username} (the one-page PDF report)
+
+Targets:
+  in-process (default)  the app over httpx's ASGI transport on the embedded
+                        --storage backend (memory or sqlite, in a temporary
+                        file), seeded with one account per virtual user; the
+                        report worker pool is started, nothing else is needed
+  --url URL             a running server, e.g. `docker compose up` with
+                        SEED_DEMO_DATA=1; virtual users log in as the demo accounts
+
+`--concurrency` virtual users each run their share of `--requests` back to
+back, choosing operations from a seeded RNG, so the same arguments replay the
+same sequence. Runs can be saved as baselines and compared against them; a
+comparison exits with status 1 if the throughput of any operation fell, or
+its p95 rose, by more than --tolerance.
+
+    python -m benchmarks.load_mix
+    python -m benchmarks.load_mix --requests 5000 --concurrency 50 --save main
+    python -m benchmarks.load_mix --compare main
+    python -m benchmarks.load_mix --storage sqlite
+    python -m benchmarks.load_mix --url http://localhost:6543 --mix ingest=80,dashboard=20
+
+Requires httpx.
+"""
+import argparse
+import asyncio
+import json
+import platform
+import random
+import statistics
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import bcrypt
+import httpx
+
+BASELINE_DIR = Path(__file__).parent / "baselines"
+DEFAULT_MIX = "ingest=60,dashboard=30,login=8,export=2"
+OPERATIONS = ("ingest", "dashboard", "login", "export")
+# Password of the in-process accounts
+PASSWORD = "pass123"
+
+
+def percentile(values: list[float], p: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def parse_mix(text: str) -> dict[str, float]:
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise argparse.ArgumentTypeError(f"Unknown operation {name!r}, expected one of {', '.join(OPERATIONS)}")
+        mix[name] = float(weight)
+    return mix
+
+
+class VirtualUser:
+    """One signed-in user and their device, with its own cookie jars."""
+
+    def __init__(self, index: int, account: dict, password: str, make_client):
+        self.index = index
+        self.username = account["username"]
+        self.serial_num = account["serial_num"]
+        self.password = password
+        self.client: httpx.AsyncClient = make_client()
+        # Login/logout runs on its own client so the main session survives it
+        self.auth_client: httpx.AsyncClient = make_client()
+
+    async def start(self) -> None:
+        response = await self.login(self.client)
+        if response.status_code != 302:
+            raise RuntimeError(f"Login as {self.username} failed with HTTP {response.status_code}")
+
+    async def close(self) -> None:
+        await self.client.aclose()
+        await self.auth_client.aclose()
+
+    async def login(self, client: httpx.AsyncClient) -> httpx.Response:
+        return await client.post("/login", data={"username": self.username, "password": self.password})
+
+    async def ingest(self, rng: random.Random) -> int:
+        response = await self.client.post("/avgHRavgSpO2weightbpSbpD", json={
+            "serial_num": self.serial_num,
+            "avgHR": rng.randrange(55, 120),
+            "avgSpO2": rng.randrange(90, 100),
+            "weight": round(rng.uniform(120, 220), 1),
+            "bpS": rng.randrange(100, 150),
+            "bpD": rng.randrange(60, 95),
+        })
+        return response.status_code
+
+    async def dashboard(self, rng: random.Random) -> int:
+        return (await self.client.get(f"/dashboard/user/{self.username}/data")).status_code
+
+    async def login_logout(self, rng: random.Random) -> int:
+        response = await self.login(self.auth_client)
+        if response.status_code != 302:
+            return response.status_code
+        response = await self.auth_client.post("/logout")
+        self.auth_client.cookies.clear()
+        return response.status_code
+
+    async def export(self, rng: random.Random) -> int:
+        return (await self.client.post(f"/export/user/{self.username}", json={})).status_code
+
+    def operation(self, name: str):
+        return {
+            "ingest": self.ingest,
+            "dashboard": self.dashboard,
+            "login": self.login_logout,
+            "export": self.export,
+        }[name]
+
+
+# Statuses each operation ends with when it worked
+EXPECTED_STATUS = {"ingest": {200}, "dashboard": {200, 304}, "login": {302}, "export": {200}}
+
+
+async def run_user(user: VirtualUser, count: int, mix: dict, seed: int, samples: dict) -> None:
+    rng = random.Random(seed * 100003 + user.index)
+    names, weights = list(mix), list(mix.values())
+    for _ in range(count):
+        name = rng.choices(names, weights)[0]
+        began = time.perf_counter()
+        try:
+            status = await user.operation(name)(rng)
+        except httpx.HTTPError:
+            status = 0
+        samples[name].append(((time.perf_counter() - began) * 1000, status in EXPECTED_STATUS[name]))
+
+
+def summarize(samples: dict, seconds: float) -> dict:
+    results = {}
+    for name, entries in samples.items():
+        if not entries:
+            continue
+        latencies = [ms for ms, _ in entries]
+        results[name] = {
+            "requests": len(entries),
+            "errors": sum(not ok for _, ok in entries),
+            "throughput": len(entries) / seconds,
+            "mean": statistics.fmean(latencies),
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "p99": percentile(latencies, 99),
+        }
+    latencies = [ms for entries in samples.values() for ms, _ in entries]
+    results["total"] = {
+        "requests": len(latencies),
+        "errors": sum(result["errors"] for result in results.values()),
+        "throughput": len(latencies) / seconds,
+        "mean": statistics.fmean(latencies),
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+    }
+    return results
+
+
+def print_results(results: dict) -> None:
+    print(f"  {'operation':<10} {'requests':>8} {'errors':>6} {'req/s':>8} "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for name, r in results.items():
+        print(f"  {name:<10} {r['requests']:>8} {r['errors']:>6} {r['throughput']:>8.1f} "
+              f"{r['p50']:>8.1f} {r['p95']:>8.1f} {r['p99']:>8.1f}")
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Operations whose throughput fell or whose p95 rose by more than `tolerance`."""
+    regressions = []
+    print(f"  vs. baseline {baseline['meta']['saved_at']} ({baseline['meta']['target']}):")
+    for name, r in results.items():
+        base = baseline["results"].get(name)
+        if base is None:
+            continue
+        throughput_change = r["throughput"] / base["throughput"] - 1
+        p95_change = r["p95"] / base["p95"] - 1 if base["p95"] else 0.0
+        flag = ""
+        if throughput_change < -tolerance or p95_change > tolerance:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"  {name:<10} req/s {throughput_change:+7.1%}   p95 {p95_change:+7.1%}{flag}")
+    return regressions
+
+
+def load_accounts(count: int, readings: int = 14, bcrypt_rounds: int = 12, seed: int = 0) -> dict:
+    """Seed rows (see app.seed.initial_seed) for `count` users with a device and `readings` daily readings each."""
+    rng = random.Random(seed)
+    hashed = bcrypt.hashpw(PASSWORD.encode(), bcrypt.gensalt(bcrypt_rounds)).decode()
+    start = datetime(2025, 1, 1)
+    users, devices, data = [], [], []
+    for i in range(count):
+        username, serial_num = f"load{i:03d}", f"MH-LOAD{i:04d}"
+        users.append(("Load", f"User {i}", f"{username}@example.com", username, hashed, serial_num))
+        devices.append((username, serial_num))
+        data.extend(
+            (username, serial_num, rng.randrange(60, 100), rng.randrange(94, 100), rng.randrange(140, 180),
+             rng.randrange(110, 130), rng.randrange(70, 85), start + timedelta(days=day))
+            for day in range(readings)
+        )
+    return {"users": users, "user_devices": devices, "data": data}
+
+
+async def in_process_target(args):
+    """Accounts and a client factory for the app running in this process."""
+    from app import database, main
+    from app.storage.memory import MemoryStorage
+    from app.storage.sqlite import SQLiteStorage
+
+    directory = None
+    if args.storage == "sqlite":
+        directory = tempfile.mkdtemp(prefix="load_mix-")
+        database.storage = SQLiteStorage(str(Path(directory) / "load_mix.db"))
+    else:
+        database.storage = MemoryStorage()
+    seed = load_accounts(args.concurrency, bcrypt_rounds=args.bcrypt_rounds, seed=args.seed)
+    await database.init_db_pool()
+    await database.setup_database(lambda: seed)
+    await database.load_serial_index()
+    main.report_service.start()
+    transport = httpx.ASGITransport(app=main.app)
+    accounts = [{"username": user[3], "serial_num": user[5]} for user in seed["users"]]
+
+    def make_client():
+        return httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=args.timeout)
+
+    async def stop():
+        await main.report_service.stop()
+        main.password_hasher.shutdown()
+        await database.close_db_pool()
+        if directory is not None:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    return accounts, PASSWORD, make_client, stop
+
+
+async def remote_target(args):
+    """The demo accounts of a running server (started with SEED_DEMO_DATA=1)."""
+    from app.seed import DEMO_USERS
+
+    accounts = [
+        {"username": username, "serial_num": user[4], "password": user[3]}
+        for username, user in DEMO_USERS.items()
+    ]
+    # Several virtual users share each account; every one has its own session
+    accounts = [accounts[i % len(accounts)] for i in range(args.concurrency)]
+
+    def make_client():
+        return httpx.AsyncClient(base_url=args.url, timeout=args.timeout)
+
+    async def stop():
+        pass
+
+    return accounts, None, make_client, stop
+
+
+async def main_async(args) -> int:
+    target = args.url or f"in-process ({args.storage} storage)"
+    accounts, password, make_client, stop = await (remote_target(args) if args.url else in_process_target(args))
+    users = [
+        VirtualUser(i, account, password or account["password"], make_client)
+        for i, account in enumerate(accounts)
+    ]
+    try:
+        await asyncio.gather(*(user.start() for user in users))
+        # Warm-up: first report render starts the worker processes, caches fill
+        warmup = {name: [] for name in OPERATIONS}
+        await asyncio.gather(*(
+            run_user(user, args.warmup // len(users), args.mix, args.seed + 1, warmup) for user in users
+        ))
+
+        samples = {name: [] for name in OPERATIONS}
+        per_user = args.requests // len(users)
+        began = time.perf_counter()
+        await asyncio.gather(*(run_user(user, per_user, args.mix, args.seed, samples) for user in users))
+        seconds = time.perf_counter() - began
+    finally:
+        await asyncio.gather(*(user.close() for user in users))
+        await stop()
+
+    results = summarize(samples, seconds)
+    print(f"{target}: {per_user * len(users)} requests, {len(users)} virtual users, "
+          f"mix {','.join(f'{k}={v:g}' for k, v in args.mix.items())}, {seconds:.1f} s")
+    print_results(results)
+
+    if args.save:
+        BASELINE_DIR.mkdir(exist_ok=True)
+        path = BASELINE_DIR / f"{args.save}.json"
+        path.write_text(json.dumps({
+            "meta": {
+                "saved_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                "target": target,
+                "requests": args.requests,
+                "concurrency": args.concurrency,
+                "mix": args.mix,
+                "seed": args.seed,
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+            },
+            "results": results,
+        }, indent=2) + "\n")
+        print(f"Saved baseline {path}")
+
+    if args.compare:
+        baseline = json.loads((BASELINE_DIR / f"{args.compare}.json").read_text())
+        run = {"target": target, "requests": args.requests, "concurrency": args.concurrency, "mix": args.mix}
+        different = [key for key, value in run.items() if baseline["meta"].get(key) != value]
+        if different:
+            print(f"  warning: baseline was run with different {', '.join(different)}")
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"Regressed beyond {args.tolerance:.0%}: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+def cli() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="benchmark a running server instead of the app in this process")
+    parser.add_argument("--requests", type=int, default=2000, help="measured requests in total")
+    parser.add_argument("--warmup", type=int, default=200, help="unmeasured requests before the run")
+    parser.add_argument("--concurrency", type=int, default=20, help="virtual users")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX),
+                        help=f"operation weights (default {DEFAULT_MIX})")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--timeout", type=float, default=120.0, help="per-request timeout in seconds")
+    parser.add_argument("--storage", choices=("memory", "sqlite"), default="memory",
+                        help="in-process: storage backend (default memory)")
+    parser.add_argument("--bcrypt-rounds", type=int, default=12, help="in-process: cost of the users' hashes")
+    parser.add_argument("--save", metavar="NAME", help=f"save the results as {BASELINE_DIR.name}/NAME.json")
+    parser.add_argument("--compare", metavar="NAME", help="compare with a saved baseline; exit 1 on regression")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="allowed drop in req/s or rise in p95 per operation (default 0.2 = 20%%)")
+    sys.exit(asyncio.run(main_async(parser.parse_args())))
+
+
+if __name__ == "__main__":
+    cli()
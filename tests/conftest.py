@@ -0,0 +1,30 @@
+import os
+
+# Run the app on the in-memory backend with the demo accounts, before app modules read the environment
+os.environ.setdefault("STORAGE_BACKEND", "memory")
+os.environ.setdefault("SEED_DEMO_DATA", "1")
+os.environ.setdefault("INGEST_WRITE_BEHIND", "0")
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app.main as main
+
+# Device serial number of the "alice" demo account
+ALICE_SERIAL = "MH-830B35DF"
+
+
+@pytest.fixture
+def client():
+    with TestClient(main.app) as client:
+        yield client
+
+
+@pytest.fixture
+def alice(client, monkeypatch):
+    """A client signed in as the "alice" demo account."""
+    async def verify_user(username, request):
+        return username == "alice"
+
+    monkeypatch.setattr(main, "verify_user", verify_user)
+    return client
@@ -0,0 +1,31 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from app.data_analysis import compute_metrics, dataAnalyzer, describe
+
+MARCH = [datetime(2025, 3, 1) + timedelta(days=day) for day in range(10)]
+
+
+def daily_means(weight, spo2=97.0, bpS=120.0, bpD=78.0):
+    return np.array([[70.0, spo2, w, bpS, bpD] for w in weight])
+
+
+def test_range_analysis_names_its_period():
+    # Three kilograms a day: steep at any time scale
+    text = dataAnalyzer().analyze(daily_means([70 + 3 * day for day in range(10)]), MARCH, "in March 2025")
+    assert "Weight gain in March 2025 is too steep" in text
+    assert "past week" not in text
+
+
+def test_dashboard_text_still_covers_the_past_week():
+    text = dataAnalyzer().analyze(daily_means([70 - 3 * day for day in range(7)]), MARCH[:7])
+    assert "Weight loss in the past week is too steep" in text
+
+
+def test_days_without_a_vital_do_not_count_against_it():
+    values = daily_means([70.0] * 10, spo2=np.nan, bpS=np.nan, bpD=np.nan)
+    values[:2, 1] = 92  # low on both days SpO2 was measured
+    text = describe(compute_metrics(values, MARCH), "over this period")
+    assert "Oxygen levels are too low over this period" in text
+    assert "Blood pressure levels are normal" in text
@@ -0,0 +1,38 @@
+from datetime import datetime, timedelta
+
+import app.main as main
+from app.database import add_readings
+from tests.conftest import ALICE_SERIAL
+
+
+def test_raw_chart_of_a_dense_range_keeps_the_newest_readings(alice):
+    start = datetime(2020, 3, 1)
+    readings = [
+        {"username": "alice", "serial_num": ALICE_SERIAL, "avgHR": 60 + i % 40, "avgSpO2": 97,
+         "weight": 70.0, "bpS": 120, "bpD": 80, "created_at": start + timedelta(minutes=i)}
+        for i in range(1100)
+    ]
+    alice.portal.call(add_readings, readings)
+
+    response = alice.get("/dashboard/user/alice/data", params={"from": "2020-03-01T00:00:00", "to": "2020-03-02T00:00:00"})
+    chart = response.json()
+    assert chart["resolution"] == "raw" and len(chart["dates"]) == 1000
+    assert chart["dates"][0] == "Mar 01 01:40" and chart["dates"][-1] == "Mar 01 18:19"
+
+
+def test_open_ended_range_revalidates_when_its_resolution_changes(alice, monkeypatch):
+    start = datetime.now() - timedelta(hours=47)
+    url = "/dashboard/user/alice/data"
+    params = {"from": start.isoformat()}
+    first = alice.get(url, params=params)
+    assert first.json()["resolution"] == "raw"
+    assert alice.get(url, params=params, headers={"If-None-Match": first.headers["etag"]}).status_code == 304
+
+    class TwoHoursLater(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return datetime.now(tz) + timedelta(hours=2)
+
+    monkeypatch.setattr(main, "datetime", TwoHoursLater)
+    later = alice.get(url, params=params, headers={"If-None-Match": first.headers["etag"]})
+    assert later.status_code == 200 and later.json()["resolution"] == "hour"
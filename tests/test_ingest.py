@@ -0,0 +1,40 @@
+import time
+from datetime import datetime
+
+import app.main as main
+from app.ingest import IngestQueue
+from app.storage import DatabaseConnectionError
+from tests.conftest import ALICE_SERIAL
+
+
+def test_queued_readings_keep_their_arrival_time_through_an_outage(client):
+    written = []
+    outage = [True]
+
+    async def write(batch):
+        if outage[0]:
+            raise DatabaseConnectionError("database is down")
+        written.extend(batch)
+        return len(batch)
+
+    queue = IngestQueue(write, flush_interval_ms=10, retry_delay=0.05)
+    client.portal.call(queue.start)
+    main.ingest_queue = queue
+    try:
+        for bpS in (110, 120, 130):
+            reading = {"serial_num": ALICE_SERIAL, "avgHR": 70, "avgSpO2": 97, "weight": 72, "bpS": bpS, "bpD": 76}
+            assert client.post("/avgHRavgSpO2weightbpSbpD", json=reading).status_code == 200
+            time.sleep(0.05)
+        time.sleep(0.2)
+        assert written == []
+        recovered_at = datetime.now()
+        outage[0] = False
+        client.portal.call(queue.stop)
+    finally:
+        main.ingest_queue = None
+
+    stamps = [reading["created_at"] for reading in written]
+    assert [reading["bpS"] for reading in written] == [110, 120, 130]
+    assert stamps == sorted(stamps) and len(set(stamps)) == 3
+    # Stamped on arrival, not when the flusher finally got through
+    assert stamps[-1] < recovered_at
@@ -0,0 +1,19 @@
+import asyncio
+
+from app.database import get_data_page
+from tests.conftest import ALICE_SERIAL
+
+
+def test_legacy_endpoint_stores_failed_sensor_read_as_missing(client):
+    reading = {"serial_num": ALICE_SERIAL, "avgHR": -1, "avgSpO2": -1, "weight": 72, "bpS": 118, "bpD": 76}
+    response = client.post("/avgHRavgSpO2weightbpSbpD", json=reading)
+    assert response.status_code == 200
+    assert response.json()["avgHR"] is None and response.json()["avgSpO2"] is None
+
+    latest = asyncio.run(get_data_page("alice", None, None, limit=1, descending=True))[0]
+    assert (latest["avgHR"], latest["avgSpO2"], latest["weight"]) == (None, None, 72)
+
+
+def test_legacy_endpoint_still_rejects_other_negative_vitals(client):
+    reading = {"serial_num": ALICE_SERIAL, "avgHR": -5, "avgSpO2": 97, "weight": 72, "bpS": 118, "bpD": 76}
+    assert client.post("/avgHRavgSpO2weightbpSbpD", json=reading).status_code == 422
@@ -0,0 +1,31 @@
+import time
+
+import app.main as main
+from app.reports import ReportService
+
+
+def test_direct_export_keeps_no_job(alice):
+    response = alice.post("/export/user/alice", json={})
+    assert response.status_code == 200 and response.content.startswith(b"%PDF")
+    assert not main.report_service._jobs
+
+
+def test_job_pdf_is_served_from_the_report_cache(alice):
+    main.report_service.cache.clear()
+    job = alice.post("/export/user/alice/jobs", json={"title": "Job report"}).json()
+    deadline = time.monotonic() + 60
+    while alice.get(job["status_url"]).json()["status"] in ("queued", "running"):
+        assert time.monotonic() < deadline
+        time.sleep(0.1)
+
+    response = alice.get(job["download_url"])
+    assert response.status_code == 200 and response.content.startswith(b"%PDF")
+    main.report_service.cache.clear()
+    assert alice.get(job["download_url"]).status_code == 404
+
+
+def test_finished_jobs_are_capped():
+    service = ReportService(max_jobs=3)
+    service.cache.set("cached", b"%PDF")
+    jobs = [service.submit("alice", {}, key="cached") for _ in range(5)]
+    assert [service.get(job.id) for job in jobs] == [None, None, *jobs[2:]]
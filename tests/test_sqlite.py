@@ -0,0 +1,55 @@
+import sqlite3
+
+import pytest
+
+import app.storage.sqlite as sqlite_storage
+from app.storage.sqlite import SQLiteStorage
+
+
+def user_version(path) -> int:
+    connection = sqlite3.connect(path)
+    try:
+        return connection.execute("PRAGMA user_version").fetchone()[0]
+    finally:
+        connection.close()
+
+
+def reopen(path, migrations, monkeypatch) -> SQLiteStorage:
+    monkeypatch.setattr(sqlite_storage, "MIGRATIONS", migrations)
+    monkeypatch.setattr(sqlite_storage, "SCHEMA_VERSION", migrations[-1][0])
+    return SQLiteStorage(str(path))
+
+
+def test_older_database_is_migrated_all_or_nothing(tmp_path, monkeypatch):
+    path = tmp_path / "medhome.db"
+    storage = SQLiteStorage(str(path))
+    assert storage.setup()
+    storage.close()
+
+    broken = [
+        (2, "add a note column", ["ALTER TABLE data ADD COLUMN note TEXT"]),
+        (3, "broken", ["SELECT missing FROM nowhere"]),
+    ]
+    storage = reopen(path, broken, monkeypatch)
+    with pytest.raises(sqlite3.OperationalError):
+        storage.setup()
+    storage.close()
+    assert user_version(path) == 1
+
+    fixed = [broken[0], (3, "add a source column", ["ALTER TABLE data ADD COLUMN source TEXT"])]
+    storage = reopen(path, fixed, monkeypatch)
+    assert not storage.setup()
+    storage.close()
+    assert user_version(path) == 3
+
+
+def test_missing_migration_is_an_error(tmp_path, monkeypatch):
+    path = tmp_path / "medhome.db"
+    storage = SQLiteStorage(str(path))
+    storage.setup()
+    storage.close()
+
+    storage = reopen(path, [(3, "skips version 2", [])], monkeypatch)
+    with pytest.raises(RuntimeError):
+        storage.setup()
+    storage.close()